@@ -1,14 +1,23 @@
 # app_static.py
+import io
+import time
+
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import plotly.express as px
-import plotly.graph_objects as go
+
+from wypadki import curves, profiling
+
+# Streamlit wykonuje cały skrypt przy każdym kliknięciu, a wyświetlana jest tylko jedna sekcja.
+# Ciężkie biblioteki (matplotlib, plotly, xgboost w rejestrze modeli, scipy w agregacjach) są więc
+# importowane dopiero w funkcjach sekcji i cache, które ich używają - sekcje opisowe na nie nie czekają.
 
 # --- Konfiguracja strony Streamlit ---
 st.set_page_config(layout="wide", page_title="Analiza Wypadków Drogowych UK (Statyczna)")
 
+# Pomiary etapów (WYPADKI_PROFILE=1): numer ostatniego pomiaru przed bieżącym przebiegiem skryptu
+rerun_start = profiling.last_sequence()
+
 # --- Pasek boczny nawigacji ---
 st.sidebar.title("Nawigacja")
 section = st.sidebar.radio(
@@ -22,13 +31,397 @@ section = st.sidebar.radio(
         "Ocena Modeli",
         "Ważność Cech (XGBoost)",
         "Analiza Kluczowych Cech (Chi-kwadrat)",
+        "Mapa Wypadków (Hotspoty)",
+        "Monitorowanie Dryfu (Lata)",
+        "Modele Segmentowe",
+        "Symulacja Predykcji (What-if)",
         "Wnioski i Podsumowanie"
     )
 )
 
-# --- Wyświetlanie wybranej sekcji ---
+# --- Tryb obliczeń na żywo (tabele liczone z przygotowanego zbioru danych) ---
+live_mode = st.sidebar.toggle(
+    "Obliczenia na żywo (z danych)", value=False,
+    help="Tabele i testy w sekcjach analizy są liczone z danych STATS19 zamiast wartości statycznych. "
+         "Pierwsze wyświetlenie wczytuje dane i liczy agregacje, kolejne korzystają z cache."
+)
+
+
+# Snapshot wyników (snapshots/*.snapshot) otwierany raz na plik i datę utworzenia - nadpisany plik jest otwierany
+# ponownie bez restartu aplikacji; tabele są deserializowane dopiero w sekcji, która ich używa
+@st.cache_resource(show_spinner=False, max_entries=8)
+def load_snapshot(path, created):
+    from wypadki.snapshot import Snapshot
+
+    return Snapshot(path)
+
+
+# --- Snapshot wyników statycznych (python -m wypadki.snapshot albo komórka trenowania w notatniku) ---
+def select_snapshot():
+    from wypadki.snapshot import SNAPSHOT_DIR, list_snapshots
+
+    available = list_snapshots()
+    if not available:
+        st.error(f"Brak plików snapshotu w katalogu `{SNAPSHOT_DIR}/` - utwórz go poleceniem "
+                 "`python -m wypadki.snapshot`.")
+        st.stop()
+    headers = {str(path): header for path, header in available}
+    path = st.sidebar.selectbox(
+        "Snapshot wyników:", list(headers),
+        format_func=lambda p: f"{headers[p]['name']} ({headers[p]['created'][:16]})",
+        help="Plik z tabelami, krzywymi i metrykami prezentowanymi bez obliczeń na żywo (np. inny zakres lat). "
+             "Domyślnie najnowszy."
+    )
+    if headers[path]['description']:
+        st.sidebar.caption(headers[path]['description'])
+    return load_snapshot(path, headers[path]['created'])
+
+
+snapshot = select_snapshot()
+
+
+# Źródło danych: magazyn odświeżany przyrostowo (python -m wypadki.refresh) albo pliki CSV "last-5-years"
+@st.cache_resource(show_spinner="Wczytywanie i przygotowanie danych (jednorazowo)...")
+def load_live_dataset(version, source):
+    from wypadki import aggregations, refresh
+    from wypadki.ingest import YEARS, load_data
+
+    data = refresh.read_store_data() if source == 'store' else load_data(years=YEARS)
+    return aggregations.prepare_dataset(data)
+
+
+# Agregacje w cache, kluczem jest wersja zbioru danych (odcisk plików źródłowych lub wersja magazynu)
+@st.cache_data(show_spinner="Liczenie tabel...")
+def live_driver_tables(version, source):
+    from wypadki import aggregations, cube
+
+    if source == 'store':
+        return cube.cube_driver_tables(live_cube(version, source))
+    data = load_live_dataset(version, source)
+    return len(data), aggregations.driver_origin_table(data), aggregations.driver_stats_table(data)
+
+
+# Kostka liczności liczona raz na wersję danych; filtry sumują jej wycinki zamiast skanować tabelę.
+# Magazyn przechowuje kostkę aktualizowaną deltami przy dopisywaniu roku, więc jest tylko wczytywana
+@st.cache_data(show_spinner="Budowanie kostki liczności...")
+def live_cube(version, source):
+    from wypadki import cube, refresh
+
+    if source == 'store':
+        return refresh.read_store_cube()
+    return cube.build_cube(load_live_dataset(version, source))
+
+
+@st.cache_data(show_spinner="Liczenie testów chi-kwadrat dla wszystkich cech...")
+def live_association_table(version, source):
+    from wypadki import association
+
+    return association.association_table(load_live_dataset(version, source))
+
+
+# Modele z rejestru (models/), wczytywane raz na wersję
+@st.cache_resource(show_spinner="Wczytywanie modeli...")
+def load_model_bundle(version):
+    from wypadki import registry
+
+    return registry.load_bundle(registry.MODELS_DIR / version)
+
+
+# Wartości SHAP zapisane przez notatnik w katalogu wersji modeli (shap.parquet)
+@st.cache_resource(show_spinner="Wczytywanie wartości SHAP...")
+def load_shap_explanation(version):
+    from wypadki import explain, registry
+
+    return explain.load_explanation(registry.MODELS_DIR / version)
+
+
+# Krzywe z zapisanych predykcji wersji modeli: liczone raz, zmiana progu to tylko odczyt z ScoreSummary
+@st.cache_resource(show_spinner="Liczenie krzywych z zapisanych predykcji...")
+def prediction_curves(version):
+    from wypadki import registry
+
+    predictions = registry.load_predictions(registry.MODELS_DIR / version)
+    if predictions is None:
+        return None
+    result = {}
+    for model, splits in predictions.items():
+        for split, (labels, scores) in splits.items():
+            summary = curves.ScoreSummary.from_predictions(labels, scores)
+            result[(model, split)] = {
+                'summary': summary,
+                'auc': summary.roc_auc(),
+                'ap': summary.average_precision(),
+                'roc': curves.downsample_curve(*summary.roc()),
+                'pr': curves.downsample_curve(*summary.precision_recall()),
+                'calibration': curves.calibration_curve(labels, scores),
+            }
+    return result
+
+
+# Przedziały ufności bootstrap: replikacje losowane z liczności tabel / zapisanych predykcji (bez ponownego
+# trenowania), w cache na zawartość tabel albo wersję modeli i próg
+@st.cache_data(show_spinner="Liczenie przedziałów ufności (bootstrap)...")
+def association_bootstrap(tables):
+    from wypadki import bootstrap
+
+    return bootstrap.association_intervals(tables)
+
+
+@st.cache_data(show_spinner="Liczenie przedziałów ufności dla wszystkich cech (bootstrap)...")
+def live_association_bootstrap(version, source):
+    from wypadki import association, bootstrap
+
+    return bootstrap.association_intervals(association.target_tables(load_live_dataset(version, source)))
+
+
+@st.cache_data(show_spinner="Liczenie przedziałów ufności metryk (bootstrap)...")
+def metric_bootstrap(version, model, split, threshold):
+    from wypadki import bootstrap
+
+    return bootstrap.metric_intervals(prediction_curves(version)[(model, split)]['summary'], threshold)
+
+
+# Histogramy cech na rok, liczone raz na wersję danych (w magazynie zapisywane przy dopisywaniu roku);
+# porównania lat korzystają wyłącznie z histogramów
+@st.cache_data(show_spinner="Wczytywanie histogramów cech...")
+def live_histograms(version, source):
+    from wypadki import drift, refresh
+    from wypadki.ingest import CACHE_DIR
+
+    if source == 'store':
+        return refresh.read_store_histograms()
+    return drift.cached_histograms(CACHE_DIR / f'histograms_{version}.parquet',
+                                   lambda: load_live_dataset(version, source))
+
+
+@st.cache_data(show_spinner="Liczenie AUC w kolejnych latach...")
+def yearly_model_auc(version):
+    from wypadki import drift, registry
+
+    path = registry.MODELS_DIR / version
+    predictions, years = registry.load_predictions(path), registry.load_prediction_years(path)
+    if predictions is None or years is None:
+        return None
+    return drift.yearly_auc(predictions, years)
+
+
+# Tabela porównawcza modeli segmentowych (python -m wypadki.segments); kluczem jest czas modyfikacji pliku,
+# więc nowy przebieg jest widoczny bez restartu aplikacji
+@st.cache_data(show_spinner="Wczytywanie porównania modeli segmentowych...")
+def segment_comparison(modified):
+    from wypadki import segments
+
+    return segments.load_comparison()
+
+
+# Indeks przestrzenny (komórki siatki i jednostki samorządu) budowany raz na wersję danych i modeli i zapisywany
+# w cache/; zmiana poziomu siatki i filtrów to tylko sumowanie gotowych agregatów
+@st.cache_resource(show_spinner="Budowanie indeksu przestrzennego (jednorazowo)...")
+def load_spatial_index(version, source, model_version):
+    from wypadki import spatial
+    from wypadki.ingest import CACHE_DIR
+
+    bundle = load_model_bundle(model_version) if model_version else None
+    path = CACHE_DIR / f"spatial_{version}_{model_version or 'bez-modelu'}"
+    return spatial.cached_spatial_index(path, lambda: load_live_dataset(version, source), bundle)
+
+
+def show_stale_models_warning():
+    """Ostrzeżenie, gdy po dopisaniu nowych danych modele nie zostały jeszcze wytrenowane ponownie."""
+    from wypadki import registry
+
+    stale = registry.stale_info()
+    if stale:
+        reasons = "; ".join(item['reason'] for item in stale['reasons'])
+        st.warning(f"Modele są nieaktualne (od {stale['since']}): {reasons}. "
+                   "Uruchom ponownie trenowanie w notatniku, aby zapisać nową wersję modeli.")
+
+
+def snapshot_models_version(snapshot):
+    """Wersja modeli, z której powstał snapshot; najnowsza z rejestru tylko, gdy snapshot jej nie wskazuje."""
+    from wypadki import registry
+
+    return snapshot.value('models_version') or registry.latest_version()
+
+
+def report_f1(report, label='1'):
+    """F1 klasy `label` z tekstu classification_report (None, gdy raport nie ma takiego wiersza)."""
+    for line in report.splitlines():
+        parts = line.split()
+        if len(parts) == 5 and parts[0] == label:
+            return float(parts[3])
+    return None
+
+
+def results_label(live, from_snapshot=False):
+    """Źródło wyników w tytule sekcji: dane na żywo albo snapshot (`from_snapshot` - sekcja zawsze ze snapshotu)."""
+    if not live:
+        return "Wyniki Statyczne"
+    return "Wyniki ze Snapshotu" if from_snapshot else "Wyniki na Żywo"
+
+
+def show_diagnostics_panel(since):
+    """Pomiary etapów bieżącego wyświetlenia i sumy od uruchomienia aplikacji (tylko przy WYPADKI_PROFILE=1)."""
+    with st.sidebar.expander("Diagnostyka"):
+        if st.button("Wyczyść pomiary", key="diagnostics_clear"):
+            profiling.clear()
+        st.caption(f"Pomiary zapisywane są też w pliku `{profiling.profile_file()}`.")
+        current = profiling.records(since)
+        st.markdown("**Bieżące wyświetlenie**")
+        if current.empty:
+            st.caption("Brak pomiarów (wyniki z cache nie są liczone ponownie).")
+        else:
+            st.dataframe(current[['name', 'parent', 'wall_s', 'cpu_s', 'rows', 'rss_delta_mb']].rename(columns={
+                'name': 'Etap', 'parent': 'W ramach', 'wall_s': 'Czas [s]', 'cpu_s': 'CPU [s]', 'rows': 'Wiersze',
+                'rss_delta_mb': 'Zmiana RSS [MB]'}), hide_index=True)
+        st.markdown("**Od uruchomienia aplikacji**")
+        st.dataframe(profiling.summary(), hide_index=True)
+
+
+def snapshot_key(snapshot):
+    """Klucz cache wyników ze snapshotu (argumenty `load_snapshot`)."""
+    return str(snapshot.path), snapshot.header['created']
+
+
+def live_key(live, snapshot):
+    """Klucz cache wyników sekcji: (wersja, źródło) danych w trybie na żywo, (klucz snapshotu, 'snapshot') dla
+    wyników statycznych."""
+    return (live['version'], live['source']) if live else (snapshot_key(snapshot), 'snapshot')
+
+
+def driver_tables(version, source):
+    if source == 'snapshot':
+        snapshot = load_snapshot(*version)
+        return snapshot.value('total_accidents'), snapshot.table('driver_origin'), snapshot.table('driver_stats')
+    return live_driver_tables(version, source)
+
+
+# Wykresy matplotlib: budowane raz i zapisywane jako PNG (jak st.pyplot: dpi 200, bbox 'tight'),
+# a figura jest od razu zamykana - pyplot trzyma referencje do wszystkich otwartych figur, więc bez
+# plt.close każde przeładowanie skryptu zwiększałoby zużycie pamięci
+def figure_png(fig):
+    import matplotlib.pyplot as plt
+
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', dpi=200, bbox_inches='tight')
+    plt.close(fig)
+    return buffer.getvalue()
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def driver_analysis_png(version, source):
+    import matplotlib.pyplot as plt
+
+    total_accidents, driver_origin_display, driver_stats_display = driver_tables(version, source)
+
+    # --- Odtworzenie wykresów Matplotlib na podstawie danych statycznych ---
+    fig_mpl = plt.figure(figsize=(12, 10))
+    gs = fig_mpl.add_gridspec(2, 2, height_ratios=[1, 1.2])
+
+    # Wykres 1: Całkowita liczba wypadków
+    ax1 = fig_mpl.add_subplot(gs[0, 0])
+    bars1 = ax1.bar(['Wszystkie wypadki'], [total_accidents], color='#93c47d')
+    ax1.set_title('Całkowita liczba analizowanych wypadków')
+    ax1.set_ylabel('Liczba')
+    ax1.grid(axis='y', linestyle='--', alpha=0.7)
+    for bar in bars1:
+        height = bar.get_height()
+        ax1.text(bar.get_x() + bar.get_width()/2., height/2, f'{int(height):,} (100%)', ha='center', va='center', fontsize=10, color='black')
+
+    # Wykres 2: Proporcje kierowców
+    ax2 = fig_mpl.add_subplot(gs[0, 1])
+    driver_origin_plot = driver_origin_display[driver_origin_display['Pochodzenie'] != 'Suma'].set_index('Pochodzenie')
+    bottom_val = 0
+    colors = {'Niemiejski': '#1f77b4', 'Miejski': '#ff7f0e'}
+    order = ['Niemiejski', 'Miejski']
+    for origin_type in order:
+        if origin_type in driver_origin_plot.index:
+            value = driver_origin_plot.loc[origin_type, 'Liczba']
+            percentage = driver_origin_plot.loc[origin_type, 'Procent']
+            bar = ax2.bar(['Kierowcy'], [value], bottom=[bottom_val], color=colors[origin_type], label=origin_type)
+            text_y = bottom_val + value / 2
+            ax2.text(0, text_y, f"{int(value):,}\n({percentage:.1f}%)", ha='center', va='center', fontsize=10, color='white')
+            bottom_val += value
+
+    ax2.set_title('Proporcje kierowców wg miejsca zamieszkania')
+    ax2.set_ylabel('Liczba kierowców')
+    ax2.set_xticks([])
+    ax2.legend(loc='upper center', bbox_to_anchor=(0.5, -0.05), ncol=2)
+    ax2.grid(axis='y', linestyle='--', alpha=0.7)
+    ax2.set_ylim(0, total_accidents * 1.1)
+
+    # Wykres 3: Rozkład kierowców według lat
+    ax3 = fig_mpl.add_subplot(gs[1, :])
+    bar_width = 0.35
+    x = np.arange(len(driver_stats_display['Rok']))
+    rects1 = ax3.bar(x - bar_width/2, driver_stats_display['Niemiejski'], bar_width, label='Niemiejski', color='#1f77b4')
+    rects2 = ax3.bar(x + bar_width/2, driver_stats_display['Miejski'], bar_width, label='Miejski', color='#ff7f0e')
+
+    ax3.set_title('Rozkład kierowców wg miejsca zamieszkania w latach')
+    ax3.set_xlabel('Rok')
+    ax3.set_ylabel('Liczba kierowców')
+    ax3.set_xticks(x)
+    ax3.set_xticklabels(driver_stats_display['Rok'])
+    ax3.legend(loc='upper center', bbox_to_anchor=(0.5, -0.1), ncol=2)
+    ax3.grid(axis='y', linestyle='--', alpha=0.7)
+
+    def autolabel(rects, ax):
+        for rect in rects:
+            height = rect.get_height()
+            ax.annotate(f'{int(height):,}', xy=(rect.get_x() + rect.get_width() / 2, height), xytext=(0, 3), textcoords="offset points", ha='center', va='bottom', fontsize=8)
+    autolabel(rects1, ax3)
+    autolabel(rects2, ax3)
+
+    years = driver_stats_display['Rok']
+    fig_mpl.suptitle(f'Analiza kierowców w wypadkach drogowych ({years.min()}-{years.max()})', fontsize=16, y=1.02)
+    plt.tight_layout(rect=[0, 0.05, 1, 0.98])
+    return figure_png(fig_mpl)
+
+
+@st.cache_resource(show_spinner=False, max_entries=8)
+def learning_curve_png(snapshot_key):
+    import matplotlib.pyplot as plt
+
+    curve = load_snapshot(*snapshot_key).table('learning_curve')
+    train_sizes = curve['train_size'].to_numpy()
+    f1_train = curve['f1_train'].to_numpy()
+    f1_val = curve['f1_val'].to_numpy()
+
+    valid_indices = ~np.isnan(f1_train) & ~np.isnan(f1_val)
+    train_sizes = train_sizes[valid_indices]
+    f1_train = f1_train[valid_indices]
+    f1_val = f1_val[valid_indices]
+
+    fig_learning = plt.figure(figsize=(10, 6))
+    plt.plot(train_sizes, f1_train, label='F1-score XGBoost (trening)', color='blue', marker='o')
+    plt.plot(train_sizes, f1_val, label='F1-score XGBoost (walidacja)', color='cyan', marker='o')
+    plt.fill_between(train_sizes, f1_train - 0.01, f1_train + 0.01, alpha=0.1, color='blue')
+    plt.fill_between(train_sizes, f1_val - 0.01, f1_val + 0.01, alpha=0.1, color='cyan')
+
+    plt.title('Krzywa uczenia (F1-score) - XGBoost', fontsize=14)
+    plt.xlabel('Rozmiar zbioru treningowego', fontsize=12)
+    plt.ylabel('F1-score', fontsize=12)
+    plt.legend(loc='best')
+    plt.grid(True, linestyle='--', alpha=0.7)
+    plt.tight_layout()
+    return figure_png(fig_learning)
+
+
+@st.cache_resource(show_spinner=False)
+def static_importance_png(top_features):
+    import matplotlib.pyplot as plt
+
+    fig_imp = plt.figure(figsize=(10, 8))
+    plt.barh(top_features['Cecha'], top_features['Ważność'], color='skyblue')
+    plt.xlabel('Ważność (Importance)')
+    plt.ylabel('Cecha')
+    plt.title('Ważność Cech (XGBoost) - Top 12')
+    plt.gca().invert_yaxis()
+    plt.tight_layout()
+    return figure_png(fig_imp)
 
-if section == "Wprowadzenie":
+
+def render_introduction(live, snapshot):
     st.title("Analiza związku między miejscem zamieszkania kierowcy a prawdopodobieństwem udziału w wypadku drogowym na terenach wiejskich")
 
     st.header("I. Temat")
@@ -55,12 +448,16 @@ if section == "Wprowadzenie":
     - Modele uczenia maszynowego (XGBoost, RandomForest) nie osiągają wysokiej skuteczności w przewidywaniu lokalizacji wypadku (wiejskiej vs. miejskiej) na podstawie miejsca zamieszkania kierowcy i cech kontekstowych.
     """)
 
-elif section == "Opis Przygotowania Danych":
+
+def render_data_preparation(live, snapshot):
     st.title("II. Dane i Metodyka - Opis Przygotowania Danych")
 
     st.header("1. Źródła danych")
-    st.markdown("""
-    - Dane pochodzą z oficjalnych brytyjskich baz danych (Department for Transport - data.gov.uk) dotyczących wypadków drogowych z lat 2021-2023 na terenie UK.
+    years = snapshot.years
+    years_text = ("z lat dostępnych w źródle danych trybu na żywo" if live or not years
+                  else f"z lat {years[0]}-{years[-1]}" if len(years) > 1 else f"z roku {years[0]}")
+    st.markdown(f"""
+    - Dane pochodzą z oficjalnych brytyjskich baz danych (Department for Transport - data.gov.uk) dotyczących wypadków drogowych {years_text} na terenie UK.
     - Tabele (`casualties`, `vehicles`, `accidents`) zawierające dane m.in. o ofiarach (wiek, miejsce zamieszkania), informacje o pojazdach i kierowcach (np. obszar zamieszkania, odległość od miejsca wypadku) oraz kontekst wypadków (warunki pogodowe, typ drogi) zostały połączone w tabelę `data` po kluczu `accident_index`.
     - Statystyki dotyczą wyłącznie wypadków z obrażeniami ciała na drogach publicznych, które są zgłaszane policji, a następnie rejestrowane przy użyciu formularza zgłaszania kolizji `STATS19`.
     - **Przewodnik** po statystykach dotyczących wypadków drogowych: [link](https://www.gov.uk/guidance/road-accident-and-safety-statistics-guidance)
@@ -91,8 +488,18 @@ elif section == "Opis Przygotowania Danych":
     """)
 
     st.header("3. Opis kroków przygotowania danych")
-    st.markdown("""
-    W oryginalnej analizie przeprowadzono następujące kroki przygotowania danych (nie są one wykonywane w tej statycznej wersji):
+    split_rows = snapshot.value('split_rows') or {}
+    if split_rows:
+        split_sizes = " / ".join(f"{label}: {split_rows[split]:,} rekordów" for split, label in (
+            ('train', "Zbiór treningowy (po SMOTE)"), ('val', "Zbiór walidacyjny"), ('test', "Zbiór testowy"))
+            if split in split_rows) + f" (snapshot {snapshot.name})."
+    else:
+        split_sizes = ("Zbiór treningowy (po SMOTE): 228388 rekordów / Zbiór walidacyjny: 54611 rekordów / "
+                       "Zbiór testowy: 54611 rekordów (oryginalna analiza 2021-2023).")
+    steps_note = ("w trybie na żywo aplikacja wykonuje oczyszczenie i inżynierię cech, ale nie trenuje modeli" if live
+                  else "nie są one wykonywane w tej statycznej wersji")
+    st.markdown(f"""
+    W oryginalnej analizie przeprowadzono następujące kroki przygotowania danych ({steps_note}):
 
     - **Oczyszczenie danych:** Zastąpiono wartości `-1` i `99` na `NaN` w kluczowych kolumnach, a następnie usunięto wiersze z brakami w tych kolumnach.
     - **Przekształcenie czasu:** Z kolumny `time` wyodrębniono godzinę i utworzono nową kolumnę `hour_of_day`.
@@ -117,149 +524,93 @@ elif section == "Opis Przygotowania Danych":
       - Następnie zbiór treningowy + walidacyjny podzielono na treningowy (60% całości) i walidacyjny (20% całości), również ze stratyfikacją.
     - **Balansowanie danych:** Zastosowano SMOTE na zbiorze treningowym, aby zrównoważyć klasy zmiennej docelowej `is_rural_accident`.
     - **Rozmiary zbiorów danych po przetworzeniu:** 
-      - Zbiór treningowy (po SMOTE): 228388 rekordów / Zbiór walidacyjny: 54611 rekordów / Zbiór testowy: 54611 rekordów.
+      - {split_sizes}
 
     Celem było przygotowanie danych (X) i zmiennej docelowej (y, czyli `is_rural_accident`) do modelowania poprzez oczyszczenie, transformację i stworzenie nowych cech, uwzględniając również typ uczestnika wypadku (`casualty_type`).
 
     *Ta wersja aplikacji jedynie **prezentuje** wyniki uzyskane po tych krokach.*
     """)
 
-elif section == "Analiza Wstępna Kierowców":
-    st.title("Analiza Wstępna: Charakterystyka Kierowców w Wypadkach (Wyniki Statyczne)")
 
-    # --- Dane statyczne ---
-    total_accidents_static = 273053
+def render_driver_analysis(live, snapshot):
+    st.title(f"Analiza Wstępna: Charakterystyka Kierowców w Wypadkach ({results_label(live)})")
 
-    # Tabela 1: Proporcje kierowców
-    driver_origin_data = {
-        'Pochodzenie': ['Miejski', 'Niemiejski', 'Suma'],
-        'Liczba': [222719, 50334, 273053],
-        'Procent': [81.6, 18.4, 100.0]
-    }
-    driver_origin_display = pd.DataFrame(driver_origin_data)
-
-    # Tabela 2: Rozkład wg lat
-    driver_stats_data = {
-        'Rok': [2021, 2022, 2023],
-        'Niemiejski': [15908, 17419, 17007],
-        'Procent Niemiejski': [17.8, 18.7, 18.9],
-        'Miejski': [73686, 75877, 73156],
-        'Procent Miejski': [82.2, 81.3, 81.1],
-        'Suma': [89594, 93296, 90163]
-    }
-    driver_stats_display = pd.DataFrame(driver_stats_data)
+    total_accidents, driver_origin_display, driver_stats_display = driver_tables(*live_key(live, snapshot))
 
     # --- Wyświetlanie w Streamlit ---
     st.subheader("Tabela 1: Proporcje kierowców według miejsca zamieszkania")
     st.dataframe(driver_origin_display.style.format({'Liczba': '{:,.0f}', 'Procent': '{:.1f}%'}))
-    st.markdown("""
-    **Komentarz:** Kierowcy z obszarów miejskich dominują w ogólnej liczbie wypadków (81.6%), co może odzwierciedlać większą populację miejską lub częstsze korzystanie z dróg.
-    """)
-
-    st.subheader("Tabela 2: Rozkład kierowców według miejsca zamieszkania w latach 2021-2023")
+    urban_share = driver_origin_display.set_index('Pochodzenie').loc['Miejski', 'Procent']
+    if urban_share > 50:
+        origin_comment = (f"Kierowcy z obszarów miejskich dominują w ogólnej liczbie wypadków ({urban_share:.1f}%), co może "
+                          "odzwierciedlać większą populację miejską lub częstsze korzystanie z dróg.")
+    else:
+        origin_comment = (f"Kierowcy z obszarów miejskich stanowią {urban_share:.1f}% uczestników wypadków - "
+                          "w wybranych danych przeważają kierowcy niemiejscy.")
+    st.markdown(f"**Komentarz:** {origin_comment}")
+
+    years = driver_stats_display['Rok']
+    st.subheader(f"Tabela 2: Rozkład kierowców według miejsca zamieszkania w latach {years.min()}-{years.max()}")
     st.dataframe(driver_stats_display.style.format({
         'Niemiejski': '{:,.0f}', 'Procent Niemiejski': '{:.1f}%',
         'Miejski': '{:,.0f}', 'Procent Miejski': '{:.1f}%',
         'Suma': '{:,.0f}'
     }))
-    st.markdown("""
-    **Komentarz:** Proporcje pozostają stosunkowo stałe w latach 2021-2023, z lekkim wzrostem udziału kierowców niemiejskich w 2023 roku (18.9%), co sugeruje stabilność trendów w czasie.
-    """)
+    shares = driver_stats_display.set_index('Rok')['Procent Niemiejski']
+    if len(shares) < 2:
+        trend_comment = f"Udział kierowców niemiejskich w {shares.index[0]} roku: {shares.iloc[0]:.1f}%."
+    else:
+        first, last = shares.iloc[0], shares.iloc[-1]
+        change = (f"lekki wzrost udziału kierowców niemiejskich w {shares.index[-1]} roku ({last:.1f}% wobec "
+                  f"{first:.1f}% w {shares.index[0]})" if last > first else
+                  f"udział kierowców niemiejskich w {shares.index[-1]} roku wynosi {last:.1f}% (wobec {first:.1f}% "
+                  f"w {shares.index[0]})")
+        if shares.max() - shares.min() < 2:
+            trend_comment = (f"Proporcje pozostają stosunkowo stałe w latach {years.min()}-{years.max()}; {change}, "
+                             "co sugeruje stabilność trendów w czasie.")
+        else:
+            trend_comment = (f"Proporcje zmieniają się w latach {years.min()}-{years.max()} (udział kierowców "
+                             f"niemiejskich od {shares.min():.1f}% do {shares.max():.1f}%); {change}.")
+    st.markdown(f"**Komentarz:** {trend_comment}")
 
     st.subheader("Wizualizacje (Odtworzone)")
 
-    # --- Odtworzenie wykresów Matplotlib na podstawie danych statycznych ---
-    fig_mpl = plt.figure(figsize=(12, 10))
-    gs = fig_mpl.add_gridspec(2, 2, height_ratios=[1, 1.2])
-
-    # Wykres 1: Całkowita liczba wypadków
-    ax1 = fig_mpl.add_subplot(gs[0, 0])
-    bars1 = ax1.bar(['Wszystkie wypadki'], [total_accidents_static], color='#93c47d')
-    ax1.set_title('Całkowita liczba analizowanych wypadków')
-    ax1.set_ylabel('Liczba')
-    ax1.grid(axis='y', linestyle='--', alpha=0.7)
-    for bar in bars1:
-        height = bar.get_height()
-        ax1.text(bar.get_x() + bar.get_width()/2., height/2, f'{int(height):,} (100%)', ha='center', va='center', fontsize=10, color='black')
-
-    # Wykres 2: Proporcje kierowców
-    ax2 = fig_mpl.add_subplot(gs[0, 1])
-    driver_origin_plot = driver_origin_display[driver_origin_display['Pochodzenie'] != 'Suma'].set_index('Pochodzenie')
-    bottom_val = 0
-    colors = {'Niemiejski': '#1f77b4', 'Miejski': '#ff7f0e'}
-    order = ['Niemiejski', 'Miejski']
-    for origin_type in order:
-        if origin_type in driver_origin_plot.index:
-            value = driver_origin_plot.loc[origin_type, 'Liczba']
-            percentage = driver_origin_plot.loc[origin_type, 'Procent']
-            bar = ax2.bar(['Kierowcy'], [value], bottom=[bottom_val], color=colors[origin_type], label=origin_type)
-            text_y = bottom_val + value / 2
-            ax2.text(0, text_y, f"{int(value):,}\n({percentage:.1f}%)", ha='center', va='center', fontsize=10, color='white')
-            bottom_val += value
-
-    ax2.set_title('Proporcje kierowców wg miejsca zamieszkania')
-    ax2.set_ylabel('Liczba kierowców')
-    ax2.set_xticks([])
-    ax2.legend(loc='upper center', bbox_to_anchor=(0.5, -0.05), ncol=2)
-    ax2.grid(axis='y', linestyle='--', alpha=0.7)
-    ax2.set_ylim(0, total_accidents_static * 1.1)
-
-    # Wykres 3: Rozkład kierowców według lat
-    ax3 = fig_mpl.add_subplot(gs[1, :])
-    bar_width = 0.35
-    x = np.arange(len(driver_stats_display['Rok']))
-    rects1 = ax3.bar(x - bar_width/2, driver_stats_display['Niemiejski'], bar_width, label='Niemiejski', color='#1f77b4')
-    rects2 = ax3.bar(x + bar_width/2, driver_stats_display['Miejski'], bar_width, label='Miejski', color='#ff7f0e')
-
-    ax3.set_title('Rozkład kierowców wg miejsca zamieszkania w latach')
-    ax3.set_xlabel('Rok')
-    ax3.set_ylabel('Liczba kierowców')
-    ax3.set_xticks(x)
-    ax3.set_xticklabels(driver_stats_display['Rok'])
-    ax3.legend(loc='upper center', bbox_to_anchor=(0.5, -0.1), ncol=2)
-    ax3.grid(axis='y', linestyle='--', alpha=0.7)
-
-    def autolabel(rects, ax):
-        for rect in rects:
-            height = rect.get_height()
-            ax.annotate(f'{int(height):,}', xy=(rect.get_x() + rect.get_width() / 2, height), xytext=(0, 3), textcoords="offset points", ha='center', va='bottom', fontsize=8)
-    autolabel(rects1, ax3)
-    autolabel(rects2, ax3)
-
-    fig_mpl.suptitle('Analiza kierowców w wypadkach drogowych (2021-2023)', fontsize=16, y=1.02)
-    plt.tight_layout(rect=[0, 0.05, 1, 0.98])
-
-    st.pyplot(fig_mpl)
-
-elif section == "Analiza Związku: Miejsce Zamieszkania vs Lokalizacja Wypadku":
-    st.title("Analiza Związku: Miejsce Zamieszkania Kierowcy a Lokalizacja Wypadku (Wyniki Statyczne)")
-
-    # --- Dane statyczne ---
-    contingency_data = {
-        'Wypadek Miejski': [15893, 174431],
-        'Wypadek Wiejski': [34441, 48288]
-    }
-    contingency_table = pd.DataFrame(contingency_data, index=['Niemiejski', 'Miejski'])
-
-    location_stats_data = {
-        'Wypadki Miejskie (%)': [31.6, 78.3],
-        'Wypadki Wiejskie (%)': [68.4, 21.7]
-    }
-    location_stats = pd.DataFrame(location_stats_data, index=['Niemiejski', 'Miejski'])
-
-    chi2_stat = 42475.60
-    p_value_chi2 = 0.0
-    dof_chi2 = 1
-    phi_stat = 0.394
-    strength = "Umiarkowany (φ = 0.3–0.5)"
-    conclusion = f"Odrzucamy hipotezę zerową (H₀). Istnieje statystycznie istotny związek (p < 0.0001)."
-    alpha = 0.05
-
-    expected_data = {
-        'Wypadek Miejski': [35083.9, 155240.1],
-        'Wypadek Wiejski': [15250.1, 67478.9]
-    }
-    expected_df = pd.DataFrame(expected_data, index=['Niemiejski', 'Miejski'])
+    st.image(driver_analysis_png(*live_key(live, snapshot)), use_column_width=True)
+
+
+def render_association(live, snapshot):
+    import plotly.express as px
+
+    st.title(f"Analiza Związku: Miejsce Zamieszkania Kierowcy a Lokalizacja Wypadku ({results_label(live)})")
+
+    if live:
+        from wypadki import aggregations, cube
+
+        contingency_table = cube.cube_association(live['cube'])
+        association = aggregations.association_test(contingency_table)
+        location_stats = association['location_stats']
+        chi2_stat = association['chi2']
+        p_value_chi2 = association['p_value']
+        dof_chi2 = association['dof']
+        phi_stat = association['phi']
+        strength = association['strength']
+        conclusion = association['conclusion']
+        alpha = association['alpha']
+        expected_df = association['expected']
+    else:
+        association = snapshot.value('association')
+        contingency_table = snapshot.table('association_contingency')
+        location_stats = snapshot.table('association_location_stats')
+        chi2_stat = association['chi2']
+        p_value_chi2 = association['p_value']
+        dof_chi2 = association['dof']
+        phi_stat = association['phi']
+        strength = association['strength']
+        conclusion = association['conclusion']
+        alpha = association['alpha']
+        expected_df = snapshot.table('association_expected') if 'association_expected' in snapshot else None
+
+    phi_interval = association_bootstrap({'is_urban_driver': contingency_table}).loc['is_urban_driver']
 
     # --- Wyświetlanie w Streamlit ---
     st.subheader("Tabela Kontyngencji (Obserwowane Liczby)")
@@ -273,13 +624,16 @@ elif section == "Analiza Związku: Miejsce Zamieszkania vs Lokalizacja Wypadku":
     - **Statystyka chi-kwadrat (χ²):** {chi2_stat:.2f}
     - **Wartość p (p-value):** {p_value_chi2:.4e} (bardzo bliska 0)
     - **Stopnie swobody (dof):** {dof_chi2}
-    - **Współczynnik Phi (φ):** {phi_stat:.3f}
+    - **Współczynnik Phi (φ):** {phi_stat:.3f} (95% przedział ufności bootstrap: {phi_interval['V: Dolna granica']:.3f} – {phi_interval['V: Górna granica']:.3f})
     - **Interpretacja siły związku (Phi):** {strength}
     - **Wniosek (poziom istotności α = {alpha}):** {conclusion}
     """)
 
     st.subheader("Tabela Oczekiwana (Gdyby nie było związku)")
-    st.dataframe(expected_df.style.format("{:,.1f}"))
+    if expected_df is not None:
+        st.dataframe(expected_df.style.format("{:,.1f}"))
+    else:
+        st.info("Wybrany wycinek danych nie pozwala wyznaczyć tabeli oczekiwanej.")
 
     # --- Odtworzenie Wykresu Plotly ---
     st.subheader("Wykres: Procent Wypadków Miejskich i Wiejskich wg Pochodzenia Kierowcy")
@@ -305,24 +659,74 @@ elif section == "Analiza Związku: Miejsce Zamieszkania vs Lokalizacja Wypadku":
     fig_plotly.update_traces(texttemplate='%{text:.1f}%', textposition='outside')
     st.plotly_chart(fig_plotly, use_container_width=True)
 
-    # --- Podsumowanie i wnioski z tej sekcji ---
+    # --- Podsumowanie i wnioski z tej sekcji (liczby z wyników powyżej) ---
     st.subheader("Interpretacja i Wnioski z Analizy Związku")
-    st.markdown("""
+    if np.isnan(phi_stat) or not {'Niemiejski', 'Miejski'} <= set(location_stats.index):
+        st.info("Wybrany wycinek danych jest za mały, aby sformułować wnioski.")
+        return
+    nonurban, urban = location_stats.loc['Niemiejski'], location_stats.loc['Miejski']
+    rural_ratio = nonurban['Wypadki Wiejskie (%)'] / urban['Wypadki Wiejskie (%)']
+    significant = p_value_chi2 < alpha
+    st.markdown(f"""
     **Kluczowe obserwacje:**
-    - **Kierowcy z obszarów niemiejskich**: Znacznie częściej uczestniczą w wypadkach na terenach wiejskich (68.4%) niż miejskich (31.6%).
-    - **Kierowcy z miast**: Dominują w wypadkach na terenach miejskich (78.3%), a rzadziej uczestniczą w wypadkach na terenach wiejskich (21.7%).
+    - **Kierowcy z obszarów niemiejskich**: W {nonurban['Wypadki Wiejskie (%)']:.1f}% uczestniczą w wypadkach na terenach wiejskich, w {nonurban['Wypadki Miejskie (%)']:.1f}% - miejskich.
+    - **Kierowcy z miast**: W {urban['Wypadki Miejskie (%)']:.1f}% uczestniczą w wypadkach na terenach miejskich, w {urban['Wypadki Wiejskie (%)']:.1f}% - wiejskich.
 
     **Wyniki testu chi-kwadrat:**
-    - Test wykazał **statystycznie istotny związek** (p < 0.0001) między miejscem zamieszkania kierowcy a lokalizacją wypadku.
-    - Siła tego związku, mierzona współczynnikiem Phi (φ ≈ 0.394), jest **umiarkowana**. Oznacza to, że miejsce zamieszkania jest ważnym, ale nie jedynym czynnikiem determinującym lokalizację wypadku. Inne zmienne, takie jak warunki drogowe czy prędkość, również odgrywają rolę.
+    - Test {'wykazał **statystycznie istotny związek**' if significant else '**nie wykazał** statystycznie istotnego związku'} ({p_value_text(p_value_chi2)}) między miejscem zamieszkania kierowcy a lokalizacją wypadku.
+    - Siła tego związku, mierzona współczynnikiem Phi (φ = {phi_stat:.3f}): **{strength}**. Miejsce zamieszkania nie jest jedynym czynnikiem determinującym lokalizację wypadku - inne zmienne, takie jak warunki drogowe czy prędkość, również odgrywają rolę.
 
     **Wnioski:**
-    1. **Istnienie związku**: Potwierdzono wyraźny związek. Kierowcy częściej ulegają wypadkom w środowisku odpowiadającym ich miejscu zamieszkania (miejscy w miastach, niemiejscy na wsiach). Jednak kierowcy niemiejscy wykazują ponad trzykrotnie wyższe prawdopodobieństwo udziału w wypadkach wiejskich (68.4%) niż miejscy (21.7%).
-    2. **Weryfikacja hipotezy**: Wyniki **nie potwierdzają** hipotezy, że kierowcy miejscy są bardziej narażeni na wypadki na terenach wiejskich. Przeciwnie, kierowcy niemiejscy dominują w tej kategorii w swoich grupach.
-    3. **Praktyczne znaczenie**: Umiarkowana siła związku sugeruje potrzebę dalszej analizy z wykorzystaniem modeli ML, aby zidentyfikować dodatkowe czynniki wpływające na ryzyko wypadków wiejskich.
+    1. **Istnienie związku**: {'Potwierdzono' if significant else 'Nie potwierdzono'} związek. Kierowcy niemiejscy mają {rural_ratio:.1f}-krotnie {'wyższe' if rural_ratio >= 1 else 'niższe'} prawdopodobieństwo udziału w wypadkach wiejskich ({nonurban['Wypadki Wiejskie (%)']:.1f}%) niż miejscy ({urban['Wypadki Wiejskie (%)']:.1f}%).
+    2. **Weryfikacja hipotezy**: Wyniki **{'nie potwierdzają' if rural_ratio >= 1 else 'potwierdzają'}** hipotezy, że kierowcy miejscy są bardziej narażeni na wypadki na terenach wiejskich.
+    3. **Praktyczne znaczenie**: Siła związku (φ = {phi_stat:.3f}) sugeruje potrzebę dalszej analizy z wykorzystaniem modeli ML, aby zidentyfikować dodatkowe czynniki wpływające na ryzyko wypadków wiejskich.
     """)
 
-elif section == "Opis Modelowania ML":
+
+def p_value_text(p_value):
+    return "p < 0.0001" if p_value < 0.0001 else f"p = {p_value:.4f}"
+
+
+def feature_list(features):
+    return ", ".join(f"**{feature}**" for feature in features)
+
+
+def key_features_interpretation(results_df):
+    """Interpretacja testów kluczowych cech (markdown) z tabeli wyników wybranego snapshotu / wycinka."""
+    tests = results_df.dropna(subset=['V']).sort_values('V', ascending=False)
+    if tests.empty:
+        return "Wybrany wycinek danych jest za mały, aby sformułować wnioski."
+    significant = tests['p_value'] < 0.05
+    if significant.all():
+        lines = ["- Wszystkie cechy wykazują statystycznie istotny związek (p < 0.05) z lokalizacją wypadku."]
+    else:
+        lines = [f"- Brak statystycznie istotnego związku (p ≥ 0.05) z lokalizacją wypadku: "
+                 f"{feature_list(tests.index[~significant])}."]
+    strongest = tests.index[0]
+    lines.append(f"- **{strongest}** ma najsilniejszy związek (V={tests['V'].iloc[0]:.3f})"
+                 + (", co potwierdza jego kluczową rolę." if strongest == 'is_urban_driver' else "."))
+    rest = tests.iloc[1:][significant.iloc[1:]]
+    moderate, weak = rest[rest['V'] >= 0.1], rest[rest['V'] < 0.1]
+    if not moderate.empty:
+        lines.append(f"- {feature_list(moderate.index)} {'ma' if len(moderate) == 1 else 'mają'} umiarkowany wpływ "
+                     f"(V {moderate['V'].min():.3f}–{moderate['V'].max():.3f}).")
+    if not weak.empty:
+        lines.append(f"- {feature_list(weak.index)} {'wykazuje' if len(weak) == 1 else 'wykazują'} słabszy związek "
+                     f"(V < 0.1).")
+    return "**Interpretacja:**\n" + "\n".join(lines)
+
+
+def params_code(params, per_line=3):
+    """Hiperparametry modeli ze snapshotu jako kod Pythona (słowniki params_xgb i params_rf)."""
+    blocks = []
+    for model, label in (('xgb', 'XGBoost'), ('rf', 'RandomForest')):
+        items = [f"{key!r}: {value!r}," for key, value in params.get(model, {}).items()]
+        lines = [' '.join(items[i:i + per_line]) for i in range(0, len(items), per_line)]
+        blocks.append(f"# {label}\nparams_{model} = {{\n" + ''.join(f"    {line}\n" for line in lines) + "}")
+    return '\n\n'.join(blocks)
+
+
+def render_modeling_description(live, snapshot):
     st.title("Modelowanie Uczenia Maszynowego - Opis")
     st.header("Cel: Przewidywanie, czy wypadek zdarzy się na terenie wiejskim (`is_rural_accident` = 1)")
 
@@ -337,260 +741,659 @@ elif section == "Opis Modelowania ML":
     3. Modele zostały wytrenowane na zbalansowanym zbiorze treningowym z użyciem określonych hiperparametrów (przykładowe poniżej).
     4. Ocena modeli odbyła się na **niezmienionych** (niezbalansowanych) zbiorach walidacyjnym i testowym.
 
-    *Ta statyczna wersja aplikacji nie trenuje modeli, jedynie prezentuje wcześniej uzyskane wyniki.*
+    *Aplikacja nie trenuje modeli, jedynie prezentuje wcześniej uzyskane wyniki.*
     """)
 
     st.subheader("Przykładowe Hiperparametry Użyte w Analizie:")
-    st.code("""
-# XGBoost
-params_xgb = {
-    'random_state': 42, 'scale_pos_weight': 1, 'max_depth': 9,
-    'n_estimators': 269, 'learning_rate': 0.06, 'reg_alpha': 0.1,
-    'reg_lambda': 1.9, 'subsample': 0.8, 'colsample_bytree': 0.6,
-}
+    params = snapshot.value('params')
+    if params:
+        st.code(params_code(params), language='python')
+    else:
+        st.info("Wybrany snapshot nie zawiera hiperparametrów modeli.")
 
-# RandomForest
-params_rf = {
-    'random_state': 42, 'n_estimators': 229, 'max_depth': 14,
-    'min_samples_split': 54, 'min_samples_leaf': 26, 'n_jobs': -1,
-    'max_features': 'sqrt', 'criterion': 'entropy', 'bootstrap': False,
-}
-    """, language='python')
 
-elif section == "Ocena Modeli":
-    st.title("Ocena Modeli Uczenia Maszynowego (Wyniki Statyczne)")
+def render_model_evaluation(live, snapshot):
+    import plotly.graph_objects as go
+
+    st.title(f"Ocena Modeli Uczenia Maszynowego ({results_label(live, from_snapshot=True)})")
+    show_stale_models_warning()
     st.markdown("Ocena przeprowadzona na zbiorach **walidacyjnym** i **testowym** (bez SMOTE). Próg decyzyjny: 0.5.")
 
-    # --- Statyczne Wyniki ---
-    report_val_xgb_static = """
-                  precision    recall  f1-score   support
-
-           0       0.91      0.93      0.92     38065
-           1       0.83      0.79      0.81     16546
-
-    accuracy                           0.89     54611
-   macro avg       0.87      0.86      0.86     54611
-weighted avg       0.89      0.89      0.89     54611
-    """
-    auc_val_xgb_static = 0.9400
-
-    report_val_rf_static = """
-                  precision    recall  f1-score   support
-
-           0       0.92      0.88      0.90     38065
-           1       0.76      0.83      0.79     16546
-
-    accuracy                           0.87     54611
-   macro avg       0.84      0.86      0.85     54611
-weighted avg       0.87      0.87      0.87     54611
-    """
-    auc_val_rf_static = 0.9338
-
-    report_test_xgb_static = """
-                  precision    recall  f1-score   support
-
-           0       0.91      0.93      0.92     38065
-           1       0.84      0.78      0.81     16546
-
-    accuracy                           0.89     54611
-   macro avg       0.87      0.86      0.86     54611
-weighted avg       0.89      0.89      0.89     54611
-    """
-    auc_test_xgb_static = 0.9400
-
-    report_test_rf_static = """
-                  precision    recall  f1-score   support
-
-           0       0.92      0.89      0.90     38065
-           1       0.76      0.83      0.79     16546
-
-    accuracy                           0.87     54611
-   macro avg       0.84      0.86      0.85     54611
-weighted avg       0.87      0.87      0.87     54611
-    """
-    auc_test_rf_static = 0.9327
-
-    # --- Wyświetlanie wyników ---
-    st.subheader("Wyniki na Zbiorze Walidacyjnym")
-    col1, col2 = st.columns(2)
-    with col1:
-        st.markdown("**XGBoost**")
-        st.text(f"AUC-ROC: {auc_val_xgb_static:.4f}")
-        st.text("Raport Klasyfikacji:")
-        st.code(report_val_xgb_static)
-    with col2:
-        st.markdown("**Random Forest**")
-        st.text(f"AUC-ROC: {auc_val_rf_static:.4f}")
-        st.text("Raport Klasyfikacji:")
-        st.code(report_val_rf_static)
-
-    st.subheader("Wyniki na Zbiorze Testowym (Ostateczna Ocena)")
-    col3, col4 = st.columns(2)
-    with col3:
-        st.markdown("**XGBoost**")
-        st.text(f"AUC-ROC: {auc_test_xgb_static:.4f}")
-        st.text("Raport Klasyfikacji:")
-        st.code(report_test_xgb_static)
-    with col4:
-        st.markdown("**Random Forest**")
-        st.text(f"AUC-ROC: {auc_test_rf_static:.4f}")
-        st.text("Raport Klasyfikacji:")
-        st.code(report_test_rf_static)
-
-    # --- Krzywe ROC (Odtworzone - przykładowe dane) ---
-    st.subheader("Krzywe ROC (Zbiór Testowy - Wykres Ilustracyjny)")
-    fpr_xgb_static = np.array([0, 0.05, 0.1, 0.2, 0.3, 0.5, 1])
-    tpr_xgb_static = np.array([0, 0.6, 0.8, 0.88, 0.92, 0.96, 1])
-    fpr_rf_static = np.array([0, 0.07, 0.15, 0.25, 0.35, 0.55, 1])
-    tpr_rf_static = np.array([0, 0.55, 0.75, 0.85, 0.90, 0.94, 1])
+    # --- Raporty klasyfikacji i AUC ze snapshotu ---
+    model_names = {'xgb': 'XGBoost', 'rf': 'Random Forest'}
+    metrics = snapshot.table('model_metrics').set_index(['model', 'split']) if 'model_metrics' in snapshot else None
+    if metrics is None:
+        st.info("Wybrany snapshot nie zawiera metryk modeli (utworzony bez wersji modeli z rejestru).")
+    else:
+        for split, title in (('val', "Wyniki na Zbiorze Walidacyjnym"),
+                             ('test', "Wyniki na Zbiorze Testowym (Ostateczna Ocena)")):
+            st.subheader(title)
+            for col, model in zip(st.columns(2), model_names):
+                if (model, split) not in metrics.index:
+                    continue
+                with col:
+                    st.markdown(f"**{model_names[model]}**")
+                    st.text(f"AUC-ROC: {metrics.loc[(model, split), 'auc']:.4f}")
+                    st.text("Raport Klasyfikacji:")
+                    st.code(metrics.loc[(model, split), 'report'])
+        if snapshot.value('models_version'):
+            years_note = (f", tylko wiersze z lat {', '.join(map(str, snapshot.years))}"
+                          if snapshot.value('years_filtered') else "")
+            st.caption(f"Metryki z zapisanych predykcji wersji modeli {snapshot.value('models_version')}{years_note}.")
+
+    # --- Krzywe ROC: z predykcji wersji modeli snapshotu zapisanych w rejestrze, a bez nich - ze snapshotu ---
+    model_version = snapshot_models_version(snapshot)
+    stored_curves = prediction_curves(model_version) if model_version else None
 
     fig_roc = go.Figure()
-    fig_roc.add_trace(go.Scatter(x=fpr_xgb_static, y=tpr_xgb_static, mode='lines', name=f'XGBoost (AUC ≈ {auc_test_xgb_static:.4f})'))
-    fig_roc.add_trace(go.Scatter(x=fpr_rf_static, y=tpr_rf_static, mode='lines', name=f'Random Forest (AUC ≈ {auc_test_rf_static:.4f})'))
-    fig_roc.add_trace(go.Scatter(x=[0, 1], y=[0, 1], mode='lines', name='Losowy Klasyfikator', line=dict(dash='dash')))
-
-    fig_roc.update_layout(
-        title='Krzywa ROC - Zbiór Testowy (Ilustracja)',
-        xaxis_title='False Positive Rate (FPR)',
-        yaxis_title='True Positive Rate (TPR)',
-        legend_title='Model',
-        xaxis=dict(range=[0.0, 1.0]),
-        yaxis=dict(range=[0.0, 1.05])
-    )
-    st.plotly_chart(fig_roc, use_container_width=True)
-    st.caption("Uwaga: Krzywa ROC jest ilustracją opartą na przykładowych danych dla tej wersji statycznej.")
+    if stored_curves and any(split == 'test' for _, split in stored_curves):
+        st.subheader("Krzywe ROC (Zbiór Testowy)")
+        for model, name in model_names.items():
+            if (model, 'test') in stored_curves:
+                entry = stored_curves[(model, 'test')]
+                fpr, tpr = entry['roc']
+                fig_roc.add_trace(go.Scatter(x=fpr, y=tpr, mode='lines', name=f"{name} (AUC = {entry['auc']:.4f})"))
+        roc_title = 'Krzywa ROC - Zbiór Testowy'
+        roc_caption = f"Krzywe policzone z zapisanych predykcji modeli (wersja {model_version})."
+    elif 'roc' in snapshot:
+        roc = snapshot.table('roc')
+        illustrative = snapshot.value('roc_illustrative', False)
+        st.subheader("Krzywe ROC (Zbiór Testowy - Wykres Ilustracyjny)" if illustrative else "Krzywe ROC (Zbiór Testowy)")
+        for model, name in model_names.items():
+            curve = roc[roc['model'] == model]
+            if not curve.empty:
+                if metrics is not None and (model, 'test') in metrics.index:
+                    name = f"{name} (AUC {'≈' if illustrative else '='} {metrics.loc[(model, 'test'), 'auc']:.4f})"
+                fig_roc.add_trace(go.Scatter(x=curve['fpr'], y=curve['tpr'], mode='lines', name=name))
+        if illustrative:
+            roc_title = 'Krzywa ROC - Zbiór Testowy (Ilustracja)'
+            roc_caption = "Uwaga: Krzywa ROC jest ilustracją opartą na przykładowych danych dla tej wersji statycznej."
+        else:
+            roc_title = 'Krzywa ROC - Zbiór Testowy'
+            roc_caption = (f"Krzywe ze snapshotu {snapshot.name} "
+                           f"(wersja modeli {snapshot.value('models_version')}).")
+    else:
+        fig_roc = None
+        st.info("Brak krzywych ROC: wybrany snapshot ich nie zawiera, a w rejestrze nie ma zapisanych predykcji.")
+    if fig_roc is not None:
+        fig_roc.add_trace(go.Scatter(x=[0, 1], y=[0, 1], mode='lines', name='Losowy Klasyfikator',
+                                     line=dict(dash='dash')))
+        fig_roc.update_layout(
+            title=roc_title,
+            xaxis_title='False Positive Rate (FPR)',
+            yaxis_title='True Positive Rate (TPR)',
+            legend_title='Model',
+            xaxis=dict(range=[0.0, 1.0]),
+            yaxis=dict(range=[0.0, 1.05])
+        )
+        st.plotly_chart(fig_roc, use_container_width=True)
+        st.caption(roc_caption)
+
+    # --- Analiza progu decyzyjnego (tylko z zapisanymi predykcjami) ---
+    if stored_curves:
+        st.subheader("Analiza Progu Decyzyjnego")
+        split_names = {'val': 'Walidacyjny', 'test': 'Testowy'}
+        available_splits = [split for split in split_names if any(s == split for _, s in stored_curves)]
+        col_split, col_threshold = st.columns([1, 2])
+        with col_split:
+            split = st.radio("Zbiór:", available_splits, format_func=split_names.get, key="threshold_split")
+        with col_threshold:
+            threshold = st.slider("Próg decyzyjny (klasa 1 gdy prawdopodobieństwo ≥ próg):", 0.0, 1.0, 0.5, 0.01,
+                                  key="threshold_value")
+        models = [model for model in model_names if (model, split) in stored_curves]
+
+        metrics_rows = []
+        confusion_cols = st.columns(len(models))
+        for col, model in zip(confusion_cols, models):
+            entry = stored_curves[(model, split)]
+            confusion = entry['summary'].confusion(threshold)
+            rates = curves.threshold_metrics(confusion)
+            metrics_rows.append({'Model': model_names[model], 'AUC-ROC': entry['auc'], 'Average Precision': entry['ap'],
+                                 'Accuracy': rates['accuracy'], 'Precision (1)': rates['precision'],
+                                 'Recall (1)': rates['recall'], 'F1 (1)': rates['f1']})
+            with col:
+                st.markdown(f"**{model_names[model]}** - macierz pomyłek")
+                st.dataframe(pd.DataFrame(confusion, index=['Rzeczywista 0 (miejski)', 'Rzeczywista 1 (wiejski)'],
+                                          columns=['Przewidziana 0', 'Przewidziana 1']))
+        st.dataframe(pd.DataFrame(metrics_rows).style.format({
+            col: '{:.4f}' for col in ['AUC-ROC', 'Average Precision', 'Accuracy', 'Precision (1)', 'Recall (1)', 'F1 (1)']
+        }), hide_index=True)
+
+        if st.checkbox("Pokaż 95% przedziały ufności (bootstrap)", key="threshold_bootstrap"):
+            intervals = pd.concat({model_names[model]: metric_bootstrap(model_version, model, split, threshold)
+                                   for model in models}, names=['Model'])
+            st.dataframe(intervals.reset_index().style.format({
+                col: '{:.4f}' for col in ['Wartość', 'Dolna granica', 'Górna granica', 'Błąd std.']
+            }), hide_index=True)
+            st.caption("2000 replikacji bootstrap zbioru - losowanie wielomianowe par (wynik, etykieta) z zapisanych "
+                       "predykcji, bez ponownego trenowania; granice to percentyle 2,5% i 97,5%.")
+
+        col_pr, col_cal = st.columns(2)
+        with col_pr:
+            fig_pr = go.Figure()
+            for model, row in zip(models, metrics_rows):
+                entry = stored_curves[(model, split)]
+                recall, precision = entry['pr']
+                fig_pr.add_trace(go.Scatter(x=recall, y=precision, mode='lines',
+                                            name=f"{model_names[model]} (AP = {entry['ap']:.4f})"))
+                fig_pr.add_trace(go.Scatter(x=[row['Recall (1)']], y=[row['Precision (1)']], mode='markers',
+                                            marker=dict(size=10), name=f"{model_names[model]} - próg {threshold:.2f}"))
+            fig_pr.update_layout(title='Krzywa Precision-Recall', xaxis_title='Recall', yaxis_title='Precision',
+                                 xaxis=dict(range=[0.0, 1.0]), yaxis=dict(range=[0.0, 1.05]))
+            st.plotly_chart(fig_pr, use_container_width=True)
+        with col_cal:
+            fig_cal = go.Figure()
+            for model in models:
+                mean_score, fraction_pos, _ = stored_curves[(model, split)]['calibration']
+                fig_cal.add_trace(go.Scatter(x=mean_score, y=fraction_pos, mode='lines+markers', name=model_names[model]))
+            fig_cal.add_trace(go.Scatter(x=[0, 1], y=[0, 1], mode='lines', name='Idealna kalibracja', line=dict(dash='dash')))
+            fig_cal.update_layout(title='Krzywa Kalibracji', xaxis_title='Średnie przewidywane prawdopodobieństwo',
+                                  yaxis_title='Odsetek wypadków wiejskich', xaxis=dict(range=[0.0, 1.0]),
+                                  yaxis=dict(range=[0.0, 1.05]))
+            st.plotly_chart(fig_cal, use_container_width=True)
+        st.caption("Krzywe ROC i PR są próbkowane do ~500 punktów na wykres; AUC, AP i macierze pomyłek liczone są "
+                   "na pełnych wektorach predykcji.")
 
     # --- Krzywa Uczenia się (Learning Curve) ---
     st.subheader("Krzywa Uczenia się (F1-score) - XGBoost")
-    train_sizes = np.array([18271, 36542, 54813, 73084, 91355, 109626, 127897, 146168, 164439, 182710])
-    f1_train = np.array([np.nan, 0.85596769, 0.84882457, 0.84334605, 0.83608956, 0.83447398, 0.84805978, 0.87375429, 0.90109748, 0.91796358])
-    f1_val = np.array([np.nan, 0.80674855, 0.82824203, 0.8356456, 0.83552517, 0.83828277, 0.84275766, 0.88375834, 0.89837232, 0.90064811])
-
-    valid_indices = ~np.isnan(f1_train) & ~np.isnan(f1_val)
-    train_sizes = train_sizes[valid_indices]
-    f1_train = f1_train[valid_indices]
-    f1_val = f1_val[valid_indices]
-
-    fig_learning = plt.figure(figsize=(10, 6))
-    plt.plot(train_sizes, f1_train, label='F1-score XGBoost (trening)', color='blue', marker='o')
-    plt.plot(train_sizes, f1_val, label='F1-score XGBoost (walidacja)', color='cyan', marker='o')
-    plt.fill_between(train_sizes, f1_train - 0.01, f1_train + 0.01, alpha=0.1, color='blue')
-    plt.fill_between(train_sizes, f1_val - 0.01, f1_val + 0.01, alpha=0.1, color='cyan')
-
-    plt.title('Krzywa uczenia (F1-score) - XGBoost', fontsize=14)
-    plt.xlabel('Rozmiar zbioru treningowego', fontsize=12)
-    plt.ylabel('F1-score', fontsize=12)
-    plt.legend(loc='best')
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    st.pyplot(fig_learning)
-
-    st.markdown("""
-    **Interpretacja:**
-    - **XGBoost**: Lepszy od RandomForest pod względem AUC-ROC (0.9400 vs 0.9327) i F1-score dla klasy wiejskiej (0.81 vs 0.79). Wyższy balans precision-recall.
-    - **Krzywa uczenia**: F1-score rośnie z rozmiarem danych, stabilizując się na poziomie 0.90 (walidacja) i 0.92 (trening), co wskazuje na dobrą generalizację.
-    - **Wniosek**: XGBoost wybrano do dalszej analizy ze względu na wyższą skuteczność i stabilność.
-    """)
-
-elif section == "Ważność Cech (XGBoost)":
-    st.title("Ważność Cech według Modelu XGBoost (Wyniki Statyczne)")
-    st.markdown("Pokazuje, które cechy miały największy wpływ na predykcje modelu XGBoost w oryginalnej analizie.")
-
-    # --- Statyczne Dane Ważności Cech (Top 12) ---
-    feature_importance_data = {
-        'Cecha': [
-            'speed_limit_normalized',
-            'urban_driver_speed',
-            'is_urban_driver',
-            'distance_speed_interaction',
-            'junction_detail_1.0',
-            'road_type_6',
-            'junction_control_4.0',
-            'light_conditions_6.0',
-            'casualty_type_9.0',
-            'important_driver_distance',
-            'urban_driver_long_distance',
-            'skidding_and_overturning_9.0'
-        ],
-        'Ważność': [0.1827, 0.1711, 0.0566, 0.0543, 0.0291, 0.0268, 0.0242, 0.0231, 0.0170, 0.0166, 0.0148, 0.0132]
-    }
-    top_features = pd.DataFrame(feature_importance_data)
-
-    st.subheader("Top 12 najważniejszych cech")
-    st.dataframe(top_features.style.format({'Ważność': '{:.4f}'}))
-
-    # Wizualizacja
-    st.subheader("Wykres Ważności Cech (Odtworzony)")
-    fig_imp = plt.figure(figsize=(10, 8))
-    plt.barh(top_features['Cecha'], top_features['Ważność'], color='skyblue')
-    plt.xlabel('Ważność (Importance)')
-    plt.ylabel('Cecha')
-    plt.title('Ważność Cech (XGBoost) - Top 12')
-    plt.gca().invert_yaxis()
-    plt.tight_layout()
-    st.pyplot(fig_imp)
-
-    st.markdown("""
-    **Interpretacja:**
-    - **speed_limit_normalized**: Wyższe limity prędkości (typowe dla dróg wiejskich) są kluczowym predyktorem.
-    - **urban_driver_speed**: Kierowcy z miast jeżdżący szybciej na wsiach są bardziej narażeni.
-    - **is_urban_driver**: Pochodzenie kierowcy ma istotny wpływ.
-    - **distance_speed_interaction**: Dłuższe trasy z wyższą prędkością zwiększają ryzyko.
-    - **junction_detail_1.0**: Skrzyżowania typu Y są ryzykowne na wsiach.
-    - **road_type_6**: Drogi jednopasmowe dominują w wypadkach wiejskich.
-    - **junction_control_4.0**: Brak kontroli ruchu zwiększa ryzyko.
-    - **light_conditions_6.0**: Ciemność bez oświetlenia to istotny czynnik.
-    """)
-
-elif section == "Analiza Kluczowych Cech (Chi-kwadrat)":
-    st.title("Szczegółowa Analiza Kluczowych Cech vs Lokalizacja Wypadku (Test Chi-kwadrat - Wyniki Statyczne)")
-
-    # --- Statyczne wyniki testów Chi-kwadrat ---
-    chi2_results_data = {
-        'Cecha': [
-            'is_urban_driver', 'road_type', 'junction_control', 'junction_detail',
-            'important_driver_distance', 'light_conditions', 'casualty_type'
-        ],
-        'chi2': [42475.6, 349.1, 9180.7, 2669.3, 13160.5, 13593.7, 8562.5],
-        'p_value': [0.0, 1.543e-76, 0.0, 0.0, 0.0, 0.0, 0.0],
-        'V': [0.394, 0.036, 0.183, 0.099, 0.220, 0.223, 0.177],
-        'Interpretacja': ['Umiarkowany związek', 'Słaby związek', 'Umiarkowany związek', 'Słaby związek', 'Umiarkowany związek', 'Umiarkowany związek', 'Umiarkowany związek']
-    }
-    results_df = pd.DataFrame(chi2_results_data).set_index('Cecha')
+    if 'learning_curve' in snapshot:
+        st.image(learning_curve_png(snapshot_key(snapshot)), use_column_width=True)
+    else:
+        st.info("Wybrany snapshot nie zawiera krzywej uczenia - zapisuje ją komórka trenowania w notatniku "
+                "(`build_snapshot(..., learning_curve=xgb_eval['learning_curve'])`).")
+
+    # --- Interpretacja z metryk i krzywej uczenia wybranego snapshotu ---
+    if metrics is None or not {('xgb', 'test'), ('rf', 'test')} <= set(metrics.index):
+        st.markdown("""
+        **Interpretacja (oryginalna analiza 2021-2023):**
+        - **XGBoost**: Lepszy od RandomForest pod względem AUC-ROC (0.9400 vs 0.9327) i F1-score dla klasy wiejskiej (0.81 vs 0.79). Wyższy balans precision-recall.
+        - **Krzywa uczenia**: F1-score rośnie z rozmiarem danych, stabilizując się na poziomie 0.90 (walidacja) i 0.92 (trening), co wskazuje na dobrą generalizację.
+        - **Wniosek**: XGBoost wybrano do dalszej analizy ze względu na wyższą skuteczność i stabilność.
+        """)
+        return
+    test = metrics.xs('test', level='split')
+    auc_xgb, auc_rf = test.loc['xgb', 'auc'], test.loc['rf', 'auc']
+    f1_xgb, f1_rf = report_f1(test.loc['xgb', 'report']), report_f1(test.loc['rf', 'report'])
+    xgb_better = auc_xgb >= auc_rf
+    lines = [f"- **{'XGBoost' if xgb_better else 'RandomForest'}**: Wyższe AUC-ROC na zbiorze testowym "
+             f"(XGBoost {auc_xgb:.4f} vs RandomForest {auc_rf:.4f})"
+             + (f"; F1-score dla klasy wiejskiej: {f1_xgb:.2f} vs {f1_rf:.2f}." if None not in (f1_xgb, f1_rf) else ".")]
+    if 'learning_curve' in snapshot:
+        last = snapshot.table('learning_curve').dropna().iloc[-1]
+        gap = last['f1_train'] - last['f1_val']
+        lines.append(f"- **Krzywa uczenia**: Przy pełnym zbiorze treningowym F1-score wynosi {last['f1_val']:.2f} "
+                     f"(walidacja) i {last['f1_train']:.2f} (trening); "
+                     + ("niewielka różnica wskazuje na dobrą generalizację." if abs(gap) < 0.05
+                        else "różnica wskazuje na przeuczenie modelu."))
+    lines.append("- **Wniosek**: XGBoost wybrano do dalszej analizy ze względu na wyższą skuteczność." if xgb_better
+                 else "- **Wniosek**: W tym snapshocie RandomForest ma wyższe AUC-ROC; dalsze sekcje (ważność cech, "
+                      "symulacja) nadal opisują model XGBoost.")
+    st.markdown("**Interpretacja:**\n" + "\n".join(lines))
+
+
+def render_feature_importance(live, snapshot):
+    model_version = snapshot_models_version(snapshot)
+    shap_explanation = load_shap_explanation(model_version) if model_version else None
+
+    if shap_explanation is not None:
+        import plotly.express as px
+        import plotly.graph_objects as go
+
+        from wypadki.features import categorical_features
+
+        st.title("Ważność Cech według Modelu XGBoost (Wartości SHAP)")
+        show_stale_models_warning()
+        st.markdown("Wartości SHAP (natywny TreeSHAP XGBoost) dla rekordów zbioru testowego, zsumowane z kolumn "
+                    "zero-jedynkowych do cech źródłowych. Wartość dodatnia przesuwa predykcję w stronę wypadku na "
+                    "terenie wiejskim, ujemna - miejskiego (skala log-odds).")
+        st.caption(f"Wersja modeli: {model_version}, rekordów: {len(shap_explanation.values):,}")
+
+        importance = shap_explanation.global_importance()
+        st.subheader("Globalna ważność cech (średnia |SHAP|)")
+        fig_shap_bar = px.bar(importance.iloc[::-1], x='Średni |SHAP|', y='Cecha', orientation='h',
+                              color='Średni SHAP', color_continuous_scale='RdBu_r', color_continuous_midpoint=0)
+        fig_shap_bar.update_layout(height=600)
+        st.plotly_chart(fig_shap_bar, use_container_width=True)
+
+        # Wykres podsumowujący: próbka rekordów, kolor = pozycja wartości cechy (percentyl w obrębie cechy)
+        st.subheader("Wykres podsumowujący SHAP (12 najważniejszych cech)")
+        top_shap = importance['Cecha'].head(12).tolist()
+        sample = shap_explanation.values.sample(n=min(2000, len(shap_explanation.values)), random_state=42).index
+        jitter = np.random.default_rng(42).uniform(-0.3, 0.3, len(sample))
+        fig_summary = go.Figure()
+        for i, feature in enumerate(top_shap):
+            fig_summary.add_trace(go.Scattergl(
+                x=shap_explanation.values.loc[sample, feature], y=len(top_shap) - 1 - i + jitter, mode='markers',
+                marker=dict(size=4, color=shap_explanation.features.loc[sample, feature].rank(pct=True),
+                            colorscale='Bluered', cmin=0, cmax=1, showscale=(i == 0),
+                            colorbar=dict(title='Wartość cechy<br>(percentyl)')),
+                name=feature, showlegend=False,
+                hovertemplate=f'{feature}<br>SHAP: %{{x:.3f}}<extra></extra>'))
+        fig_summary.update_layout(height=600, xaxis_title='Wartość SHAP (wpływ na log-odds)',
+                                  yaxis=dict(tickmode='array', tickvals=list(range(len(top_shap))),
+                                             ticktext=top_shap[::-1]))
+        st.plotly_chart(fig_summary, use_container_width=True)
+
+        # Wykres zależności: wartość cechy vs jej SHAP
+        st.subheader("Wykres zależności SHAP")
+        feature = st.selectbox("Cecha:", importance['Cecha'].tolist(), key="shap_dependence_feature")
+        dependence = pd.DataFrame({'Wartość cechy': shap_explanation.features.loc[sample, feature],
+                                   'SHAP': shap_explanation.values.loc[sample, feature]})
+        if feature in categorical_features:
+            dependence['Wartość cechy'] = dependence['Wartość cechy'].map('{:g}'.format)
+            fig_dependence = px.box(dependence.sort_values('Wartość cechy'), x='Wartość cechy', y='SHAP')
+        else:
+            fig_dependence = px.scatter(dependence, x='Wartość cechy', y='SHAP', opacity=0.5)
+        fig_dependence.add_hline(y=0, line_dash='dash', line_color='gray')
+        fig_dependence.update_layout(title=f'Zależność SHAP: {feature}')
+        st.plotly_chart(fig_dependence, use_container_width=True)
+        st.caption("Wykresy podsumowujący i zależności pokazują losową próbkę do 2000 rekordów; średnie liczone są "
+                   "na całym zbiorze testowym.")
+    else:
+        st.title(f"Ważność Cech według Modelu XGBoost ({results_label(live, from_snapshot=True)})")
+        st.markdown(f"Pokazuje, które cechy miały największy wpływ na predykcje modelu XGBoost (snapshot {snapshot.name}).")
+
+        if 'feature_importance' not in snapshot:
+            st.info("Wybrany snapshot nie zawiera ważności cech (utworzony bez wersji modeli z rejestru).")
+            return
+        top_features = snapshot.table('feature_importance')
+
+        st.subheader("Top 12 najważniejszych cech")
+        st.dataframe(top_features.style.format({'Ważność': '{:.4f}'}))
+
+        # Wizualizacja
+        st.subheader("Wykres Ważności Cech (Odtworzony)")
+        st.image(static_importance_png(top_features), use_column_width=True)
+
+        st.markdown("""
+        **Interpretacja (oryginalna analiza 2021-2023):**
+        - **speed_limit_normalized**: Wyższe limity prędkości (typowe dla dróg wiejskich) są kluczowym predyktorem.
+        - **urban_driver_speed**: Kierowcy z miast jeżdżący szybciej na wsiach są bardziej narażeni.
+        - **is_urban_driver**: Pochodzenie kierowcy ma istotny wpływ.
+        - **distance_speed_interaction**: Dłuższe trasy z wyższą prędkością zwiększają ryzyko.
+        - **junction_detail_1.0**: Skrzyżowania typu Y są ryzykowne na wsiach.
+        - **road_type_6**: Drogi jednopasmowe dominują w wypadkach wiejskich.
+        - **junction_control_4.0**: Brak kontroli ruchu zwiększa ryzyko.
+        - **light_conditions_6.0**: Ciemność bez oświetlenia to istotny czynnik.
+        """)
+
+
+def render_key_features(live, snapshot):
+    st.title(f"Szczegółowa Analiza Kluczowych Cech vs Lokalizacja Wypadku (Test Chi-kwadrat - {results_label(live)})")
+
+    if live:
+        from wypadki import cube
+
+        results_df = cube.cube_key_feature_tests(live['cube'])
+    else:
+        results_df = snapshot.table('key_feature_tests')
+
+    if live:
+        # 95% przedziały ufności V z replikacji bootstrap tabel liczności (wycinek kostki po filtrach)
+        intervals = association_bootstrap(cube.cube_key_feature_tables(live['cube']))
+        results_df['V (dolna 95%)'] = intervals['V: Dolna granica']
+        results_df['V (górna 95%)'] = intervals['V: Górna granica']
 
     st.subheader("Wyniki Testów Chi-kwadrat dla Kluczowych Cech")
     st.dataframe(results_df.style.format({
         'chi2': '{:.1f}',
         'p_value': '{:.1e}',
-        'V': '{:.3f}'
+        'V': '{:.3f}',
+        'V (dolna 95%)': '{:.3f}',
+        'V (górna 95%)': '{:.3f}',
     }))
+    if live:
+        st.caption("Przedziały ufności V: bootstrap (2000 replikacji tabel liczności, percentyle 2,5% i 97,5%).")
+
+    st.markdown(key_features_interpretation(results_df))
+
+    if live:
+        st.subheader("Wszystkie Cechy Kategoryczne vs Lokalizacja Wypadku")
+        st.caption("Pełny zbiór danych (bez filtrów), kategorie bez łączenia; posortowane według V Craméra.")
+        all_features = live_association_table(live['version'], live['source'])
+        intervals = live_association_bootstrap(live['version'], live['source'])
+        all_features['V (dolna 95%)'] = all_features['Cecha'].map(intervals['V: Dolna granica'])
+        all_features['V (górna 95%)'] = all_features['Cecha'].map(intervals['V: Górna granica'])
+        st.dataframe(all_features.style.format({
+            'chi2': '{:.1f}',
+            'p_value': '{:.1e}',
+            'V': '{:.3f}',
+            'n': '{:,.0f}',
+            'V (dolna 95%)': '{:.3f}',
+            'V (górna 95%)': '{:.3f}',
+        }), hide_index=True)
+
+
+# Górny limit punktów na mapie (komórki o największej liczbie rekordów); większe mapy spowalniają przeglądarkę
+MAX_MAP_CELLS = 20_000
+
+
+def render_hotspot_map(live, snapshot):
+    st.title("Mapa Wypadków: Skupiska Wypadków Wiejskich i Miejskich")
+    if not live:
+        st.info("Mapa jest liczona ze współrzędnych wypadków STATS19 - włącz **Obliczenia na żywo (z danych)** "
+                "w pasku bocznym.")
+        return
+
+    import plotly.graph_objects as go
+    from wypadki import registry, spatial
+
+    show_stale_models_warning()
+    model_version = registry.latest_version()
+    index = load_spatial_index(live['version'], live['source'], model_version)
+    if index is None:
+        st.warning("Dane nie zawierają współrzędnych wypadków (magazyn zbudowany przed ich dodaniem). "
+                   "Przebuduj magazyn: `python -m wypadki.refresh --init`.")
+        return
 
     st.markdown("""
-    **Interpretacja:**
-    - Wszystkie cechy wykazują statystycznie istotny związek (p < 0.05) z lokalizacją wypadku.
-    - **is_urban_driver** ma najsilniejszy związek (V=0.394), co potwierdza jego kluczową rolę.
-    - **important_driver_distance**, **light_conditions** i **junction_control** mają umiarkowany wpływ (V > 0.18).
-    - **road_type** i **junction_detail** wykazują słabszy związek (V < 0.1), ale nadal są istotne.
+    Wypadki zliczone w komórkach siatki (środek punktu = średnie położenie wypadków w komórce, rozmiar ~ liczba
+    rekordów). Kolor pokazuje **odsetek wypadków wiejskich** albo **średnie przewidywane P(wypadek wiejski)**
+    modelu XGBoost - różnica wskazuje obszary, w których model nie docenia lub przecenia ryzyko.
     """)
 
-elif section == "Wnioski i Podsumowanie":
+    years = sorted(index['cells']['accident_year'].unique().tolist())
+    col_level, col_driver, col_years = st.columns([1, 1, 2])
+    level = col_level.selectbox("Rozmiar komórki:", list(spatial.GRID_LEVELS), index=1, key="map_level")
+    driver = col_driver.selectbox("Kierowcy:", ["Wszyscy", "Miejscy", "Niemiejscy"], key="map_driver")
+    selected_years = col_years.multiselect("Lata (brak zaznaczenia = wszystkie):", years, key="map_years")
+    metrics = {'rural_share': "Odsetek wypadków wiejskich"}
+    if model_version is not None:
+        metrics['mean_proba'] = "Średnie przewidywane P(wiejski)"
+        metrics['proba_gap'] = "Różnica: przewidywane P - odsetek"
+    col_metric, col_min = st.columns(2)
+    metric = col_metric.radio("Kolor:", list(metrics), format_func=metrics.get, horizontal=True, key="map_metric")
+    min_count = col_min.slider("Minimalna liczba rekordów w komórce:", 1, 50, 5, key="map_min_count")
+
+    urban_driver = {"Wszyscy": None, "Miejscy": True, "Niemiejscy": False}[driver]
+    cells = spatial.hotspot_cells(index['cells'], level, selected_years, urban_driver, min_count)
+    if cells.empty:
+        st.info("Brak komórek spełniających kryteria.")
+        return
+    cells['proba_gap'] = cells['mean_proba'] - cells['rural_share']
+
+    shown = cells.head(MAX_MAP_CELLS)
+    gap = metric == 'proba_gap'
+    hover = ("Rekordy: %{customdata[0]:,}<br>Wiejskie: %{customdata[1]:,}<br>"
+             "Odsetek wiejskich: %{customdata[2]:.1%}")
+    if model_version is not None:
+        hover += "<br>Przewidywane P: %{customdata[3]:.1%}"
+    fig = go.Figure(go.Scattermapbox(
+        lat=shown['latitude'], lon=shown['longitude'], mode='markers',
+        marker=dict(size=4 + 26 * np.sqrt(shown['count'] / shown['count'].max()), color=shown[metric],
+                    colorscale='RdBu_r' if gap else 'YlOrRd', cmin=-0.5 if gap else 0, cmax=0.5 if gap else 1,
+                    colorbar=dict(title=metrics[metric], tickformat='.0%'), opacity=0.75),
+        customdata=shown[['count', 'rural', 'rural_share', 'mean_proba']].to_numpy(),
+        hovertemplate=hover + "<extra></extra>",
+    ))
+    fig.update_layout(
+        mapbox=dict(style='open-street-map', zoom=5,
+                    center=dict(lat=float(shown['latitude'].median()), lon=float(shown['longitude'].median()))),
+        height=650, margin=dict(l=0, r=0, t=0, b=0),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"Komórki: {len(shown):,} z {len(cells):,} (rekordy na mapie: {shown['count'].sum():,}). "
+               f"Rekordy bez współrzędnych są pomijane na mapie, ale liczone w tabeli jednostek samorządu.")
+
+    labels = {'count': 'Rekordy', 'rural': 'Wypadki wiejskie', 'rural_share': 'Odsetek wiejskich',
+              'mean_proba': 'Śr. przewidywane P', 'proba_gap': 'Różnica P - odsetek'}
+    formats = {'Rekordy': '{:,.0f}', 'Wypadki wiejskie': '{:,.0f}', 'Odsetek wiejskich': '{:.1%}',
+               'Śr. przewidywane P': '{:.1%}', 'Różnica P - odsetek': '{:+.1%}', 'Szerokość': '{:.3f}',
+               'Długość': '{:.3f}'}
+    value_columns = list(labels) if model_version is not None else ['count', 'rural', 'rural_share']
+
+    st.subheader("Skupiska wypadków wiejskich (najwięcej wypadków wiejskich w komórce)")
+    hotspots = cells.nlargest(15, 'rural')[['latitude', 'longitude'] + value_columns]
+    hotspots = hotspots.rename(columns={'latitude': 'Szerokość', 'longitude': 'Długość', **labels})
+    st.dataframe(hotspots.style.format(formats, na_rep='-'), hide_index=True)
+
+    st.subheader("Jednostki samorządu (local_authority_ons_district)")
+    districts = spatial.district_table(index['districts'], selected_years, urban_driver)
+    districts['proba_gap'] = districts['mean_proba'] - districts['rural_share']
+    districts = districts[[spatial.DISTRICT_COLUMN] + value_columns].head(30)
+    districts = districts.rename(columns={spatial.DISTRICT_COLUMN: 'Kod jednostki', **labels})
+    st.dataframe(districts.style.format(formats, na_rep='-'), hide_index=True)
+
+
+def render_drift(live, snapshot):
+    st.title("Monitorowanie Dryfu: Rozkłady Cech i Skuteczność Modeli w Kolejnych Latach")
+    if not live:
+        st.info("Dryf jest liczony z histogramów cech danych STATS19 - włącz **Obliczenia na żywo (z danych)** "
+                "w pasku bocznym.")
+        return
+
+    import plotly.express as px
+    from wypadki import drift, registry
+
+    histograms = live_histograms(live['version'], live['source'])
+    years = sorted(int(year) for year in histograms['accident_year'].unique())
+    st.markdown("""
+    Rozkład każdej cechy w danym roku porównywany jest z latami wcześniejszymi wyłącznie na podstawie zapisanych
+    histogramów (bez ponownego przeglądania danych). **PSI** (Population Stability Index): < 0.1 - rozkład stabilny,
+    0.1–0.25 - umiarkowana zmiana, > 0.25 - istotny dryf. **KS** (tylko cechy uporządkowane) i **chi-kwadrat** testują
+    równość rozkładów - przy setkach tysięcy rekordów nawet niewielkie różnice są istotne, dlatego o skali zmiany
+    decyduje PSI.
+    """)
+    if len(years) < 2:
+        st.info("Dane obejmują jeden rok - dryf można ocenić po dopisaniu kolejnego roku (`python -m wypadki.refresh`).")
+        return
+
+    st.subheader("PSI cech: rok względem wszystkich wcześniejszych lat")
+    matrix = drift.drift_matrix(histograms)
+    fig_psi = px.imshow(matrix, text_auto='.3f', aspect='auto', color_continuous_scale='RdYlGn_r', zmin=0, zmax=0.3,
+                        labels=dict(x='Rok', y='Cecha', color='PSI'))
+    fig_psi.update_xaxes(type='category')
+    fig_psi.update_layout(height=max(400, 28 * len(matrix)))
+    st.plotly_chart(fig_psi, use_container_width=True)
+
+    col_year, col_reference = st.columns([1, 2])
+    year = col_year.selectbox("Rok:", years[1:], index=len(years) - 2, key="drift_year")
+    earlier = [y for y in years if y < year]
+    reference_years = col_reference.multiselect("Lata odniesienia:", earlier, default=earlier, key="drift_reference")
+    if not reference_years:
+        st.info("Wybierz co najmniej jeden rok odniesienia.")
+        return
+    table = drift.compare_year(histograms, year, reference_years)
+    st.dataframe(table.style.format({'PSI': '{:.4f}', 'KS D': '{:.4f}', 'KS p': '{:.1e}', 'chi2': '{:,.1f}',
+                                     'chi2 p': '{:.1e}'}, na_rep='-'), hide_index=True)
+
+    feature = st.selectbox("Rozkład cechy:", table['Cecha'].tolist(), key="drift_feature")
+    reference = drift.distributions_for(histograms, feature, reference_years)
+    current = drift.distributions_for(histograms, feature, [year])
+    shares = pd.concat({f"Lata {', '.join(map(str, reference_years))}": reference / reference.sum(),
+                        f"Rok {year}": current / current.sum()}, axis=1).fillna(0)
+    shares = shares.rename_axis('Wartość').reset_index().melt(id_vars='Wartość', var_name='Okres', value_name='Udział')
+    shares['Wartość'] = shares['Wartość'].map('{:g}'.format)
+    fig_share = px.bar(shares, x='Wartość', y='Udział', color='Okres', barmode='group',
+                       title=f"Rozkład cechy {feature}")
+    fig_share.update_layout(yaxis_tickformat='.0%')
+    st.plotly_chart(fig_share, use_container_width=True)
+
+    st.subheader("Skuteczność modeli w kolejnych latach (z zapisanych predykcji)")
+    model_version = registry.latest_version()
+    yearly = yearly_model_auc(model_version) if model_version else None
+    if yearly is None or yearly.empty:
+        st.info("Brak predykcji z rokiem wypadku - uruchom ponownie komórkę trenowania w notatniku, która zapisuje "
+                "rok każdego wiersza zbiorów walidacyjnego i testowego.")
+        return
+    show_stale_models_warning()
+    model_names = {'xgb': 'XGBoost', 'rf': 'Random Forest'}
+    split_names = {'val': 'Walidacyjny', 'test': 'Testowy'}
+    yearly = yearly.assign(model=yearly['model'].map(model_names), split=yearly['split'].map(split_names))
+    fig_auc = px.line(yearly, x='year', y='auc', color='model', line_dash='split', markers=True,
+                      labels={'year': 'Rok', 'auc': 'AUC-ROC', 'model': 'Model', 'split': 'Zbiór'},
+                      title='AUC-ROC w kolejnych latach')
+    fig_auc.update_xaxes(type='category')
+    st.plotly_chart(fig_auc, use_container_width=True)
+    st.dataframe(yearly.rename(columns={
+        'model': 'Model', 'split': 'Zbiór', 'year': 'Rok', 'n': 'Rekordy', 'rural_share': 'Odsetek wiejskich',
+        'mean_proba': 'Śr. przewidywane P', 'auc': 'AUC-ROC',
+    }).style.format({'Rekordy': '{:,.0f}', 'Odsetek wiejskich': '{:.1%}', 'Śr. przewidywane P': '{:.1%}',
+                     'AUC-ROC': '{:.4f}'}), hide_index=True)
+    st.caption(f"Wersja modeli: {model_version}. Spadek AUC lub rozjazd średniego przewidywanego P i odsetka "
+               "wypadków wiejskich w nowszych latach wskazuje na potrzebę ponownego trenowania.")
+
+
+def render_segment_models(live, snapshot):
+    st.title("Modele Segmentowe: Porównanie Segmentów i Zmiennych Docelowych")
+    from wypadki import segments
+
+    file = segments.SEGMENTS_DIR / segments.COMPARISON_FILE
+    comparison = segment_comparison(file.stat().st_mtime_ns) if file.exists() else None
+    if comparison is None:
+        st.info("Brak porównania modeli segmentowych - uruchom `python -m wypadki.segments`, które trenuje "
+                "równolegle modele dla grup poszkodowanych, lat i pasm limitu prędkości.")
+        return
+
+    import plotly.express as px
+
+    st.markdown("""
+    Dla każdej zmiennej docelowej trenowany jest model XGBoost (hiperparametry jak w głównym modelu) na całej
+    populacji oraz osobno w każdym segmencie. Wszystkie modele mają wspólny podział na zbiór treningowy i testowy,
+    więc **AUC modelu ogólnego** to wynik modelu całej populacji na tych samych rekordach testowych segmentu,
+    a **Zmiana AUC** pokazuje, ile daje osobny model segmentu. Segmenty ze zbyt małą liczbą rekordów są pomijane.
+    """)
+    table, run = comparison['table'], comparison['run']
+    target = st.selectbox("Zmienna docelowa:", list(table['Cel'].unique()), key="segment_target",
+                          format_func=lambda name: segments.TARGETS.get(name, name))
+    part = table[table['Cel'] == target].drop(columns='Cel')
+    trained = part[part['Status'] == 'ok']
+    if not trained.empty:
+        auc = trained.assign(Segment=np.where(trained['Wymiar'] == '-', trained['Segment'],
+                                              trained['Wymiar'] + ': ' + trained['Segment']))
+        auc = auc.melt(id_vars='Segment', value_vars=['AUC', 'AUC modelu ogólnego'], var_name='Model',
+                       value_name='AUC-ROC').replace({'Model': {'AUC': 'Model segmentu',
+                                                                'AUC modelu ogólnego': 'Model ogólny'}})
+        fig_auc = px.bar(auc, x='Segment', y='AUC-ROC', color='Model', barmode='group',
+                         title=f"AUC-ROC w segmentach: {segments.TARGETS.get(target, target)}")
+        fig_auc.update_yaxes(range=[max(0.0, auc['AUC-ROC'].min() - 0.05), 1])
+        st.plotly_chart(fig_auc, use_container_width=True)
+    st.dataframe(part.style.format({
+        'Rekordy': '{:,.0f}', 'Odsetek klasy 1': '{:.1%}', 'AUC': '{:.4f}', 'AUC modelu ogólnego': '{:.4f}',
+        'Zmiana AUC': '{:+.4f}', 'Average Precision': '{:.4f}', 'F1': '{:.4f}', 'Trening [s]': '{:.1f}',
+    }, na_rep='-'), hide_index=True)
+    if run:
+        st.caption(f"Przebieg z {run['created']}: {run['rows']:,} rekordów, {run['specs']} modeli w "
+                   f"{run['wall_seconds']:.0f} s ({run['n_jobs']} procesów z {run['cpu_count']} rdzeni, suma czasów "
+                   f"treningu {run['train_seconds']:.0f} s).")
+
+
+def render_what_if(live, snapshot):
+    from wypadki import registry
+
+    st.title("Symulacja Predykcji: Prawdopodobieństwo Wypadku na Terenie Wiejskim")
+    show_stale_models_warning()
+
+    model_version = registry.latest_version()
+    if model_version is None:
+        st.info("Brak zapisanych modeli. Uruchom notatnik `AnalizaWypadki_v3.ipynb` - komórka trenowania "
+                "zapisuje modele XGBoost i RandomForest do katalogu `models/`.")
+    else:
+        bundle = load_model_bundle(model_version)
+        categories = bundle.vocab.categories
+        st.caption(f"Wersja modeli: {bundle.version}")
+
+        # Opisy wybranych kodów STATS19
+        code_labels = {
+            'road_type': {1: "Rondo", 2: "Jednokierunkowa", 3: "Dwujezdniowa", 6: "Jednojezdniowa",
+                          7: "Łącznica", 9: "Nieznany", 12: "Jednokierunkowa/łącznica"},
+            'light_conditions': {1: "Dzień", 4: "Ciemność - oświetlenie włączone", 5: "Ciemność - oświetlenie wyłączone",
+                                 6: "Ciemność - brak oświetlenia", 7: "Ciemność - nieznane oświetlenie"},
+            'junction_control': {0: "Brak skrzyżowania", 1: "Osoba kierująca ruchem", 2: "Sygnalizacja świetlna",
+                                 3: "Znak stop", 4: "Znak ustąp pierwszeństwa / brak kontroli", 9: "Nieznane"},
+            'driver_distance_banding': {1: "< 5 km", 2: "5-10 km", 3: "10-20 km", 4: "20-100 km", 5: "> 100 km"},
+        }
+
+        def code_select(column, label, container, default=None):
+            options = [int(code) for code in categories[column]]
+            labels = code_labels.get(column, {})
+            index = options.index(default) if default in options else 0
+            return container.selectbox(label, options, index=index,
+                                       format_func=lambda code: f"{code} - {labels[code]}" if code in labels else str(code))
+
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.markdown("**Kierowca**")
+            home_area = st.selectbox("Miejsce zamieszkania kierowcy", [1, 2],
+                                     format_func=lambda code: "Miejskie" if code == 1 else "Niemiejskie")
+            age_of_driver = st.number_input("Wiek kierowcy", min_value=17, max_value=100, value=35)
+            distance = code_select('driver_distance_banding', "Odległość od miejsca zamieszkania", st, default=2)
+            imd_decile = st.slider("Decyl IMD kierowcy (driver_imd_decile)", 1, 10, 5)
+        with col2:
+            st.markdown("**Droga i warunki**")
+            road_type = code_select('road_type', "Typ drogi", st, default=6)
+            speed_limit = st.selectbox("Limit prędkości (mph)", [20, 30, 40, 50, 60, 70], index=1)
+            light = code_select('light_conditions', "Warunki oświetlenia", st, default=1)
+            weather = code_select('weather_conditions', "Warunki pogodowe (kod)", st, default=1)
+            hour = st.slider("Godzina", 0, 23, 12)
+        with col3:
+            st.markdown("**Zdarzenie**")
+            junction_control = code_select('junction_control', "Kontrola skrzyżowania", st, default=4)
+            junction_detail = code_select('junction_detail', "Szczegóły skrzyżowania (kod)", st, default=0)
+            skidding = code_select('skidding_and_overturning', "Poślizg / przewrócenie (kod)", st, default=0)
+            casualty_type = code_select('casualty_type', "Typ poszkodowanego (kod)", st, default=9)
+            age_of_casualty = st.number_input("Wiek poszkodowanego", min_value=0, max_value=100, value=35)
+            n_casualties = st.number_input("Liczba poszkodowanych", min_value=1, max_value=20, value=1)
+
+        record = pd.DataFrame([{
+            'time': f"{hour:02d}:00", 'road_type': road_type, 'light_conditions': light,
+            'junction_detail': junction_detail, 'junction_control': junction_control, 'weather_conditions': weather,
+            'speed_limit': speed_limit, 'number_of_casualties': n_casualties, 'age_of_casualty': age_of_casualty,
+            'casualty_type': casualty_type, 'driver_home_area_type': home_area, 'driver_distance_banding': distance,
+            'driver_imd_decile': imd_decile, 'age_of_driver': age_of_driver, 'skidding_and_overturning': skidding,
+        }])
+
+        st.subheader("Wynik")
+        result_cols = st.columns(2)
+        for result_col, (model_name, model_label) in zip(result_cols, [('xgb', "XGBoost"), ('rf', "Random Forest")]):
+            if getattr(bundle, 'booster' if model_name == 'xgb' else 'rf') is None:
+                continue
+            start = time.perf_counter()
+            proba = float(bundle.predict(record, model_name)[0])
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            result_col.metric(f"{model_label}: P(wypadek wiejski)", f"{proba:.1%}")
+            result_col.caption(f"Czas predykcji: {elapsed_ms:.1f} ms")
+
+
+def render_conclusions(live, snapshot):
     st.title("Wnioski Końcowe i Podsumowanie Analizy")
 
+    # Liczby z wybranego snapshotu; zdania bez pokrycia w snapshocie opisują oryginalną analizę 2021-2023
+    association = snapshot.value('association')
+    location_stats = snapshot.table('association_location_stats')
+    nonurban, urban = location_stats.loc['Niemiejski'], location_stats.loc['Miejski']
+    rural_ratio = nonurban['Wypadki Wiejskie (%)'] / urban['Wypadki Wiejskie (%)']
+    test_auc = {}
+    if 'model_metrics' in snapshot:
+        metrics = snapshot.table('model_metrics')
+        test_auc = metrics[metrics['split'] == 'test'].set_index('model')['auc'].to_dict()
+    if {'xgb', 'rf'} <= set(test_auc):
+        modeling = (f"XGBoost osiągnął AUC-ROC {test_auc['xgb']:.4f}, RandomForest {test_auc['rf']:.4f}"
+                    + (", co obala hipotezę o niskiej skuteczności modeli ML." if min(test_auc.values()) >= 0.8 else "."))
+    else:
+        modeling = "Wybrany snapshot nie zawiera metryk modeli."
+    if 'feature_importance' in snapshot:
+        top_features = snapshot.table('feature_importance')['Cecha'].head(8)
+        key_factors = f"{feature_list(top_features)} to najważniejsze cechy według XGBoost."
+    else:
+        key_factors = "Wybrany snapshot nie zawiera ważności cech."
+
     st.header("Podsumowanie Wyników")
-    st.markdown("""
+    st.caption(f"Wartości ze snapshotu {snapshot.name} (lata {', '.join(map(str, snapshot.years))}).")
+    st.markdown(f"""
     1. **Związek miejsca zamieszkania z lokalizacją wypadku:**
-       - Istnieje **statystycznie istotny, umiarkowany związek** (φ = 0.394, p < 0.0001).
-       - Kierowcy niemiejscy mają ponad trzykrotnie wyższe prawdopodobieństwo wypadków wiejskich (68.4%) niż miejscy (21.7%).
-       - Kierowcy miejscy dominują w wypadkach miejskich (78.3%).
-       - Hipoteza o większym ryzyku kierowców miejskich na wsiach **nie potwierdzona**.
+       - {'Istnieje **statystycznie istotny związek**' if association['p_value'] < association['alpha'] else '**Brak** statystycznie istotnego związku'} (φ = {association['phi']:.3f}, {p_value_text(association['p_value'])}; siła: {association['strength']}).
+       - Kierowcy niemiejscy mają {rural_ratio:.1f}-krotnie {'wyższe' if rural_ratio >= 1 else 'niższe'} prawdopodobieństwo wypadków wiejskich ({nonurban['Wypadki Wiejskie (%)']:.1f}%) niż miejscy ({urban['Wypadki Wiejskie (%)']:.1f}%).
+       - Kierowcy miejscy uczestniczą głównie w wypadkach miejskich ({urban['Wypadki Miejskie (%)']:.1f}%).
+       - Hipoteza o większym ryzyku kierowców miejskich na wsiach **{'nie potwierdzona' if rural_ratio >= 1 else 'potwierdzona'}**.
 
     2. **Skuteczność modelowania:**
-       - XGBoost osiągnął AUC-ROC 0.9400, RandomForest 0.9327, co obala hipotezę o niskiej skuteczności modeli ML.
+       - {modeling}
        - Modele dobrze przewidują lokalizację wypadku na podstawie miejsca zamieszkania i cech kontekstowych.
 
     3. **Kluczowe czynniki:**
-       - **speed_limit_normalized**, **urban_driver_speed**, **is_urban_driver**, **distance_speed_interaction**, **junction_detail_1.0**, **road_type_6**, **junction_control_4.0**, **light_conditions_6.0** to najważniejsze cechy według XGBoost.
-       - Potwierdzono hipotezę o wpływie dróg jednopasmowych, braku oświetlenia i niekontrolowanych skrzyżowań.
+       - {key_factors}
+       - Potwierdzono hipotezę o wpływie dróg jednopasmowych, braku oświetlenia i niekontrolowanych skrzyżowań (oryginalna analiza 2021-2023).
 
     4. **Odpowiedzi na pytania badawcze:**
        - Miejsce zamieszkania wpływa na lokalizację wypadku.
@@ -610,4 +1413,57 @@ elif section == "Wnioski i Podsumowanie":
     - Prewencja na drogach jednopasmowych i niekontrolowanych skrzyżowaniach wiejskich.
     - Edukacja kierowców miejskich nt. jazdy na wsiach.
     - Dalsze badania z uwzględnieniem doświadczenia kierowcy i natężenia ruchu.
-    """)
\ No newline at end of file
+    """)
+
+
+SECTION_RENDERERS = {
+    "Wprowadzenie": render_introduction,
+    "Opis Przygotowania Danych": render_data_preparation,
+    "Analiza Wstępna Kierowców": render_driver_analysis,
+    "Analiza Związku: Miejsce Zamieszkania vs Lokalizacja Wypadku": render_association,
+    "Opis Modelowania ML": render_modeling_description,
+    "Ocena Modeli": render_model_evaluation,
+    "Ważność Cech (XGBoost)": render_feature_importance,
+    "Analiza Kluczowych Cech (Chi-kwadrat)": render_key_features,
+    "Mapa Wypadków (Hotspoty)": render_hotspot_map,
+    "Monitorowanie Dryfu (Lata)": render_drift,
+    "Modele Segmentowe": render_segment_models,
+    "Symulacja Predykcji (What-if)": render_what_if,
+    "Wnioski i Podsumowanie": render_conclusions,
+}
+
+
+if live_mode:
+    from wypadki import refresh
+    from wypadki.ingest import YEARS, download_sources, source_fingerprint
+
+    store_manifest = refresh.load_manifest()
+    if store_manifest is not None:
+        dataset_source, dataset_version = 'store', store_manifest['version']
+    else:
+        with st.spinner("Sprawdzanie plików danych..."):
+            dataset_source, dataset_version = 'csv', source_fingerprint(download_sources(), YEARS)
+
+# --- Filtry (tylko tryb na żywo, sekcje z testami chi-kwadrat) ---
+filtered_cube = None
+if live_mode and section in ("Analiza Związku: Miejsce Zamieszkania vs Lokalizacja Wypadku",
+                             "Analiza Kluczowych Cech (Chi-kwadrat)"):
+    from wypadki import cube
+
+    counts_cube = live_cube(dataset_version, dataset_source)
+    options = cube.filter_options(counts_cube)
+    st.sidebar.subheader("Filtry")
+    st.sidebar.caption("Brak zaznaczenia oznacza wszystkie wartości.")
+    filters = {
+        col: st.sidebar.multiselect(label, options[col], key=f"filter_{col}")
+        for col, label in cube.FILTER_DIMENSIONS.items()
+    }
+    filtered_cube = cube.slice_cube(counts_cube, filters)
+
+# --- Wyświetlanie wybranej sekcji ---
+live = {'version': dataset_version, 'source': dataset_source, 'cube': filtered_cube} if live_mode else None
+with profiling.span(f"Sekcja: {section}", live=live_mode):
+    SECTION_RENDERERS[section](live, snapshot)
+
+if profiling.enabled():
+    show_diagnostics_panel(rerun_start)
@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from wypadki.ingest import clean_data, merge_sources
+from wypadki.synthetic import generate_chunk
+
+
+def synthetic_sources(n_accidents=4000, year=2023, seed=0):
+    """Tabele accidents / casualties / vehicles z generatora syntetycznych danych STATS19."""
+    return generate_chunk(np.random.default_rng(seed), year, 0, n_accidents)
+
+
+@pytest.fixture(scope='session')
+def sources():
+    return synthetic_sources()
+
+
+@pytest.fixture(scope='session')
+def data(sources):
+    """Oczyszczona tabela po złączeniu (jak `data` w notatniku)."""
+    return clean_data(merge_sources(sources['accidents'], sources['casualties'], sources['vehicles']))
+
+
+@pytest.fixture(scope='session')
+def prepared(data):
+    """(X, y, data z cechami, vocab) z `prepare_features`."""
+    from wypadki.features import prepare_features
+
+    return prepare_features(data)
+
+
+def frame_equal(left, right):
+    pd.testing.assert_frame_equal(left.reset_index(drop=True), right.reset_index(drop=True), check_dtype=False)
+
+
+@pytest.fixture(scope='session')
+def synthetic_paths(tmp_path_factory):
+    """Pliki CSV accidents / casualties / vehicles (posortowane po accident_index) z generatora."""
+    from wypadki.synthetic import write_synthetic
+
+    return write_synthetic(tmp_path_factory.mktemp('stats19'), 3000, years=(2022, 2023))
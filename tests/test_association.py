@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import chi2_contingency
+
+from wypadki import association
+from wypadki.features import add_base_features
+
+
+@pytest.fixture(scope='module')
+def dataset(data):
+    return add_base_features(data)
+
+
+def test_small_table_runs_without_process_pool(dataset, monkeypatch):
+    def no_pool(*args, **kwargs):
+        raise AssertionError('pula procesów dla małej tabeli')
+
+    monkeypatch.setattr(association, 'ProcessPoolExecutor', no_pool)
+    assert len(association.association_table(dataset, n_jobs=4)) > 0
+
+
+def test_statistics_match_scipy(dataset):
+    table = association.association_table(dataset, n_jobs=1)
+    for row in table.itertuples():
+        counts = pd.crosstab(dataset[row.Cecha], dataset[row.Względem]).to_numpy()
+        counts = counts[counts.sum(axis=1) > 0][:, counts.sum(axis=0) > 0]
+        if min(counts.shape) < 2:
+            assert np.isnan(row.chi2)
+            continue
+        chi2, p, dof, _ = chi2_contingency(counts)
+        assert row.chi2 == pytest.approx(chi2)
+        assert row.p_value == pytest.approx(p, abs=1e-12)
+        assert row.dof == dof
+        assert row.n == counts.sum()
+        assert row.V == pytest.approx(np.sqrt(chi2 / (counts.sum() * (min(counts.shape) - 1))))
+
+
+def test_parallel_path_matches_serial(dataset, monkeypatch):
+    columns = association.CATEGORICAL_COLUMNS[:6]
+    serial = association.association_table(dataset, columns, all_pairs=True, n_jobs=1)
+    monkeypatch.setattr(association, 'PARALLEL_MIN_CELLS', 0)
+    parallel = association.association_table(dataset, columns, all_pairs=True, n_jobs=2)
+    pd.testing.assert_frame_equal(parallel, serial)
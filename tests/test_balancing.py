@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from wypadki.balancing import decode_X, encode_compact, resample
+from wypadki.features import categorical_features, dummy_name, rush_hour
+
+
+def _codes(X, vocab, col):
+    # Wartość kategorii z bloku one-hot (brak jedynki = pierwsza kategoria)
+    categories = vocab.categories[col]
+    block = X[[dummy_name(col, code) for code in categories[1:]]].to_numpy().astype(bool)
+    return np.where(block.any(axis=1), np.asarray(categories, dtype='float64')[block.argmax(axis=1) + 1], categories[0])
+
+
+def test_compact_round_trip(prepared):
+    X, _, _, vocab = prepared
+    restored = encode_compact(decode_X(X, vocab), vocab)
+    np.testing.assert_allclose(restored, X.to_numpy(dtype='float64'), atol=1e-9)
+
+
+@pytest.fixture(scope='module')
+def smotenc(prepared):
+    X, y, _, vocab = prepared
+    X_res, y_res = resample(X, y, 'smotenc', vocab)
+    return X_res, y_res, vocab
+
+
+def test_smotenc_balances_classes(smotenc, prepared):
+    X_res, y_res, _ = smotenc
+    counts = np.bincount(np.asarray(y_res))
+    assert counts[0] == counts[1]
+    assert list(X_res.columns) == list(prepared[0].columns)
+
+
+def test_smotenc_one_hot_blocks_are_valid(smotenc):
+    X_res, _, vocab = smotenc
+    for col in categorical_features:
+        block = X_res[[dummy_name(col, code) for code in vocab.categories[col][1:]]].to_numpy(dtype=int)
+        assert block.sum(axis=1).max() <= 1, col
+
+
+def test_smotenc_derived_features_are_consistent(smotenc):
+    X_res, _, vocab = smotenc
+    hour = X_res['hour_of_day'].to_numpy()
+    np.testing.assert_array_equal(_codes(X_res, vocab, 'is_rush_hour'), rush_hour(hour))
+
+    banding = _codes(X_res, vocab, 'driver_distance_banding')
+    important = ((banding == 3) | (banding == 4)).astype(int)
+    urban = X_res['is_urban_driver'].to_numpy()
+    np.testing.assert_array_equal(X_res['important_driver_distance'].to_numpy(), important)
+    np.testing.assert_array_equal(X_res['urban_driver_long_distance'].to_numpy(), urban * important)
+    junction = _codes(X_res, vocab, 'junction_control')
+    np.testing.assert_array_equal(X_res['urban_driver_no_junction_control'].to_numpy(), urban * (junction == 4))
+    np.testing.assert_allclose(X_res['urban_driver_speed'], urban * X_res['speed_limit_normalized'])
+    np.testing.assert_allclose(X_res['distance_speed_interaction'], banding * X_res['urban_driver_speed'])
@@ -0,0 +1,79 @@
+import numpy as np
+import pytest
+from scipy.stats import bootstrap as bootstrap_ci
+from scipy.stats import chi2_contingency
+from sklearn.metrics import average_precision_score, f1_score, precision_score, recall_score, roc_auc_score
+
+from wypadki import bootstrap
+from wypadki.curves import ScoreSummary
+
+
+@pytest.fixture(scope='module')
+def predictions():
+    rng = np.random.default_rng(0)
+    labels = rng.random(3000) < 0.3
+    scores = np.clip(0.35 * labels + rng.normal(0.35, 0.2, len(labels)), 0, 1).astype(np.float16)
+    return labels, scores
+
+
+@pytest.mark.parametrize('shape', [(2, 2), (2, 5), (4, 3), (6, 2)])
+def test_chi2_statistics_match_scipy(shape):
+    rng = np.random.default_rng(sum(shape))
+    tables = rng.integers(0, 40, size=(20, *shape))
+    tables[0, 0] = 0  # pusty wiersz pomijany jak w aggregations.chi2_test
+    chi2, dof, v = bootstrap.chi2_statistics(tables)
+    for table, chi2_k, dof_k, v_k in zip(tables, chi2, dof, v):
+        table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+        if min(table.shape) < 2:
+            assert np.isnan(chi2_k) and np.isnan(v_k)
+            continue
+        expected, _, expected_dof, _ = chi2_contingency(table)
+        assert chi2_k == pytest.approx(expected)
+        assert dof_k == expected_dof
+        assert v_k == pytest.approx(np.sqrt(expected / (table.sum() * (min(table.shape) - 1))))
+
+
+def test_replicate_metrics_match_sklearn(predictions):
+    labels, scores = predictions
+    summary = ScoreSummary.from_predictions(labels, scores)
+    pos, neg = bootstrap.score_counts(summary)
+    k = int(np.searchsorted(-summary.thresholds, -0.5, side='right'))
+    seed = np.random.SeedSequence(7)
+    replicate = bootstrap._score_batch(pos, neg, k, 1, seed)[0]
+
+    # Ta sama replikacja rozwinięta z powrotem do par (wynik, etykieta)
+    counts = np.concatenate([pos, neg])
+    draws = np.random.default_rng(seed).multinomial(counts.sum(), counts / counts.sum())
+    thresholds = np.concatenate([summary.thresholds, summary.thresholds])
+    y = np.repeat(np.r_[np.ones(len(pos)), np.zeros(len(neg))], draws)
+    s = np.repeat(thresholds, draws)
+    pred = s >= 0.5
+    expected = [roc_auc_score(y, s), average_precision_score(y, s), (pred == y).mean(),
+                precision_score(y, pred), recall_score(y, pred), f1_score(y, pred)]
+    np.testing.assert_allclose(replicate, expected, rtol=1e-9)
+
+
+def test_metric_intervals_point_values_and_coverage(predictions):
+    labels, scores = predictions
+    table = bootstrap.prediction_intervals(labels, scores, n_replicates=400, n_jobs=1)
+    assert table.loc['AUC-ROC', 'Wartość'] == pytest.approx(roc_auc_score(labels, scores.astype(float)))
+    assert table.loc['Average Precision', 'Wartość'] == pytest.approx(average_precision_score(labels, scores))
+    assert (table['Dolna granica'] <= table['Wartość']).all() and (table['Wartość'] <= table['Górna granica']).all()
+
+    # Ten sam bootstrap par (wynik, etykieta) w scipy - losowanie wierszy zamiast liczności
+    reference = bootstrap_ci((labels, scores.astype(float)), roc_auc_score, paired=True, vectorized=False,
+                             n_resamples=400, method='percentile', random_state=0)
+    auc = table.loc['AUC-ROC']
+    assert auc['Błąd std.'] == pytest.approx(reference.standard_error, rel=0.2)
+    assert auc['Dolna granica'] == pytest.approx(reference.confidence_interval.low, abs=auc['Błąd std.'])
+    assert auc['Górna granica'] == pytest.approx(reference.confidence_interval.high, abs=auc['Błąd std.'])
+
+
+def test_results_do_not_depend_on_process_count(monkeypatch):
+    tables = {'a': np.array([[120, 30], [45, 80]]), 'b': np.array([[10, 20, 30], [30, 20, 12]])}
+    serial = bootstrap.association_intervals(tables, n_replicates=300, n_jobs=1)
+    monkeypatch.setattr(bootstrap, 'MIN_PARALLEL_CELLS', 0)
+    parallel = bootstrap.association_intervals(tables, n_replicates=300, n_jobs=2)
+    assert serial.equals(parallel)
+    for name, table in tables.items():
+        assert serial.loc[name, 'chi2: Wartość'] == pytest.approx(chi2_contingency(table)[0])
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+from wypadki.compact import TOLERANCE, CompactForest, compile_booster, compile_forest
+
+N_TREES = 50
+
+
+@pytest.fixture(scope='module')
+def data():
+    X, y = make_classification(5000, 20, n_informative=8, random_state=0)
+    return X.astype(np.float32), y
+
+
+@pytest.fixture(scope='module')
+def booster(data):
+    X, y = data
+    return XGBClassifier(n_estimators=N_TREES, max_depth=6, learning_rate=0.06, random_state=0).fit(X, y).get_booster()
+
+
+def test_booster_export_matches_original(data, booster):
+    X, _ = data
+    forest = compile_booster(booster)
+    assert np.abs(forest.predict(X) - booster.inplace_predict(X)).max() <= TOLERANCE
+
+
+@pytest.mark.parametrize('prune', [1e-3, 1e-2, 5e-2, 0.2])
+def test_pruned_booster_within_error_bound(data, booster, prune):
+    X, _ = data
+    full, pruned = compile_booster(booster), compile_booster(booster, prune=prune)
+    # Błąd marginesu <= liczba drzew x prune, prawdopodobieństwa - jedna czwarta tego
+    assert np.abs(pruned.predict(X) - booster.inplace_predict(X)).max() <= N_TREES * prune / 4 + TOLERANCE
+    assert pruned.n_nodes <= full.n_nodes
+
+
+def test_booster_pruning_fires_at_moderate_tolerance(data, booster):
+    assert compile_booster(booster, prune=1e-2).n_nodes < compile_booster(booster).n_nodes
+
+
+def test_pruned_forest_within_error_bound(data):
+    X, y = data
+    rf = RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0).fit(X, y)
+    original = rf.predict_proba(X)[:, 1]
+    assert np.abs(compile_forest(rf).predict(X) - original).max() <= TOLERANCE
+    assert np.abs(compile_forest(rf, prune=0.05).predict(X) - original).max() <= 0.05 + TOLERANCE
+
+
+def test_save_load_round_trip(tmp_path, data, booster):
+    X, _ = data
+    forest = compile_booster(booster, precision='float16')
+    forest.save(tmp_path / 'xgb.compact.npz')
+    loaded = CompactForest.load(tmp_path / 'xgb.compact.npz')
+    np.testing.assert_array_equal(loaded.predict(X[:100]), forest.predict(X[:100]))
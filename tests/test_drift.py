@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import chi2_contingency, ks_2samp
+from sklearn.metrics import roc_auc_score
+
+from wypadki import drift
+
+
+@pytest.fixture(scope='module')
+def frame():
+    rng = np.random.default_rng(0)
+    n = 6000
+    years = rng.choice([2021, 2022, 2023], n)
+    shift = (years == 2023).astype(int)
+    return pd.DataFrame({
+        'accident_year': years,
+        'speed_limit': rng.choice([20, 30, 40, 50, 60, 70], n, p=[.1, .4, .1, .1, .2, .1]),
+        'hour_of_day': rng.integers(6 * shift, 24),
+        'road_type': rng.choice([1, 2, 3, 6, 7, 9], n),
+        'age_of_driver': rng.integers(17, 90, n).astype(float),
+        'is_rural_accident': (rng.random(n) < 0.3 + 0.1 * shift).astype(int),
+    })
+
+
+def test_histograms_match_value_counts(frame):
+    histograms = drift.year_histograms(frame)
+    for feature in ('speed_limit', 'hour_of_day', 'road_type'):
+        for year in (2021, 2023):
+            expected = frame.loc[frame['accident_year'] == year, feature].value_counts().sort_index()
+            counts = drift.distributions_for(histograms, feature, [year])
+            np.testing.assert_array_equal(counts.index, expected.index.astype(float))
+            np.testing.assert_array_equal(counts.to_numpy(), expected.to_numpy())
+    ages = drift.distributions_for(histograms, 'age_of_driver', [2021, 2022, 2023])
+    assert ages.sum() == len(frame) and set(ages.index) <= set(drift.CONTINUOUS_BINS['age_of_driver'])
+
+
+def test_compare_year_matches_scipy(frame):
+    table = drift.compare_year(drift.year_histograms(frame), 2023).set_index('Cecha')
+    current, reference = frame[frame['accident_year'] == 2023], frame[frame['accident_year'] < 2023]
+    for feature in ('speed_limit', 'hour_of_day', 'road_type', 'is_rural_accident'):
+        crosstab = pd.crosstab(frame['accident_year'] == 2023, frame[feature]).to_numpy()
+        chi2, p, _, _ = chi2_contingency(crosstab)
+        assert table.loc[feature, 'chi2'] == pytest.approx(chi2)
+        assert table.loc[feature, 'chi2 p'] == pytest.approx(p, abs=1e-12)
+
+        shares = crosstab / crosstab.sum(axis=1, keepdims=True)
+        shares = np.maximum(shares, drift.PSI_EPSILON)
+        assert table.loc[feature, 'PSI'] == pytest.approx(np.sum((shares[1] - shares[0]) * np.log(shares[1] / shares[0])))
+    for feature in ('speed_limit', 'hour_of_day'):
+        expected = ks_2samp(reference[feature], current[feature], method='asymp')
+        assert table.loc[feature, 'KS D'] == pytest.approx(expected.statistic)
+        assert table.loc[feature, 'KS p'] == pytest.approx(expected.pvalue, rel=1e-6)
+    assert np.isnan(table.loc['road_type', 'KS D'])
+    assert table.loc['hour_of_day', 'Ocena'] != 'Stabilny'
+
+
+def test_yearly_auc_matches_sklearn():
+    rng = np.random.default_rng(1)
+    labels = (rng.random(2000) < 0.3).astype(np.uint8)
+    scores = np.clip(0.3 * labels + rng.random(2000) * 0.7, 0, 1).astype(np.float16)
+    years = rng.choice([2022, 2023], 2000)
+    table = drift.yearly_auc({'xgb': {'test': (labels, scores)}}, {'xgb': {'test': years}})
+    for row in table.itertuples():
+        mask = years == row.year
+        assert row.n == mask.sum()
+        assert row.auc == pytest.approx(roc_auc_score(labels[mask], scores[mask].astype(float)))
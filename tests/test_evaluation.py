@@ -0,0 +1,47 @@
+import os
+
+import numpy as np
+import pytest
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.datasets import make_classification
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import cross_val_score, learning_curve
+from xgboost import XGBClassifier
+
+from wypadki.evaluation import evaluate_model
+
+
+@pytest.fixture(scope='module')
+def dataset():
+    X, y = make_classification(1200, 12, n_informative=6, weights=[0.7], random_state=0)
+    return X.astype(np.float32), y
+
+
+@pytest.mark.parametrize('estimator', [
+    RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0),
+    XGBClassifier(n_estimators=20, max_depth=3, random_state=0),
+], ids=['rf', 'xgb'])
+def test_matches_cross_val_score_and_learning_curve(dataset, estimator):
+    X, y = dataset
+    sizes = np.linspace(0.2, 1.0, 3)
+    result = evaluate_model(estimator, X, y, cv=5, train_sizes=sizes)
+    expected = cross_val_score(clone(estimator), X, y, cv=5, scoring='roc_auc')
+    np.testing.assert_allclose(result['cv_auc'], expected, rtol=1e-6)
+
+    train_sizes, train_scores, val_scores = learning_curve(clone(estimator), X, y, train_sizes=sizes, cv=5, scoring='f1')
+    np.testing.assert_array_equal(result['learning_curve']['train_sizes'], train_sizes)
+    np.testing.assert_allclose(result['learning_curve']['train_scores'], train_scores, rtol=1e-6)
+    np.testing.assert_allclose(result['learning_curve']['val_scores'], val_scores, rtol=1e-6)
+
+    final = clone(estimator).fit(X, y)
+    np.testing.assert_allclose(result['model'].predict_proba(X), final.predict_proba(X), rtol=1e-6)
+
+
+def test_final_fit_on_sparse_uses_dense_matrix_and_thread_budget(dataset):
+    X, y = dataset
+    rf = RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0)
+    result = evaluate_model(rf, sparse.csr_matrix(X), y, cv=3, n_workers=1)
+    assert result['model'].get_params()['n_jobs'] == max(1, os.cpu_count() or 1)
+    dense = clone(rf).fit(X, y)
+    np.testing.assert_allclose(result['model'].predict_proba(X), dense.predict_proba(X))
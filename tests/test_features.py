@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+
+from conftest import frame_equal
+from wypadki.features import FeatureVocabulary, prepare_features
+
+DUMMY_COLUMNS = ['road_type', 'light_conditions', 'junction_detail', 'junction_control', 'age_of_casualty_binned',
+                 'driver_distance_banding', 'is_rush_hour', 'weather_conditions', 'age_of_driver_binned',
+                 'skidding_and_overturning', 'casualty_type']
+
+SELECTED_FEATURES = [
+    'is_urban_driver', 'road_type', 'light_conditions', 'junction_detail', 'junction_control',
+    'driver_distance_banding', 'weather_conditions', 'is_rush_hour', 'age_of_driver_binned', 'age_of_casualty_binned',
+    'distance_speed_interaction', 'speed_limit_normalized', 'driver_imd_decile',
+    'hour_of_day', 'number_of_casualties', 'urban_driver_speed', 'skidding_and_overturning', 'casualty_type',
+]
+
+
+def notebook_features(data):
+    """Przygotowanie X i y z pierwotnej komórki notatnika (apply, pd.to_datetime, pd.cut, pd.get_dummies)."""
+    data = data.copy()
+    data['hour_of_day'] = pd.to_datetime(data['time'], format='%H:%M').dt.hour
+    data['driver_home_area_type'] = data['driver_home_area_type'].replace({3: 2})
+    data['is_urban_driver'] = (data['driver_home_area_type'] == 1).astype(int)
+    data['is_rural_accident'] = (data['urban_or_rural_area'] == 2).astype(int)
+    data['speed_limit_normalized'] = StandardScaler().fit_transform(data[['speed_limit']])
+    bins = [-float('inf'), 17, 25, 40, 60, float('inf')]
+    for col in ('age_of_casualty', 'age_of_driver'):
+        data[f'{col}_binned'] = pd.cut(data[col], bins=bins, labels=['1', '2', '3', '4', '5'], right=False)
+    data['urban_driver_speed'] = data['is_urban_driver'] * data['speed_limit_normalized']
+    data['is_rush_hour'] = data['hour_of_day'].apply(lambda h: 1 if (7 <= h <= 9) or (15 <= h <= 18) else 0)
+    data['distance_speed_interaction'] = data['driver_distance_banding'].astype(float) * data['urban_driver_speed']
+
+    X = pd.get_dummies(data[SELECTED_FEATURES], columns=DUMMY_COLUMNS, drop_first=True)
+    X['important_driver_distance'] = (X['driver_distance_banding_4.0'] + X['driver_distance_banding_3.0'] > 0).astype(int)
+    X['urban_driver_long_distance'] = X['is_urban_driver'] * X['important_driver_distance']
+    X['urban_driver_no_junction_control'] = X['is_urban_driver'] * X['junction_control_4.0']
+    return X, data['is_rural_accident']
+
+
+def test_vectorized_features_match_notebook(data):
+    # W danych STATS19 road_type nie ma kodów -1/99, więc w notatniku zostaje int (road_type_6, nie road_type_6.0)
+    data = data.astype({'road_type': 'int64'})
+    expected_X, expected_y = notebook_features(data)
+    X, y, _, _ = prepare_features(data, FeatureVocabulary.fit(data, observed=True))
+    assert list(X.columns) == list(expected_X.columns)
+    frame_equal(X.astype('float64'), expected_X.astype('float64'))
+    np.testing.assert_array_equal(y.to_numpy(), expected_y.to_numpy())
+
+
+def test_layout_does_not_depend_on_batch(prepared):
+    X, _, data, vocab = prepared
+    for rows in (slice(0, 1), slice(5, 6), slice(0, 17)):
+        batch_X, _, _, _ = prepare_features(data.iloc[rows], vocab)
+        assert list(batch_X.columns) == list(X.columns)
+        np.testing.assert_array_equal(batch_X.to_numpy(dtype='float64'), X.iloc[rows].to_numpy(dtype='float64'))
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+
+from wypadki.outofcore import allocate_trees, train_rf_chunked, write_batches
+
+PARAMS = {'n_estimators': 30, 'max_depth': 4, 'random_state': 0}
+
+
+class FakeStore:
+    """Partie treningowe w pamięci z tym samym interfejsem co `BatchStore` (file_rows, file_positives, batches)."""
+
+    def __init__(self, batches):
+        self._batches = batches
+        self.file_rows = {'train': [len(y) for _, y in batches]}
+        self.file_positives = {'train': [int(y.sum()) for _, y in batches]}
+
+    def batches(self, split):
+        yield from self._batches
+
+
+def _batches(sizes, single_class=()):
+    X, y = make_classification(sum(sizes), 8, random_state=0)
+    batches, start = [], 0
+    for k, size in enumerate(sizes):
+        X_k, y_k = X[start:start + size].astype(np.float32), y[start:start + size].astype(np.float32)
+        batches.append((X_k, np.zeros_like(y_k) if k in single_class else y_k))
+        start += size
+    return batches
+
+
+@pytest.mark.parametrize('n_estimators, rows', [(100, [10, 20, 30]), (7, [5, 5, 5]), (2, [1, 1, 1, 1])])
+def test_allocate_trees_sums_to_n_estimators(n_estimators, rows):
+    trees = allocate_trees(n_estimators, rows)
+    assert trees.sum() == n_estimators
+    assert np.all(np.abs(trees - n_estimators * np.asarray(rows) / sum(rows)) < 1)
+
+
+def test_skipped_batches_give_their_trees_to_others():
+    forest = train_rf_chunked(FakeStore(_batches([200, 300, 250], single_class={1})), PARAMS)
+    assert len(forest.estimators_) == forest.n_estimators == PARAMS['n_estimators']
+
+
+def test_no_usable_batch_raises_clear_error():
+    with pytest.raises(ValueError, match='obu klas'):
+        train_rf_chunked(FakeStore(_batches([100, 100], single_class={0, 1})), PARAMS)
+
+
+def test_chunked_forest_from_batch_store(synthetic_paths, tmp_path):
+    store = write_batches(synthetic_paths, tmp_path / 'batches', years=(2022, 2023), chunksize=1000)
+    assert sum(store.file_rows['train']) == store.rows['train']
+    assert sum(store.file_positives['train']) == store.positives['train']
+    forest = train_rf_chunked(store, PARAMS)
+    assert len(forest.estimators_) == PARAMS['n_estimators']
@@ -0,0 +1,51 @@
+import time
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+from wypadki import registry
+from wypadki.features import build_X, build_X_array
+
+
+@pytest.fixture(scope='module')
+def models(prepared):
+    X, y, _, _ = prepared
+    X = X.to_numpy(dtype=np.float32)
+    # Las trenowany na tablicy bez nazw kolumn - jak na ścieżce rzadkiej (CSR)
+    return {'xgb': XGBClassifier(n_estimators=10, max_depth=3, random_state=0).fit(X, y),
+            'rf': RandomForestClassifier(n_estimators=10, max_depth=4, random_state=0).fit(X, y)}
+
+
+def test_single_row_layout_matches_full_matrix(prepared):
+    X, _, data, vocab = prepared
+    assert list(X.columns) == vocab.columns
+    full = build_X_array(data, vocab)
+    np.testing.assert_array_equal(full, X.to_numpy(dtype=np.float32))
+    for i in (0, len(data) // 2, len(data) - 1):
+        row = data.iloc[[i]]
+        assert list(build_X(row, vocab).columns) == vocab.columns
+        np.testing.assert_array_equal(build_X(row, vocab).to_numpy(dtype=np.float32)[0], full[i])
+        np.testing.assert_array_equal(build_X_array(row, vocab)[0], full[i])
+
+
+def test_saves_in_the_same_second_get_distinct_versions(tmp_path, monkeypatch, models, prepared):
+    vocab = prepared[3]
+    monkeypatch.setattr(time, 'strftime', lambda fmt, *args: '20260101-000000')
+    paths = [registry.save_models(models, vocab, tmp_path) for _ in range(3)]
+    assert [p.name for p in paths] == ['20260101-000000', '20260101-000000-1', '20260101-000000-2']
+    assert registry.latest_version(tmp_path) == paths[-1].name
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_bundle_predicts_without_feature_name_warnings(tmp_path, models, prepared, data):
+    X, _, _, vocab = prepared
+    bundle = registry.load_bundle(registry.save_models(models, vocab, tmp_path))
+    batch = data[registry.SCORING_COLUMNS].iloc[:200]
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        proba = bundle.predict(batch, model='rf')
+    expected = models['rf'].predict_proba(X.to_numpy(dtype=np.float32)[:200])[:, 1]
+    np.testing.assert_allclose(proba, expected)
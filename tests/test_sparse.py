@@ -0,0 +1,59 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+from xgboost import XGBClassifier
+
+from wypadki.features import build_X, build_X_sparse, numeric_features
+from wypadki.modeling import fit_matrix, smote_resample, split_data
+
+
+@pytest.fixture(scope='module')
+def matrices(prepared):
+    X, y, data, vocab = prepared
+    return X, build_X_sparse(data, vocab), y
+
+
+def test_csr_matches_dense_matrix(prepared, matrices):
+    X, X_csr, _ = matrices
+    assert X_csr.dtype == np.float32
+    assert X_csr.indices.dtype == np.int32 and X_csr.indptr.dtype == np.int32
+    np.testing.assert_array_equal(X_csr.toarray(), X.to_numpy(dtype=np.float32))
+    # Zera w kolumnach numerycznych zapisane jawnie (XGBoost traktuje brakujące elementy jako braki danych)
+    k = len(numeric_features)
+    assert X_csr[:, :k].nnz == X_csr.shape[0] * k
+
+
+def test_split_selects_same_rows(matrices):
+    X, X_csr, y = matrices
+    dense_parts, csr_parts = split_data(X, y), split_data(X_csr, y)
+    for dense, csr in zip(dense_parts[:3], csr_parts[:3]):
+        np.testing.assert_array_equal(csr.toarray(), dense.to_numpy(dtype=np.float32))
+    for dense, csr in zip(dense_parts[3:], csr_parts[3:]):
+        pd.testing.assert_series_equal(csr, dense)
+
+
+def test_smote_on_csr_matches_dense(matrices):
+    X, X_csr, y = matrices
+    X_dense, y_dense = smote_resample(X, y, list(X.columns))
+    X_res, y_res = smote_resample(X_csr, y, list(X.columns))
+    assert sparse.issparse(X_res) and X_res.dtype == np.float32
+    np.testing.assert_array_equal(np.asarray(y_res), np.asarray(y_dense))
+    X_res, X_dense = X_res.toarray(), X_dense.to_numpy(dtype=np.float32)
+    # Oryginalne wiersze bez zmian; próbki syntetyczne różnią się zaokrągleniem float32, a przy bliskich
+    # odległościach SMOTE może wybrać innego sąsiada - takich próbek jest niewiele
+    np.testing.assert_array_equal(X_res[:len(y)], X_dense[:len(y)])
+    same = np.isclose(X_res[len(y):], X_dense[len(y):], atol=1e-4).all(axis=1)
+    assert same.mean() > 0.9
+    dummies = [i for i, col in enumerate(X.columns) if col not in numeric_features]
+    assert np.isin(X_res[:, dummies], (0, 1)).all()
+
+@pytest.mark.parametrize('model', [XGBClassifier(n_estimators=20, max_depth=4, random_state=0),
+                                   RandomForestClassifier(n_estimators=20, max_depth=6, random_state=0)])
+def test_models_on_csr_match_dense(matrices, model):
+    X, X_csr, y = matrices
+    dense = model.__class__(**model.get_params()).fit(X.to_numpy(dtype=np.float32), y)
+    csr = model.__class__(**model.get_params()).fit(fit_matrix(model, X_csr), y)
+    np.testing.assert_allclose(csr.predict_proba(X_csr)[:, 1], dense.predict_proba(X.to_numpy(np.float32))[:, 1],
+                               atol=1e-6)
@@ -0,0 +1,28 @@
+import pytest
+
+from conftest import frame_equal
+from wypadki.ingest import clean_data, merge_sources, read_source
+from wypadki.streaming import read_streaming
+
+YEARS = (2022, 2023)
+
+
+def _in_memory(paths, years):
+    tables = {name: read_source(name, path, years) for name, path in paths.items()}
+    return clean_data(merge_sources(tables['accidents'], tables['casualties'], tables['vehicles']))
+
+
+@pytest.mark.parametrize('chunksize', [257, 100_000])
+def test_streaming_matches_in_memory_join(synthetic_paths, chunksize):
+    expected = _in_memory(synthetic_paths, YEARS)
+    streamed = read_streaming(synthetic_paths, YEARS, chunksize=chunksize)
+    assert len(streamed) > 0
+    assert streamed['local_authority_ons_district'].dtype == 'category'
+    categorical = {'accident_index': str, 'time': str, 'local_authority_ons_district': str}
+    frame_equal(streamed.astype(categorical), expected.astype(categorical))
+
+
+def test_streaming_without_rows_returns_empty_frame(synthetic_paths):
+    streamed = read_streaming(synthetic_paths, years=(1999,), chunksize=500)
+    assert streamed.empty
+    assert list(streamed.columns) == list(read_streaming(synthetic_paths, YEARS).columns)
@@ -0,0 +1,58 @@
+import json
+
+import numpy as np
+import pytest
+from sklearn.datasets import make_classification
+
+from wypadki import tuning
+
+SEARCH = {'model': 'rf', 'n_candidates': 9, 'eta': 3, 'min_resource': 5, 'max_resource': 45, 'n_jobs': 1}
+
+
+@pytest.fixture(scope='module')
+def splits():
+    X, y = make_classification(900, 10, n_informative=5, random_state=0)
+    X = X.astype(np.float32)
+    return X[:600], y[:600], X[600:], y[600:]
+
+
+def _search(splits, checkpoint):
+    return tuning.successive_halving(*splits, checkpoint=checkpoint, **SEARCH)
+
+
+def test_rerun_with_complete_checkpoint_trains_nothing(splits, tmp_path, monkeypatch):
+    checkpoint = tmp_path / 'trials.jsonl'
+    first = _search(splits, checkpoint)
+    assert not first['trials']['resumed'].any()
+
+    def no_training(*args, **kwargs):
+        raise AssertionError('próba powinna zostać wczytana z checkpointu')
+
+    monkeypatch.setattr(tuning, 'run_trial', no_training)
+    second = _search(splits, checkpoint)
+    assert second['trials']['resumed'].all()
+    assert second['best_params'] == first['best_params']
+    assert second['best_auc'] == first['best_auc']
+
+
+def test_interrupted_search_resumes_remaining_trials(splits, tmp_path):
+    full = _search(splits, tmp_path / 'full.jsonl')
+    lines = (tmp_path / 'full.jsonl').read_text().splitlines()
+    partial = tmp_path / 'partial.jsonl'
+    partial.write_text('\n'.join(lines[:5]) + '\n')
+
+    resumed = _search(splits, partial)
+    assert resumed['trials']['resumed'].sum() == 5
+    assert resumed['best_params'] == full['best_params']
+    assert list(resumed['trials']['auc']) == list(full['trials']['auc'])
+    # Brakujące próby dopisane do checkpointu, bez duplikatów
+    keys = [json.loads(line)['key'] for line in partial.read_text().splitlines()]
+    assert len(keys) == len(set(keys)) == len(lines)
+
+
+def test_checkpoint_of_other_data_is_ignored(splits, tmp_path):
+    checkpoint = tmp_path / 'trials.jsonl'
+    _search(splits, checkpoint)
+    X_train, y_train, X_val, y_val = splits
+    other = _search((X_train, 1 - y_train, X_val, 1 - y_val), checkpoint)
+    assert not other['trials']['resumed'].any()
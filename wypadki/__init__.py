@@ -0,0 +1 @@
+# Moduły potoku danych dla analizy wypadków drogowych (STATS19, UK)
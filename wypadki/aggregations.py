@@ -0,0 +1,161 @@
+# Agregacje prezentowane w aplikacji: proporcje kierowców, rozkład wg lat, tabela kontyngencji, testy chi-kwadrat
+import numpy as np
+import pandas as pd
+from scipy.stats import chi2_contingency
+
+from wypadki.features import add_base_features
+from wypadki.ingest import clean_data
+from wypadki.profiling import traced
+
+DRIVER_LABELS = ['Niemiejski', 'Miejski']
+ACCIDENT_LABELS = ['Wypadek Miejski', 'Wypadek Wiejski']
+
+# Kluczowe cechy testowane względem is_rural_accident; wybrane kategorie, pozostałe łączone jak w notatniku
+KEY_FEATURE_GROUPS = {
+    'is_urban_driver': None,
+    'road_type': ([3, 6], 99),
+    'junction_control': ([4, 2], 9),
+    'junction_detail': ([1], 99),
+    'important_driver_distance': None,
+    'light_conditions': ([6], 99),
+    'casualty_type': ([9], 99),
+}
+
+
+def count_table(row_values, col_values, weights=None):
+    """Tabela liczności (jak pd.crosstab) liczona przez np.bincount; `weights` sumuje gotowe liczności."""
+    row_codes, row_labels = pd.factorize(np.asarray(row_values), sort=True)
+    col_codes, col_labels = pd.factorize(np.asarray(col_values), sort=True)
+    valid = (row_codes >= 0) & (col_codes >= 0)
+    cells = row_codes[valid] * len(col_labels) + col_codes[valid]
+    counts = np.bincount(cells, weights=None if weights is None else np.asarray(weights)[valid],
+                         minlength=len(row_labels) * len(col_labels))
+    return pd.DataFrame(counts.reshape(len(row_labels), len(col_labels)).astype('int64'),
+                        index=row_labels, columns=col_labels)
+
+
+def chi2_test(contingency):
+    """chi2_contingency z pominięciem pustych wierszy/kolumn; (nan, nan, 0, None) gdy tabela jest zdegenerowana."""
+    table = np.asarray(contingency)
+    table = table[table.sum(axis=1) > 0][:, table.sum(axis=0) > 0]
+    if min(table.shape) < 2:
+        return np.nan, np.nan, 0, None
+    return chi2_contingency(table)
+
+
+@traced()
+def prepare_dataset(data):
+    """Oczyszczona tabela `data` z cechami potrzebnymi do agregacji (bez dopasowywanych transformacji)."""
+    return add_base_features(clean_data(data))
+
+
+def driver_origin_table(data, weight=None):
+    """Tabela 1: proporcje kierowców według miejsca zamieszkania (`weight` jak w `contingency_table`)."""
+    if weight is None:
+        counts = data['is_urban_driver'].value_counts()
+    else:
+        counts = data.groupby('is_urban_driver')[weight].sum()
+    total = int(counts.sum())
+    rows = [('Miejski', int(counts.get(1, 0))), ('Niemiejski', int(counts.get(0, 0)))]
+    rows.sort(key=lambda row: row[1], reverse=True)
+    table = pd.DataFrame(rows, columns=['Pochodzenie', 'Liczba'])
+    table['Procent'] = (table['Liczba'] / total * 100).round(1)
+    table.loc[len(table)] = ['Suma', total, 100.0]
+    return table
+
+
+def driver_stats_table(data, weight=None):
+    """Tabela 2: rozkład kierowców według miejsca zamieszkania w poszczególnych latach."""
+    groups = data.groupby(['accident_year', 'is_urban_driver'])
+    driver_stats = (groups.size() if weight is None else groups[weight].sum()).unstack(fill_value=0)
+    driver_stats = driver_stats.reindex(columns=[0, 1], fill_value=0)
+    driver_stats.columns = DRIVER_LABELS
+    return years_table(driver_stats)
+
+
+def years_table(driver_stats):
+    """Tabela 2 z liczności (indeks: rok, kolumny: Niemiejski, Miejski)."""
+    table = pd.DataFrame({'Rok': driver_stats.index.astype(int)})
+    table['Niemiejski'] = driver_stats['Niemiejski'].to_numpy()
+    table['Miejski'] = driver_stats['Miejski'].to_numpy()
+    table['Suma'] = table['Niemiejski'] + table['Miejski']
+    table['Procent Niemiejski'] = (table['Niemiejski'] / table['Suma'] * 100).round(1)
+    table['Procent Miejski'] = (table['Miejski'] / table['Suma'] * 100).round(1)
+    return table[['Rok', 'Niemiejski', 'Procent Niemiejski', 'Miejski', 'Procent Miejski', 'Suma']]
+
+
+def contingency_table(data, weight=None):
+    """Tabela kontyngencji: pochodzenie kierowcy (wiersze) x lokalizacja wypadku (kolumny).
+
+    `weight` - nazwa kolumny z licznościami, gdy `data` jest już zagregowana (kostka liczności).
+    """
+    table = count_table(data['is_urban_driver'], data['is_rural_accident'],
+                        None if weight is None else data[weight])
+    table = table.reindex(index=[0, 1], columns=[0, 1], fill_value=0)
+    table.index = DRIVER_LABELS
+    table.columns = ACCIDENT_LABELS
+    return table
+
+
+def phi_strength(phi):
+    """Interpretacja siły związku na podstawie Phi."""
+    if np.isnan(phi):
+        return "Brak danych"
+    if phi < 0.1:
+        return "Bardzo słaby (φ < 0.1)"
+    elif phi < 0.3:
+        return "Słaby (φ = 0.1–0.3)"
+    elif phi < 0.5:
+        return "Umiarkowany (φ = 0.3–0.5)"
+    return "Silny (φ ≥ 0.5)"
+
+
+def association_test(contingency, alpha=0.05):
+    """Test chi-kwadrat niezależności dla tabeli 2x2 wraz z Phi, tabelą oczekiwaną i procentami wierszy."""
+    chi2, p, dof, expected = chi2_test(contingency)
+    n = contingency.to_numpy().sum()
+    phi = float(np.sqrt(chi2 / n)) if n else np.nan
+    if np.isnan(p):
+        conclusion = "Za mało danych do przeprowadzenia testu."
+    elif p < alpha:
+        conclusion = "Odrzucamy hipotezę zerową (H₀). Istnieje statystycznie istotny związek (p < 0.0001)." \
+            if p < 0.0001 else f"Odrzucamy hipotezę zerową (H₀). Istnieje statystycznie istotny związek (p < {alpha})."
+    else:
+        conclusion = "Brak podstaw do odrzucenia hipotezy zerowej (H₀)."
+    location_stats = contingency.div(contingency.sum(axis=1), axis=0) * 100
+    location_stats.columns = ['Wypadki Miejskie (%)', 'Wypadki Wiejskie (%)']
+    return {
+        'chi2': float(chi2), 'p_value': float(p), 'dof': int(dof), 'phi': phi,
+        'strength': phi_strength(phi), 'conclusion': conclusion, 'alpha': alpha,
+        'expected': pd.DataFrame(expected, index=contingency.index, columns=contingency.columns)
+        if expected is not None and np.shape(expected) == contingency.shape else None,
+        'location_stats': location_stats,
+    }
+
+
+def cramers_v_label(v):
+    return "Słaby związek" if v < 0.1 else ("Silny związek" if v >= 0.5 else "Umiarkowany związek")
+
+
+def key_feature_tables(data, target='is_rural_accident', weight=None):
+    """Tabele liczności kluczowych cech (kategorie łączone wg `KEY_FEATURE_GROUPS`) względem `target`."""
+    tables = {}
+    for feature, grouping in KEY_FEATURE_GROUPS.items():
+        values = data[feature]
+        if grouping is not None:
+            kept, other = grouping
+            values = values.where(values.isin(kept), other)
+        tables[feature] = count_table(values, data[target], None if weight is None else data[weight])
+    return tables
+
+
+def key_feature_tests(data, target='is_rural_accident', weight=None):
+    """Testy chi-kwadrat i V Craméra dla kluczowych cech (tabela jak `chi2_results_data` w aplikacji)."""
+    rows = []
+    for feature, contingency in key_feature_tables(data, target, weight).items():
+        chi2, p, _, _ = chi2_test(contingency)
+        n = contingency.to_numpy().sum()
+        v = np.sqrt(chi2 / (n * (min(contingency.shape) - 1))) if min(contingency.shape) > 1 else np.nan
+        rows.append({'Cecha': feature, 'chi2': chi2, 'p_value': p, 'V': v,
+                     'Interpretacja': cramers_v_label(v) if not np.isnan(v) else 'Brak danych'})
+    return pd.DataFrame(rows).set_index('Cecha')
@@ -0,0 +1,123 @@
+# Wsadowe testy chi-kwadrat i V Craméra dla wielu cech kategorycznych (kody całkowite + np.bincount)
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations
+
+import numpy as np
+import pandas as pd
+
+from wypadki.aggregations import chi2_test, cramers_v_label
+
+# Kolumny kategoryczne tabeli `data` po `prepare_dataset` (kody STATS19 i cechy binarne)
+CATEGORICAL_COLUMNS = [
+    'is_urban_driver', 'road_type', 'light_conditions', 'junction_detail', 'junction_control',
+    'weather_conditions', 'speed_limit', 'casualty_type', 'driver_home_area_type', 'driver_distance_banding',
+    'important_driver_distance', 'driver_imd_decile', 'skidding_and_overturning', 'is_rush_hour',
+    'age_of_driver_binned', 'age_of_casualty_binned', 'hour_of_day',
+]
+
+# Pula procesów dopiero od tylu komórek (wiersze x pary): para kosztuje ~8 ns na wiersz, a start puli
+# i przesłanie kodów do procesów ~0,3-0,5 s, więc mniejsze tabele (np. ~20 cech w aplikacji) liczone są szeregowo
+PARALLEL_MIN_CELLS = 50_000_000
+
+RESULT_COLUMNS = ['Cecha', 'Względem', 'chi2', 'p_value', 'dof', 'n', 'V', 'Interpretacja']
+
+
+def encode_columns(data, columns, groupings=None):
+    """Koduje kolumny jako 0..k-1 (brak: -1).
+
+    Zwraca macierz kodów (kolumna na wiersz, int32) i liczby poziomów. `groupings` - opcjonalnie
+    {kolumna: (zachowane kategorie, kod pozostałych)}, jak `KEY_FEATURE_GROUPS`.
+    """
+    groupings = groupings or {}
+    codes = np.empty((len(columns), len(data)), dtype=np.int32)
+    levels = np.empty(len(columns), dtype=np.int64)
+    for i, col in enumerate(columns):
+        values = data[col]
+        if groupings.get(col) is not None:
+            kept, other = groupings[col]
+            values = values.where(values.isin(kept) | values.isna(), other)
+        col_codes, uniques = pd.factorize(values.to_numpy(), sort=True)
+        codes[i] = col_codes
+        levels[i] = len(uniques)
+    return codes, levels
+
+
+def pair_table(codes_a, levels_a, codes_b, levels_b):
+    """Tabela liczności dwóch zakodowanych kolumn (np.bincount), z pominięciem braków."""
+    valid = (codes_a >= 0) & (codes_b >= 0)
+    cells = codes_a[valid].astype(np.int64) * levels_b + codes_b[valid]
+    return np.bincount(cells, minlength=levels_a * levels_b).reshape(levels_a, levels_b)
+
+
+def pair_statistics(codes_a, levels_a, codes_b, levels_b):
+    """chi2, p, dof, n i V Craméra dla dwóch zakodowanych kolumn (tabela liczności przez np.bincount)."""
+    table = pair_table(codes_a, levels_a, codes_b, levels_b)
+    chi2, p, dof, _ = chi2_test(table)
+    n = int(table.sum())
+    k = min(np.count_nonzero(table.sum(axis=1)), np.count_nonzero(table.sum(axis=0)))
+    v = float(np.sqrt(chi2 / (n * (k - 1)))) if k > 1 else np.nan
+    return float(chi2), float(p), int(dof), n, v
+
+
+def _pairs_worker(codes, levels, pairs):
+    # Uruchamiane w procesie potomnym: `codes` zawiera tylko kolumny potrzebne w tej partii par
+    return [pair_statistics(codes[i], levels[i], codes[j], levels[j]) for i, j in pairs]
+
+
+def _batches(pairs, n_batches):
+    return [batch for batch in (pairs[i::n_batches] for i in range(n_batches)) if batch]
+
+
+def association_table(data, columns=None, target='is_rural_accident', all_pairs=False, groupings=None,
+                      n_jobs=None):
+    """Tabela wyników testów chi-kwadrat dla cech kategorycznych.
+
+    Każda kolumna z `columns` (domyślnie `CATEGORICAL_COLUMNS` obecne w `data`) jest testowana
+    względem `target`; `all_pairs=True` dodaje wszystkie pary cech. Kolumny są kodowane raz, a
+    pary liczone równolegle w `n_jobs` procesach (domyślnie liczba rdzeni, 1 = bez puli); poniżej
+    `PARALLEL_MIN_CELLS` komórek (wiersze x pary) pula nie jest uruchamiana.
+    Wynik jest posortowany malejąco po V.
+    """
+    if columns is None:
+        columns = [col for col in CATEGORICAL_COLUMNS if col in data.columns and col != target]
+    names = list(columns) + [target]
+    codes, levels = encode_columns(data, names, groupings)
+
+    target_idx = len(names) - 1
+    pairs = [(i, target_idx) for i in range(len(columns))]
+    if all_pairs:
+        pairs += list(combinations(range(len(columns)), 2))
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    if len(data) * len(pairs) < PARALLEL_MIN_CELLS:
+        n_jobs = 1
+    batches = _batches(pairs, min(n_jobs, len(pairs)))
+    if len(batches) <= 1:
+        stats = _pairs_worker(codes, levels, pairs)
+        ordered = pairs
+    else:
+        ordered, futures = [], []
+        with ProcessPoolExecutor(max_workers=len(batches)) as pool:
+            for batch in batches:
+                used = sorted({idx for pair in batch for idx in pair})
+                remap = {idx: pos for pos, idx in enumerate(used)}
+                local_pairs = [(remap[i], remap[j]) for i, j in batch]
+                futures.append(pool.submit(_pairs_worker, codes[used], levels[used], local_pairs))
+                ordered += batch
+            stats = [row for future in futures for row in future.result()]
+
+    rows = []
+    for (i, j), (chi2, p, dof, n, v) in sorted(zip(ordered, stats)):
+        rows.append({'Cecha': names[i], 'Względem': names[j], 'chi2': chi2, 'p_value': p, 'dof': dof, 'n': n,
+                     'V': v, 'Interpretacja': cramers_v_label(v) if not np.isnan(v) else 'Brak danych'})
+    results = pd.DataFrame(rows, columns=RESULT_COLUMNS)
+    return results.sort_values('V', ascending=False, kind='stable', ignore_index=True)
+
+
+def target_tables(data, columns=None, target='is_rural_accident', groupings=None):
+    """Tabele liczności {cecha: poziomy cechy x poziomy `target`} dla cech testowanych w `association_table`."""
+    if columns is None:
+        columns = [col for col in CATEGORICAL_COLUMNS if col in data.columns and col != target]
+    codes, levels = encode_columns(data, list(columns) + [target], groupings)
+    return {col: pair_table(codes[i], levels[i], codes[-1], levels[-1]) for i, col in enumerate(columns)}
@@ -0,0 +1,190 @@
+# Balansowanie klas wewnątrz fałd: SMOTE, SMOTENC na kodach kategorii, undersampling, wagi klas
+import numpy as np
+import pandas as pd
+from imblearn.over_sampling import SMOTE
+from imblearn.under_sampling import RandomUnderSampler
+from scipy import sparse
+from sklearn.base import clone
+from sklearn.neighbors import NearestNeighbors
+from xgboost import XGBClassifier
+
+from wypadki.features import (categorical_features, category_index, derived_features, integer_features,
+                               numeric_features, rush_hour)
+from wypadki.profiling import traced
+
+# 'smote' - jak dotąd (na macierzy one-hot), 'smotenc' - na kodach kategorii z przybliżonym indeksem sąsiadów,
+# 'undersample' - losowe usunięcie nadmiaru klasy większościowej, 'class_weight' - bez próbkowania, wagi klas
+BALANCING_METHODS = ('smote', 'smotenc', 'undersample', 'class_weight', 'none')
+
+# Kategorie będące funkcją cech liczbowych (is_rush_hour - godziny hour_of_day): nie są próbkowane
+DERIVED_CATEGORICAL = ['is_rush_hour']
+SAMPLED_CATEGORICAL = [col for col in categorical_features if col not in DERIVED_CATEGORICAL]
+
+# Kolumny w reprezentacji kodowanej (przed one-hot); kategorie jako pozycje w słowniku vocab.categories.
+# Cechy pochodne (important_driver_distance - funkcja driver_distance_banding, is_rush_hour, interakcje)
+# nie są próbkowane, tylko liczone ponownie w `encode_compact`
+COMPACT_COLUMNS = numeric_features + SAMPLED_CATEGORICAL
+
+
+class ApproxNeighbors(NearestNeighbors):
+    """Przybliżone k-NN: losowa projekcja gaussowska do `n_components` wymiarów + drzewo kd.
+
+    Odległości w projekcji są zachowane w przybliżeniu (lemat Johnsona-Lindenstraussa), a drzewo kd
+    w kilku wymiarach jest dużo szybsze niż przeszukiwanie siłowe w ~100 kolumnach po kodowaniu.
+    """
+
+    def __init__(self, n_neighbors=6, n_components=8, random_state=0, algorithm='kd_tree', leaf_size=30):
+        super().__init__(n_neighbors=n_neighbors, algorithm=algorithm, leaf_size=leaf_size)
+        self.n_components = n_components
+        self.random_state = random_state
+
+    def _project(self, X):
+        X = X.toarray() if sparse.issparse(X) else np.asarray(X)
+        return X @ self.projection_
+
+    def fit(self, X, y=None):
+        n_features = X.shape[1]
+        rng = np.random.default_rng(self.random_state)
+        self.projection_ = rng.normal(size=(n_features, self.n_components)) / np.sqrt(self.n_components)
+        return super().fit(self._project(X))
+
+    def kneighbors(self, X=None, n_neighbors=None, return_distance=True):
+        return super().kneighbors(None if X is None else self._project(X), n_neighbors, return_distance)
+
+
+def typed_frame(X, columns):
+    """X (tablica) jako DataFrame z typami jak w `build_X` (bool dla one-hot, int dla cech całkowitych)."""
+    frame = pd.DataFrame(X, columns=columns)
+    kinds = {col: ('float64' if col in numeric_features else 'bool') for col in columns}
+    kinds.update({col: 'int64' for col in integer_features})
+    return frame.astype(kinds)
+
+
+def _blocks(vocab):
+    # Pozycje bloków one-hot w układzie vocab.columns
+    offset = len(numeric_features)
+    for col in categorical_features:
+        width = len(vocab.categories[col]) - 1
+        yield col, offset, width
+        offset += width
+
+
+def decode_X(X, vocab):
+    """Macierz one-hot (układ `vocab.columns`) -> reprezentacja kodowana `COMPACT_COLUMNS` (float64)."""
+    X = np.asarray(X, dtype='float64')
+    compact = [X[:, :len(numeric_features)]]
+    for col, offset, width in _blocks(vocab):
+        if col in DERIVED_CATEGORICAL:
+            continue
+        block = X[:, offset:offset + width]
+        # Brak jedynki w bloku = pierwsza kategoria (drop_first)
+        compact.append(np.where(block.any(axis=1), block.argmax(axis=1) + 1, 0)[:, None])
+    return np.hstack(compact)
+
+
+def encode_compact(compact, vocab):
+    """Odwrotność `decode_X`; cechy pochodne i interakcje liczone ponownie z (nowych) wartości składowych."""
+    n_numeric = len(numeric_features)
+    frame = pd.DataFrame(compact[:, :n_numeric], columns=numeric_features)
+    for col in integer_features:
+        if col in frame:
+            frame[col] = np.round(frame[col])
+    codes = dict(zip(SAMPLED_CATEGORICAL, compact[:, n_numeric:n_numeric + len(SAMPLED_CATEGORICAL)].astype(int).T))
+    # Jak w add_base_features: godziny szczytu z (zaokrąglonej) godziny; wartość spoza słownika = brak jedynki
+    idx, hit = category_index(rush_hour(frame['hour_of_day'].to_numpy()), vocab.categories['is_rush_hour'])
+    codes['is_rush_hour'] = np.where(hit, idx, 0)
+
+    banding = np.asarray(vocab.categories['driver_distance_banding'], dtype='float64')[codes['driver_distance_banding']]
+    # Jak w add_base_features: dystans > 20 km (driver_distance_banding 3 lub 4)
+    important = ((banding == 3) | (banding == 4)).astype('float64')
+    frame['urban_driver_speed'] = frame['is_urban_driver'] * frame['speed_limit_normalized']
+    frame['distance_speed_interaction'] = banding * frame['urban_driver_speed']
+
+    X = np.zeros((len(compact), len(vocab.columns)))
+    X[:, :n_numeric] = frame[numeric_features].to_numpy()
+    for col, offset, width in _blocks(vocab):
+        rows = np.flatnonzero(codes[col] > 0)
+        X[rows, offset + codes[col][rows] - 1] = 1
+    junction_control = np.asarray(vocab.categories['junction_control'], dtype='float64')[codes['junction_control']]
+    is_urban_driver = frame['is_urban_driver'].to_numpy()
+    offset = len(vocab.columns) - len(derived_features)
+    X[:, offset] = important
+    X[:, offset + 1] = is_urban_driver * important
+    X[:, offset + 2] = is_urban_driver * (junction_control == 4)
+    return X
+
+
+def smotenc_codes(compact, y, categorical, random_state=42, k_neighbors=5):
+    """SMOTE-NC na reprezentacji kodowanej (kolumny `categorical` zawierają kody całkowite).
+
+    Sąsiedzi są szukani w przybliżeniu (`ApproxNeighbors`) w przestrzeni: cechy liczbowe standaryzowane,
+    kategorie one-hot przeskalowane tak, że różna kategoria dodaje odległość 1 (jedno odchylenie
+    standardowe). Nowa próbka: cechy liczbowe interpolowane między próbką a losowym sąsiadem,
+    kategorie - najczęstsza wartość wśród k sąsiadów (remis: mniejszy kod). Całość wektorowo,
+    bez dekodowania one-hot wiersz po wierszu.
+    """
+    y = np.asarray(y)
+    classes, counts = np.unique(y, return_counts=True)
+    minority_class = classes[counts.argmin()]
+    minority = compact[y == minority_class]
+    n_new = counts.max() - counts.min()
+    if n_new == 0 or len(minority) < 2:
+        return compact, y
+    numeric = np.setdiff1d(np.arange(compact.shape[1]), categorical)
+    codes = minority[:, categorical].astype(int)
+    n_levels = codes.max(axis=0) + 1
+
+    std = minority[:, numeric].std(axis=0)
+    space = [minority[:, numeric] / np.where(std > 0, std, 1)]
+    for i, levels in enumerate(n_levels):
+        space.append(np.eye(levels)[codes[:, i]] / np.sqrt(2))
+    k = min(k_neighbors, len(minority) - 1)
+    nn = ApproxNeighbors(n_neighbors=k, random_state=random_state).fit(np.hstack(space))
+    neighbors = nn.kneighbors(return_distance=False)  # X=None: bez samej próbki
+
+    rng = np.random.default_rng(random_state)
+    rows = rng.integers(0, len(minority), n_new)
+    chosen = neighbors[rows, rng.integers(0, k, n_new)]
+    gap = rng.random((n_new, 1))
+    new = np.empty((n_new, compact.shape[1]))
+    new[:, numeric] = minority[rows][:, numeric] + gap * (minority[chosen][:, numeric] - minority[rows][:, numeric])
+    neighbor_codes = codes[neighbors[rows]]  # (n_new, k, liczba kategorii)
+    for i, levels in enumerate(n_levels):
+        cells = np.repeat(np.arange(n_new), k) * levels + neighbor_codes[:, :, i].ravel()
+        votes = np.bincount(cells, minlength=n_new * levels).reshape(n_new, levels)
+        new[:, categorical[i]] = votes.argmax(axis=1)
+    return np.vstack([compact, new]), np.concatenate([y, np.full(n_new, minority_class, dtype=y.dtype)])
+
+
+@traced()
+def resample(X, y, method, vocab, random_state=42, k_neighbors=5):
+    """Balansuje zbiór treningowy fałdy; zwraca (X, y) w tej samej postaci co X (tablica lub DataFrame)."""
+    if method in ('class_weight', 'none'):
+        return X, y
+    if method == 'undersample':
+        return RandomUnderSampler(random_state=random_state).fit_resample(X, y)
+    if method == 'smote':
+        # Jak smote_resample na DataFrame: nowe próbki rzutowane na typy kolumn (bool/int)
+        frame = X if isinstance(X, pd.DataFrame) else typed_frame(X, vocab.columns)
+        X_res, y_res = SMOTE(random_state=random_state, k_neighbors=k_neighbors).fit_resample(frame, y)
+        return (X_res if isinstance(X, pd.DataFrame) else X_res.to_numpy(dtype=np.asarray(X).dtype)), y_res
+    if method == 'smotenc':
+        compact = decode_X(X, vocab)
+        categorical = [COMPACT_COLUMNS.index('is_urban_driver')] + list(range(len(numeric_features), len(COMPACT_COLUMNS)))
+        compact_res, y_res = smotenc_codes(compact, y, np.array(categorical), random_state, k_neighbors)
+        X_res = encode_compact(compact_res, vocab)
+        if isinstance(X, pd.DataFrame):
+            return typed_frame(X_res, vocab.columns), y_res
+        return X_res.astype(np.asarray(X).dtype), y_res
+    raise ValueError(f"Nieznana metoda balansowania: {method!r} (dostępne: {BALANCING_METHODS})")
+
+
+def weighted_estimator(estimator, method, y):
+    """Kopia modelu; dla 'class_weight' z wagą klasy mniejszościowej (scale_pos_weight / class_weight)."""
+    estimator = clone(estimator)
+    if method != 'class_weight':
+        return estimator
+    if isinstance(estimator, XGBClassifier):
+        y = np.asarray(y)
+        return estimator.set_params(scale_pos_weight=float((y == 0).sum() / max((y == 1).sum(), 1)))
+    return estimator.set_params(class_weight='balanced')
@@ -0,0 +1,247 @@
+# Benchmark potoku (wczytanie -> czyszczenie -> cechy -> podział -> SMOTE -> trening -> predykcja) na danych
+# syntetycznych; wyniki w JSON porównywalne między przebiegami
+#
+#   python -m wypadki.benchmark --rows 10000 100000 1000000
+#   python -m wypadki.benchmark --compare benchmarks/stary.json benchmarks/nowy.json
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from xgboost import XGBClassifier
+
+from wypadki.features import FeatureVocabulary, add_features, build_X, build_X_sparse
+from wypadki.ingest import clean_data, merge_sources, read_source
+from wypadki.modeling import fit_matrix, params_rf, params_xgb, smote_resample, split_data
+from wypadki.outofcore import peak_rss_mb
+from wypadki.synthetic import SYNTHETIC_YEARS, write_synthetic
+
+RESULTS_DIR = Path('benchmarks')
+DATA_DIR = RESULTS_DIR / 'data'
+
+# Próg regresji w `compare_results`: czas lub pamięć etapu większe o ponad 10%
+TOLERANCE = 0.1
+# ... i jednocześnie dłuższy o co najmniej tyle sekund (krótkie etapy mają duży szum względny)
+MIN_SECONDS = 0.05
+
+LIBRARIES = ('numpy', 'pandas', 'scipy', 'sklearn', 'xgboost', 'imblearn', 'pyarrow')
+
+
+def reset_peak_rss():
+    """Zeruje licznik szczytowego RSS (Linux: VmHWM przez /proc/self/clear_refs); False, gdy się nie da.
+
+    Bez resetu szczyt etapu to szczyt od startu procesu (wartości są wtedy tylko ograniczeniem z góry).
+    """
+    try:
+        Path('/proc/self/clear_refs').write_text('5')
+        return True
+    except OSError:
+        return False
+
+
+class StageTimer:
+    """Czas, liczba wierszy i szczytowe RSS kolejnych etapów."""
+
+    def __init__(self):
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        """`with timer.stage('clean') as info: ...; info['rows'] = ...`"""
+        reset = reset_peak_rss()
+        info = {}
+        start = time.perf_counter()
+        yield info
+        seconds = time.perf_counter() - start
+        rows = info.get('rows')
+        self.stages.append({
+            'stage': name, 'seconds': seconds, 'rows': rows,
+            'rows_per_second': rows / seconds if rows and seconds > 0 else None,
+            'peak_rss_mb': peak_rss_mb(), 'peak_rss_reset': reset,
+        })
+
+
+def synthetic_sources(n_accidents, seed=0, data_dir=DATA_DIR):
+    """Ścieżki plików syntetycznych dla (`n_accidents`, `seed`) - generowane tylko raz; (ścieżki, czas generowania)."""
+    directory = Path(data_dir) / f'synthetic-{n_accidents}-{seed}'
+    paths = {name: directory / f'{name}.csv' for name in ('accidents', 'casualties', 'vehicles')}
+    if directory.exists():
+        return paths, None
+    start = time.perf_counter()
+    tmp_dir = directory.with_name(directory.name + '.tmp')
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    write_synthetic(tmp_dir, n_accidents, seed=seed)
+    tmp_dir.replace(directory)
+    return paths, time.perf_counter() - start
+
+
+def run_pipeline(paths, years=SYNTHETIC_YEARS, n_estimators=None, matrix='dense', random_state=42):
+    """Jeden przebieg potoku z notatnika z pomiarem każdego etapu; zwraca (etapy, AUC na zbiorze testowym).
+
+    `n_estimators` - liczba drzew obu modeli (domyślnie jak w `params_xgb` / `params_rf`);
+    `matrix` - 'dense' (`build_X`, jak w notatniku) albo 'sparse' (`build_X_sparse`).
+    """
+    timer = StageTimer()
+    with timer.stage('load') as info:
+        tables = [read_source(name, paths[name], years) for name in ('accidents', 'casualties', 'vehicles')]
+        data = merge_sources(*tables)
+        info['rows'] = len(data)
+    del tables
+    with timer.stage('clean') as info:
+        data = clean_data(data)
+        info['rows'] = len(data)
+    with timer.stage('features') as info:
+        vocab = FeatureVocabulary.fit(data)
+        data = add_features(data, vocab)
+        info['rows'] = len(data)
+    with timer.stage('one_hot') as info:
+        X = build_X_sparse(data, vocab) if matrix == 'sparse' else build_X(data, vocab)
+        y = data['is_rural_accident']
+        info['rows'] = X.shape[0]
+    del data
+    with timer.stage('split') as info:
+        X_train, X_val, X_test, y_train, y_val, y_test = split_data(X, y, random_state)
+        info['rows'] = X.shape[0]
+    del X, X_val, y_val
+    with timer.stage('smote') as info:
+        X_train, y_train = smote_resample(X_train, y_train, vocab.columns, random_state)
+        info['rows'] = X_train.shape[0]
+
+    overrides = {} if n_estimators is None else {'n_estimators': n_estimators}
+    models = {
+        'xgb': XGBClassifier(**{**params_xgb, **overrides}),
+        'rf': RandomForestClassifier(**{**params_rf, **overrides}),
+    }
+    auc = {}
+    for name, model in models.items():
+        with timer.stage(f'train_{name}') as info:
+            model.fit(fit_matrix(model, X_train), y_train)
+            info['rows'] = X_train.shape[0]
+    for name, model in models.items():
+        with timer.stage(f'score_{name}') as info:
+            proba = model.predict_proba(X_test)[:, 1]
+            info['rows'] = X_test.shape[0]
+        auc[name] = float(roc_auc_score(y_test, proba))
+    return timer.stages, auc
+
+
+def _fastest(runs):
+    # Dla powtórzeń: najszybszy pomiar każdego etapu (najmniej zakłócony przez resztę systemu)
+    return [min(attempts, key=lambda record: record['seconds']) for attempts in zip(*runs)]
+
+
+def environment():
+    """Metadane przebiegu: commit, wersje bibliotek, platforma - do oceny porównywalności wyników."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    versions = {}
+    for name in LIBRARIES:
+        module = sys.modules.get(name) or __import__(name)
+        versions[name] = getattr(module, '__version__', None)
+    return {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': commit, 'python': platform.python_version(),
+            'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'libraries': versions}
+
+
+def run_benchmark(sizes, repeat=1, seed=0, n_estimators=None, matrix='dense', data_dir=DATA_DIR):
+    """Benchmark dla każdej liczby wypadków z `sizes`; słownik gotowy do zapisu w JSON."""
+    result = {'meta': {**environment(), 'seed': seed, 'repeat': repeat, 'n_estimators': n_estimators,
+                       'matrix': matrix}, 'runs': []}
+    for n_accidents in sizes:
+        paths, generate_seconds = synthetic_sources(n_accidents, seed, data_dir)
+        runs, auc = [], None
+        for _ in range(repeat):
+            stages, auc = run_pipeline(paths, n_estimators=n_estimators, matrix=matrix)
+            runs.append(stages)
+        result['runs'].append({'accidents': n_accidents, 'generate_seconds': generate_seconds, 'auc': auc,
+                               'stages': _fastest(runs)})
+    return result
+
+
+def save_result(result, results_dir=RESULTS_DIR):
+    """Zapisuje wynik jako `<znacznik czasu>-<rozmiary>.json` i zwraca ścieżkę."""
+    results_dir = Path(results_dir)
+    results_dir.mkdir(parents=True, exist_ok=True)
+    sizes = '_'.join(str(run['accidents']) for run in result['runs'])
+    path = results_dir / f"{result['meta']['timestamp'].replace(':', '')}-{sizes}.json"
+    path.write_text(json.dumps(result, indent=1))
+    return path
+
+
+def stage_table(result):
+    """Wyniki jednego przebiegu jako tabela (wiersz = rozmiar danych x etap)."""
+    records = [{'accidents': run['accidents'], **stage} for run in result['runs'] for stage in run['stages']]
+    return pd.DataFrame(records)
+
+
+def compare_results(baseline, current, tolerance=TOLERANCE, min_seconds=MIN_SECONDS):
+    """Porównanie dwóch wyników (słowniki z JSON) dla wspólnych par (rozmiar, etap).
+
+    Regresja: czas etapu większy niż `(1 + tolerance)` razy wartość bazowa i o co najmniej `min_seconds`
+    albo szczytowe RSS większe niż `(1 + tolerance)` razy wartość bazowa.
+    """
+    merged = stage_table(baseline).merge(stage_table(current), on=['accidents', 'stage'], suffixes=('_base', ''))
+    table = pd.DataFrame({
+        'Wypadki': merged['accidents'],
+        'Etap': merged['stage'],
+        'Czas bazowy [s]': merged['seconds_base'],
+        'Czas [s]': merged['seconds'],
+        'Zmiana czasu': merged['seconds'] / merged['seconds_base'],
+        'RSS bazowe [MB]': merged['peak_rss_mb_base'],
+        'RSS [MB]': merged['peak_rss_mb'],
+        'Zmiana RSS': merged['peak_rss_mb'] / merged['peak_rss_mb_base'],
+    })
+    slower = (table['Zmiana czasu'] > 1 + tolerance) & (table['Czas [s]'] - table['Czas bazowy [s]'] >= min_seconds)
+    table['Regresja'] = slower | (table['Zmiana RSS'] > 1 + tolerance)
+    return table
+
+
+def _print_table(table):
+    with pd.option_context('display.max_rows', None, 'display.width', 160, 'display.float_format', '{:.3f}'.format):
+        print(table.to_string(index=False))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark potoku danych i modeli na syntetycznych danych STATS19.")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000],
+                        help="liczby wypadków (10 tys. - 10 mln); tabela po złączeniu jest ok. 2,3x większa")
+    parser.add_argument('--repeat', type=int, default=1, help="powtórzenia; zapisywany najszybszy pomiar etapu")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--trees', type=int, help="liczba drzew obu modeli (domyślnie jak w analizie)")
+    parser.add_argument('--matrix', choices=('dense', 'sparse'), default='dense')
+    parser.add_argument('--data-dir', type=Path, default=DATA_DIR)
+    parser.add_argument('--out', type=Path, default=RESULTS_DIR)
+    parser.add_argument('--compare', nargs=2, type=Path, metavar=('BAZOWY', 'NOWY'),
+                        help="porównaj dwa zapisane wyniki zamiast uruchamiać benchmark")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        baseline, current = (json.loads(path.read_text()) for path in args.compare)
+        for key in ('commit', 'cpu_count', 'matrix', 'n_estimators', 'seed'):
+            if baseline['meta'].get(key) != current['meta'].get(key):
+                print(f"Uwaga: różne '{key}': {baseline['meta'].get(key)} -> {current['meta'].get(key)}")
+        table = compare_results(baseline, current, args.tolerance)
+        _print_table(table)
+        return int(table['Regresja'].any())
+
+    result = run_benchmark(args.rows, args.repeat, args.seed, args.trees, args.matrix, args.data_dir)
+    _print_table(stage_table(result))
+    print(f"Zapisano {save_result(result, args.out)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,184 @@
+# Przedziały ufności bootstrap dla metryk modeli (AUC, AP, precision, recall, F1) i testów chi-kwadrat (chi2, V):
+# replikacje to losowania wielomianowe liczności - komórek tabeli kontyngencji albo par (wynik, etykieta)
+# zapisanych predykcji - więc nie wymagają ani ponownego trenowania, ani przeglądania pojedynczych rekordów
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from wypadki.curves import ScoreSummary, threshold_metrics
+from wypadki.profiling import traced
+
+N_REPLICATES = 2000
+CONFIDENCE = 0.95
+
+# Replikacje w jednym zadaniu puli, ale nie więcej niż MAX_BATCH_CELLS losowanych liczności naraz
+# (replikacje x komórki, ok. 8 B na komórkę)
+BATCH_REPLICATES = 250
+MAX_BATCH_CELLS = 4_000_000
+MIN_PARALLEL_CELLS = 2_000_000
+
+METRICS = ['AUC-ROC', 'Average Precision', 'Accuracy', 'Precision (1)', 'Recall (1)', 'F1 (1)']
+INTERVAL_COLUMNS = ['Wartość', 'Dolna granica', 'Górna granica', 'Błąd std.']
+
+
+def _batches(n_replicates, cells):
+    size = max(1, min(BATCH_REPLICATES, MAX_BATCH_CELLS // max(cells, 1)))
+    return [min(size, n_replicates - start) for start in range(0, n_replicates, size)]
+
+
+def _run(jobs, n_jobs, cells):
+    """Wyniki zadań [(funkcja, argumenty)] w kolejności zadań; `n_jobs` procesów (1 = bez puli).
+
+    `cells` - łączna liczba losowanych liczności; małe zadania (np. tabele 2x2) liczone są bez puli, bo
+    uruchomienie procesów trwa dłużej niż same obliczenia.
+    """
+    n_jobs = min(n_jobs, len(jobs)) if cells >= MIN_PARALLEL_CELLS else 1
+    if n_jobs <= 1:
+        return [fn(*args) for fn, args in jobs]
+    with ProcessPoolExecutor(max_workers=n_jobs) as pool:
+        futures = [pool.submit(fn, *args) for fn, args in jobs]
+        return [future.result() for future in futures]
+
+
+def _jobs(fn, args, n_replicates, cells, seed):
+    # Podział na partie i strumienie losowe partii (SeedSequence.spawn) nie zależą od liczby procesów,
+    # więc wynik dla danego `seed` jest zawsze ten sam
+    sizes = _batches(n_replicates, cells)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    return [(fn, (*args, size, child)) for size, child in zip(sizes, seeds)]
+
+
+def _interval(point, values, confidence):
+    low, high = np.nanpercentile(values, [(1 - confidence) / 2 * 100, (1 + confidence) / 2 * 100])
+    return {'Wartość': point, 'Dolna granica': low, 'Górna granica': high, 'Błąd std.': np.nanstd(values, ddof=1)}
+
+
+def score_counts(summary):
+    """Liczności klas 1 i 0 dla kolejnych progów `summary` (unikalne wyniki malejąco)."""
+    return np.diff(summary.tp, prepend=0).astype(np.int64), np.diff(summary.fp, prepend=0).astype(np.int64)
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / np.maximum(denominator, 1), 0.0)
+
+
+def _score_batch(pos, neg, k, n_replicates, seed):
+    # Uruchamiane w procesie potomnym: replikacje liczności (wynik, etykieta) i metryki każdej replikacji
+    rng = np.random.default_rng(seed)
+    counts = np.concatenate([pos, neg])
+    n = int(counts.sum())
+    draws = rng.multinomial(n, counts / n, size=n_replicates)
+    tp = np.cumsum(draws[:, :len(pos)], axis=1)
+    fp = np.cumsum(draws[:, len(pos):], axis=1)
+    del draws
+    n_pos, n_neg = tp[:, -1:], fp[:, -1:]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        tpr = np.concatenate([np.zeros_like(n_pos), tp], axis=1) / n_pos
+        fpr = np.concatenate([np.zeros_like(n_neg), fp], axis=1) / n_neg
+    auc = np.sum(np.diff(fpr, axis=1) * (tpr[:, 1:] + tpr[:, :-1]) / 2, axis=1)
+    # Jak ScoreSummary.average_precision: progi bez rekordów nie zmieniają recall, więc nie wnoszą nic
+    ap = np.sum(np.diff(tpr, axis=1) * _ratio(tp, tp + fp), axis=1)
+
+    # Próg decyzyjny: k pierwszych (najwyższych) wyników to klasa 1
+    tp_k = tp[:, k - 1] if k else np.zeros(n_replicates)
+    fp_k = fp[:, k - 1] if k else np.zeros(n_replicates)
+    precision = _ratio(tp_k, tp_k + fp_k)
+    recall = _ratio(tp_k, n_pos[:, 0])
+    return np.column_stack([
+        auc, ap, (tp_k + n_neg[:, 0] - fp_k) / n, precision, recall, _ratio(2 * precision * recall, precision + recall),
+    ])
+
+
+@traced()
+def metric_intervals(summary, threshold=0.5, n_replicates=N_REPLICATES, confidence=CONFIDENCE, seed=0, n_jobs=None):
+    """Przedziały ufności metryk `METRICS` (klasa 1 przy `score >= threshold`) z `ScoreSummary`.
+
+    Replikacja = losowanie wielomianowe n par (wynik, etykieta) z rozkładu zapisanych predykcji, czyli bootstrap
+    zbioru testowego bez ponownego przeglądania rekordów. Koszt zależy od liczby unikalnych wyników, więc
+    predykcje powinny być zapisane jako float16 (jak w `registry.save_predictions`). Replikacje liczone w
+    `n_jobs` procesach (domyślnie liczba rdzeni). Zwraca tabelę: wiersz = metryka, kolumny `INTERVAL_COLUMNS`.
+    """
+    pos, neg = score_counts(summary)
+    k = int(np.searchsorted(-summary.thresholds, -threshold, side='right'))
+    n_jobs = n_jobs or os.cpu_count() or 1
+    jobs = _jobs(_score_batch, (pos, neg, k), n_replicates, 2 * len(pos), seed)
+    replicates = np.concatenate(_run(jobs, n_jobs, n_replicates * 2 * len(pos)))
+
+    point = threshold_metrics(summary.confusion(threshold))
+    points = [summary.roc_auc(), summary.average_precision(), point['accuracy'], point['precision'], point['recall'],
+              point['f1']]
+    rows = [_interval(value, replicates[:, i], confidence) for i, value in enumerate(points)]
+    return pd.DataFrame(rows, index=pd.Index(METRICS, name='Metryka'), columns=INTERVAL_COLUMNS)
+
+
+@traced()
+def prediction_intervals(labels, scores, threshold=0.5, **kwargs):
+    """`metric_intervals` dla wektorów predykcji (wyniki zaokrąglane do float16, jak w rejestrze modeli)."""
+    summary = ScoreSummary.from_predictions(labels, np.asarray(scores, dtype=np.float16))
+    return metric_intervals(summary, threshold, **kwargs)
+
+
+def chi2_statistics(tables):
+    """chi2, dof i V Craméra dla partii tabel kontyngencji o kształcie (replikacje, wiersze, kolumny).
+
+    Jak `aggregations.chi2_test`: puste wiersze i kolumny są pomijane, a dla tabel 2x2 (dof = 1) stosowana
+    jest poprawka Yatesa (domyślna w scipy.stats.chi2_contingency).
+    """
+    tables = np.asarray(tables, dtype=np.float64)
+    rows, cols = tables.sum(axis=2), tables.sum(axis=1)
+    n = rows.sum(axis=1)
+    k_rows, k_cols = np.count_nonzero(rows, axis=1), np.count_nonzero(cols, axis=1)
+    dof = (k_rows - 1) * (k_cols - 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        expected = rows[:, :, None] * cols[:, None, :] / n[:, None, None]
+        diff = expected - tables
+        yates = (dof == 1)[:, None, None]
+        observed = np.where(yates, tables + np.sign(diff) * np.minimum(0.5, np.abs(diff)), tables)
+        terms = np.where(expected > 0, (observed - expected) ** 2 / expected, 0.0)
+        chi2 = np.where(dof > 0, terms.sum(axis=(1, 2)), np.nan)
+        k = np.minimum(k_rows, k_cols)
+        v = np.where(k > 1, np.sqrt(chi2 / (n * (k - 1))), np.nan)
+    return chi2, dof, v
+
+
+def _table_batch(table, n_replicates, seed):
+    # Uruchamiane w procesie potomnym: replikacje tabeli kontyngencji i ich chi2 oraz V
+    rng = np.random.default_rng(seed)
+    counts = table.ravel()
+    n = int(counts.sum())
+    draws = rng.multinomial(n, counts / n, size=n_replicates).reshape(n_replicates, *table.shape)
+    chi2, _, v = chi2_statistics(draws)
+    return np.column_stack([chi2, v])
+
+
+@traced()
+def association_intervals(tables, n_replicates=N_REPLICATES, confidence=CONFIDENCE, seed=0, n_jobs=None):
+    """Przedziały ufności chi2 i V Craméra (dla tabel 2x2 równego Phi) dla tabel kontyngencji.
+
+    `tables` - {nazwa: tabela liczności} (DataFrame lub macierz), np. `aggregations.key_feature_tables`.
+    Replikacja = losowanie wielomianowe n rekordów z komórek tabeli; wszystkie tabele liczone w jednej puli
+    `n_jobs` procesów. Zwraca tabelę z wierszem na nazwę i kolumnami chi2 / V x `INTERVAL_COLUMNS`.
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    arrays = {name: np.asarray(table, dtype=np.int64) for name, table in tables.items()}
+    jobs, owners, cells = [], [], 0
+    for name, table in arrays.items():
+        cells += n_replicates * table.size
+        table_jobs = _jobs(_table_batch, (table,), n_replicates, table.size, seed)
+        jobs += table_jobs
+        owners += [name] * len(table_jobs)
+    results = _run(jobs, n_jobs, cells)
+
+    rows = []
+    for name, table in arrays.items():
+        replicates = np.concatenate([result for owner, result in zip(owners, results) if owner == name])
+        chi2, _, v = chi2_statistics(table[None])
+        row = {'Cecha': name}
+        for i, (statistic, point) in enumerate([('chi2', chi2[0]), ('V', v[0])]):
+            interval = _interval(point, replicates[:, i], confidence)
+            row.update({f'{statistic}: {column}': value for column, value in interval.items()})
+        rows.append(row)
+    return pd.DataFrame(rows).set_index('Cecha')
@@ -0,0 +1,354 @@
+# Kompaktowy eksport modeli drzewiastych (RandomForest i booster XGBoost): drzewa jako płaskie tablice NumPy
+# w jednym pliku .npz - mały rozmiar, szybkie wczytanie i wektorowa predykcja bez sklearn / xgboost
+#
+#   python -m wypadki.compact                                   # eksport najnowszej wersji modeli + benchmark
+#   python -m wypadki.compact --precision float16 --prune 0.0005 --tolerance 0.01
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from wypadki.profiling import traced
+
+COMPACT_FILES = {'xgb': 'xgb.compact.npz', 'rf': 'rf.compact.npz'}
+ORIGINAL_FILES = {'xgb': 'xgb.ubj', 'rf': 'rf.joblib'}
+
+# Największa dopuszczalna różnica prawdopodobieństw względem oryginału dla eksportu bez kompresji
+TOLERANCE = 1e-5
+
+# Wiersze przetwarzane naraz w `predict` (tablice węzłów wiersze x drzewa)
+CHUNK_ROWS = 8192
+
+
+@dataclass
+class CompactForest:
+    """Las drzew w układzie płaskim, węzły każdego drzewa w kolejności preorder.
+
+    Lewe dziecko węzła `i` to zawsze `i + 1`, więc zapisywane jest tylko prawe (`right`). Węzeł wewnętrzny
+    kieruje w lewo, gdy x <= `threshold` (float32). W liściu (`feature` = -1) `right` to indeks w `value`:
+    prawdopodobieństwo klasy 1 (las losowy, wynik = średnia) albo margines (XGBoost, wynik = sigmoida sumy
+    marginesów i `base_margin`).
+    """
+    kind: str
+    feature: np.ndarray
+    threshold: np.ndarray
+    right: np.ndarray
+    missing_left: np.ndarray
+    value: np.ndarray
+    roots: np.ndarray
+    depth: int
+    base_margin: float = 0.0
+
+    @property
+    def n_nodes(self):
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ('feature', 'threshold', 'right', 'missing_left', 'value', 'roots'))
+
+    def _leaves(self, X):
+        rows = np.arange(len(X))[:, None]
+        node = np.repeat(self.roots[None, :], len(X), axis=0)
+        check_missing = bool(self.missing_left.any()) and bool(np.isnan(X).any())
+        for _ in range(self.depth):
+            feature = self.feature[node]
+            internal = feature >= 0
+            if not internal.any():
+                break
+            x = X[rows, np.where(internal, feature, 0)]
+            go_left = x <= self.threshold[node]
+            if check_missing:
+                go_left |= np.isnan(x) & self.missing_left[node]
+            node = np.where(internal, np.where(go_left, node + 1, self.right[node]), node)
+        return self.value[self.right[node]].astype(np.float64)
+
+    def predict(self, X, chunk_rows=CHUNK_ROWS):
+        """Prawdopodobieństwo klasy 1 dla macierzy cech `X` (kolumny jak `vocab.columns`)."""
+        X = np.asarray(X, dtype=np.float32)
+        result = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk_rows):
+            leaves = self._leaves(X[start:start + chunk_rows])
+            if self.kind == 'rf':
+                result[start:start + chunk_rows] = leaves.mean(axis=1)
+            else:
+                result[start:start + chunk_rows] = 1 / (1 + np.exp(-(leaves.sum(axis=1) + self.base_margin)))
+        return result
+
+    def save(self, path):
+        path = Path(path)
+        tmp_path = path.with_name(path.name + '.tmp.npz')
+        # Bez kompresji: wczytanie to odczyt tablic wprost z pliku
+        np.savez(tmp_path, feature=self.feature, threshold=self.threshold, right=self.right,
+                 missing_left=self.missing_left, value=self.value, roots=self.roots,
+                 meta=np.array(json.dumps({'kind': self.kind, 'depth': self.depth, 'base_margin': self.base_margin})))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            meta = json.loads(str(arrays['meta']))
+            return cls(feature=arrays['feature'], threshold=arrays['threshold'], right=arrays['right'],
+                       missing_left=arrays['missing_left'], value=arrays['value'], roots=arrays['roots'], **meta)
+
+
+def _float32_le(threshold):
+    # Próg float32 t' taki, że x <= t' <=> x <= t dla każdego x typu float32 (zaokrąglenie w dół). Progów nie
+    # można zapisać w float16: cechy pochodne mają wartości różniące się o pojedyncze ulp float32
+    threshold = np.asarray(threshold, dtype=np.float64)
+    rounded = threshold.astype(np.float32)
+    up = rounded.astype(np.float64) > threshold
+    rounded[up] = np.nextafter(rounded[up], np.float32(-np.inf))
+    return rounded
+
+
+def _postorder(left, right):
+    # Węzły drzewa w kolejności, w której dzieci są przed rodzicem
+    order = []
+    stack = [0]
+    while stack:
+        node = stack.pop()
+        order.append(node)
+        if left[node] >= 0:
+            stack += [left[node], right[node]]
+    return reversed(order)
+
+
+def _leaf_mean(left, right, value, weight):
+    # Wartości węzłów wewnętrznych jako średnia liści poddrzewa ważona `weight`
+    value, weight = value.copy(), weight.astype(np.float64)
+    for node in _postorder(left, right):
+        if left[node] >= 0:
+            children = [left[node], right[node]]
+            weight[node] = weight[children].sum()
+            value[node] = (value[children] * weight[children]).sum() / weight[node] if weight[node] > 0 \
+                else value[children].mean()
+    return value
+
+
+def _prunable(left, right, value, tolerance):
+    # Węzły, których wszystkie liście poddrzewa różnią się od wartości węzła o nie więcej niż `tolerance`
+    if tolerance is None:
+        return np.zeros(len(left), dtype=bool)
+    low, high = value.copy(), value.copy()
+    for node in _postorder(left, right):
+        if left[node] >= 0:
+            low[node] = min(low[left[node]], low[right[node]])
+            high[node] = max(high[left[node]], high[right[node]])
+    return (left >= 0) & (high - value <= tolerance) & (value - low <= tolerance)
+
+
+def _flatten(trees, precision, prune):
+    """Łączy drzewa {left, right, feature, threshold, missing_left, value} w tablice preorder `CompactForest`."""
+    features, thresholds, rights, missing, values, roots = [], [], [], [], [], []
+    offset, n_leaves, depth = 0, 0, 0
+    for tree in trees:
+        left, right = tree['left'], tree['right']
+        collapse = _prunable(left, right, tree['value'], prune)
+        order = []
+        stack = [(0, 0)]
+        while stack:
+            node, level = stack.pop()
+            order.append(node)
+            depth = max(depth, level)
+            if left[node] >= 0 and not collapse[node]:
+                stack += [(right[node], level + 1), (left[node], level + 1)]
+        order = np.array(order)
+        position = np.full(len(left), -1, dtype=np.int64)
+        position[order] = offset + np.arange(len(order))
+        leaf = (left[order] < 0) | collapse[order]
+        leaf_index = n_leaves + np.cumsum(leaf) - 1
+        features.append(np.where(leaf, -1, tree['feature'][order]).astype(np.int16))
+        thresholds.append(np.where(leaf, 0.0, tree['threshold'][order]))
+        rights.append(np.where(leaf, leaf_index, position[np.where(leaf, 0, right[order])]).astype(np.int32))
+        missing.append(tree['missing_left'][order] & ~leaf)
+        values.append(tree['value'][order][leaf])
+        roots.append(offset)
+        offset += len(order)
+        n_leaves += int(leaf.sum())
+    return dict(feature=np.concatenate(features), threshold=_float32_le(np.concatenate(thresholds)),
+                right=np.concatenate(rights), missing_left=np.concatenate(missing),
+                value=np.concatenate(values).astype(precision), roots=np.array(roots, dtype=np.int32), depth=depth)
+
+
+@traced()
+def compile_forest(rf, precision='float32', prune=None):
+    """`CompactForest` z lasu sklearn (`RandomForestClassifier`, klasa 1 = `rf.classes_[1]`).
+
+    `precision` - typ wartości liści ('float32' - wynik jak w oryginale, 'float16' - błąd liścia do ok. 2e-4);
+    `prune` - tolerancja przycinania: poddrzewo zastępowane liściem, gdy wszystkie jego liście różnią się
+    od prawdopodobieństwa w węźle o nie więcej niż `prune` (błąd predykcji lasu <= `prune`).
+    """
+    positive = list(rf.classes_).index(1)
+    trees = []
+    for estimator in rf.estimators_:
+        tree = estimator.tree_
+        counts = tree.value[:, 0, :]
+        trees.append({
+            'left': tree.children_left, 'right': tree.children_right, 'feature': tree.feature,
+            'threshold': tree.threshold, 'value': counts[:, positive] / counts.sum(axis=1),
+            'missing_left': np.asarray(getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count)), dtype=bool),
+        })
+    return CompactForest(kind='rf', **_flatten(trees, precision, prune))
+
+
+@traced()
+def compile_booster(booster, precision='float32', prune=None):
+    """`CompactForest` z boostera XGBoost (binary:logistic, podziały liczbowe).
+
+    XGBoost kieruje w lewo, gdy x < próg - próg zamieniany jest na największą mniejszą liczbę float32,
+    co daje równoważne x <= próg. `prune` - jak w `compile_forest`, ale dla marginesów pojedynczych drzew,
+    więc błąd marginesu sumy to co najwyżej liczba drzew x `prune`, a prawdopodobieństwa - jedna czwarta
+    tego. Wartość węzła wewnętrznego to średnia liści poddrzewa ważona sumą hesjanów (`base_weights`
+    węzłów wewnętrznych nie są przeskalowane przez learning rate, w przeciwieństwie do wartości liści).
+    """
+    model = json.loads(booster.save_raw('json'))['learner']
+    objective = model['objective']['name']
+    if objective != 'binary:logistic':
+        raise ValueError(f"Nieobsługiwany cel modelu: {objective!r} (obsługiwany: 'binary:logistic')")
+    base_score = float(model['learner_model_param']['base_score'].strip('[]'))
+    trees = []
+    for tree in model['gradient_booster']['model']['trees']:
+        if any(tree['split_type']):
+            raise ValueError("Podziały kategoryczne XGBoost nie są obsługiwane")
+        left = np.asarray(tree['left_children'], dtype=np.int64)
+        conditions = np.asarray(tree['split_conditions'], dtype=np.float32)
+        right = np.asarray(tree['right_children'], dtype=np.int64)
+        leaf = left < 0
+        trees.append({
+            'left': left, 'right': right, 'feature': np.asarray(tree['split_indices'], dtype=np.int64),
+            'threshold': np.where(leaf, conditions, np.nextafter(conditions, np.float32(-np.inf))),
+            'value': _leaf_mean(left, right, conditions.astype(np.float64), np.asarray(tree['sum_hessian'])),
+            'missing_left': np.asarray(tree['default_left'], dtype=bool),
+        })
+    forest = _flatten(trees, precision, prune)
+    return CompactForest(kind='xgb', base_margin=float(np.log(base_score / (1 - base_score))), **forest)
+
+
+def export_compact(path, bundle, precision='float32', prune=None):
+    """Eksportuje modele wersji rejestru (`ModelBundle`) do plików `COMPACT_FILES` w katalogu `path`."""
+    compiled = {}
+    if bundle.booster is not None:
+        compiled['xgb'] = compile_booster(bundle.booster, precision, prune)
+    if bundle.rf is not None:
+        compiled['rf'] = compile_forest(bundle.rf, precision, prune)
+    for name, forest in compiled.items():
+        forest.save(Path(path) / COMPACT_FILES[name])
+    return compiled
+
+
+def load_compact(path):
+    """Modele kompaktowe zapisane w katalogu wersji `path`: {'xgb': CompactForest, 'rf': ...} (puste, gdy brak)."""
+    return {name: CompactForest.load(Path(path) / file) for name, file in COMPACT_FILES.items()
+            if (Path(path) / file).exists()}
+
+
+def _original_predict(bundle, name, X):
+    if name == 'xgb':
+        return bundle.booster.inplace_predict(X, validate_features=False)
+    return bundle.rf_proba(X)
+
+
+def _load_original(path, name):
+    import joblib
+    import xgboost as xgb
+
+    file = Path(path) / ORIGINAL_FILES[name]
+    return xgb.Booster(model_file=str(file)) if name == 'xgb' else joblib.load(file)
+
+
+def _median_seconds(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times))
+
+
+def sample_features(bundle, n_rows=10_000, seed=0):
+    """Macierz cech `n_rows` syntetycznych rekordów (wypadki/synthetic.py) do benchmarku predykcji."""
+    from wypadki.ingest import clean_data, merge_sources
+    from wypadki.synthetic import generate_chunk
+
+    # Nie każdy wypadek daje rekord po czyszczeniu - generowane kolejne partie, aż będzie ich dość
+    rng = np.random.default_rng(seed)
+    parts, n_data = [], 0
+    while n_data < n_rows:
+        tables = generate_chunk(rng, 2023, len(parts) * n_rows, n_rows)
+        parts.append(clean_data(merge_sources(tables['accidents'], tables['casualties'], tables['vehicles'])))
+        n_data += len(parts[-1])
+    return bundle.features(pd.concat(parts, ignore_index=True).head(n_rows))
+
+
+@traced()
+def benchmark_compact(path, bundle, compiled, X, single_repeat=200, batch_repeat=3):
+    """Rozmiar pliku, czas wczytania, opóźnienie partii i pojedynczego wiersza oraz maksymalna różnica
+    predykcji: oryginał (sklearn / xgboost) vs eksport kompaktowy, dla każdego modelu."""
+    rows = []
+    row = X[:1]
+    for name, forest in compiled.items():
+        original = bundle.booster if name == 'xgb' else bundle.rf
+        if name == 'rf':
+            # Pojedynczy wiersz bez puli wątków - narzut joblib przy n_jobs=-1 dominowałby pomiar
+            single = original.get_params()['n_jobs']
+            original.set_params(n_jobs=1)
+        variants = {
+            'oryginał': (Path(path) / ORIGINAL_FILES[name], lambda: _load_original(path, name),
+                         lambda data: _original_predict(bundle, name, data)),
+            'kompaktowy': (Path(path) / COMPACT_FILES[name], lambda: CompactForest.load(Path(path) / COMPACT_FILES[name]),
+                           forest.predict),
+        }
+        for variant, (file, load, predict) in variants.items():
+            rows.append({
+                'Model': name, 'Wariant': variant, 'Węzły': forest.n_nodes, 'Rozmiar [MB]': file.stat().st_size / 1e6,
+                'Wczytanie [ms]': _median_seconds(load, 3) * 1000,
+                'Partia [ms]': _median_seconds(lambda: predict(X), batch_repeat) * 1000,
+                'Wiersz [ms]': _median_seconds(lambda: predict(row), single_repeat) * 1000,
+            })
+        if name == 'rf':
+            original.set_params(n_jobs=single)
+        rows[-1]['Maks. różnica'] = float(np.max(np.abs(forest.predict(X) - _original_predict(bundle, name, X))))
+    table = pd.DataFrame(rows)
+    table['Wiersze partii'] = len(X)
+    return table
+
+
+def main(argv=None):
+    from wypadki import registry
+
+    parser = argparse.ArgumentParser(description="Eksport modeli do formatu kompaktowego i benchmark predykcji.")
+    parser.add_argument('--models', type=Path, default=registry.MODELS_DIR)
+    parser.add_argument('--version', help="wersja rejestru (domyślnie najnowsza)")
+    parser.add_argument('--precision', choices=('float32', 'float16'), default='float32')
+    parser.add_argument('--prune', type=float, help="tolerancja przycinania poddrzew (domyślnie bez przycinania)")
+    parser.add_argument('--rows', type=int, default=10_000, help="wiersze partii w benchmarku")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="maksymalna różnica prawdopodobieństw względem oryginału")
+    args = parser.parse_args(argv)
+
+    version = args.version or registry.latest_version(args.models)
+    if version is None:
+        parser.error(f"Brak zapisanych modeli w '{args.models}'")
+    path = args.models / version
+    bundle = registry.load_bundle(path)
+    compiled = export_compact(path, bundle, args.precision, args.prune)
+    table = benchmark_compact(path, bundle, compiled, sample_features(bundle, args.rows))
+    with pd.option_context('display.width', 160, 'display.float_format', '{:.4g}'.format):
+        print(table.to_string(index=False))
+    worst = table['Maks. różnica'].max()
+    if worst > args.tolerance:
+        print(f"Różnica predykcji {worst:.3g} przekracza tolerancję {args.tolerance:.3g}")
+        return 1
+    print(f"Zapisano {', '.join(COMPACT_FILES[name] for name in compiled)} w {path}; "
+          f"różnica predykcji {worst:.3g} <= {args.tolerance:.3g}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,87 @@
+# Kostka liczności do interaktywnego filtrowania: testy chi-kwadrat bez ponownego skanowania tabeli `data`
+import numpy as np
+import pandas as pd
+
+from wypadki.aggregations import (KEY_FEATURE_GROUPS, contingency_table, driver_origin_table, driver_stats_table,
+                                  key_feature_tables, key_feature_tests)
+
+# Wymiary dostępne jako filtry w aplikacji (kolumna -> etykieta)
+FILTER_DIMENSIONS = {
+    'accident_year': 'Rok',
+    'road_type': 'Typ drogi (road_type)',
+    'light_conditions': 'Warunki oświetlenia (light_conditions)',
+    'speed_limit': 'Limit prędkości (speed_limit)',
+    'weather_conditions': 'Warunki pogodowe (weather_conditions)',
+    'casualty_type': 'Typ poszkodowanego (casualty_type)',
+}
+
+# Pozostałe kluczowe cechy; junction_* trzymamy już po zgrupowaniu kategorii, żeby kostka była mniejsza
+TARGET_DIMENSIONS = ['is_urban_driver', 'is_rural_accident']
+GROUPED_DIMENSIONS = ['junction_control', 'junction_detail', 'important_driver_distance']
+
+CUBE_DIMENSIONS = list(FILTER_DIMENSIONS) + TARGET_DIMENSIONS + GROUPED_DIMENSIONS
+
+
+def build_cube(data):
+    """Liczności wierszy `data` (po `prepare_dataset`) dla każdej kombinacji wymiarów kostki.
+
+    Kostka ma kolumny `CUBE_DIMENSIONS` (kody int16) oraz `count`; obserwowane kombinacje to
+    zwykle kilkadziesiąt tysięcy wierszy zamiast setek tysięcy w tabeli wyjściowej.
+    """
+    dims = {}
+    for col in CUBE_DIMENSIONS:
+        values = data[col]
+        grouping = KEY_FEATURE_GROUPS.get(col) if col in GROUPED_DIMENSIONS else None
+        if grouping is not None:
+            kept, other = grouping
+            values = values.where(values.isin(kept), other)
+        dims[col] = values.to_numpy(dtype='int16')
+    cube = pd.DataFrame(dims).groupby(CUBE_DIMENSIONS, sort=False).size().rename('count').reset_index()
+    cube['count'] = cube['count'].astype('int64')
+    return cube
+
+
+def combine_cubes(cubes, signs=None):
+    """Suma kostek (np. kostka całości + delta nowego roku); `signs` (+1/-1) pozwala odjąć starą wersję roku.
+
+    Koszt zależy od rozmiaru kostek, nie od liczby wierszy danych; kombinacje z liczbą 0 są usuwane.
+    """
+    signs = signs or [1] * len(cubes)
+    parts = [c.assign(count=c['count'] * sign) for c, sign in zip(cubes, signs)]
+    total = pd.concat(parts, ignore_index=True).groupby(CUBE_DIMENSIONS, sort=False)['count'].sum().reset_index()
+    return total[total['count'] != 0].reset_index(drop=True)
+
+
+def filter_options(cube):
+    """Wartości dostępne w każdym filtrze (posortowane)."""
+    return {col: np.sort(cube[col].unique()).tolist() for col in FILTER_DIMENSIONS}
+
+
+def slice_cube(cube, filters):
+    """Wycinek kostki dla filtrów {kolumna: lista wartości}; pusta lista lub None oznacza brak filtra."""
+    mask = np.ones(len(cube), dtype=bool)
+    for col, values in filters.items():
+        if values:
+            mask &= np.isin(cube[col].to_numpy(), values)
+    return cube[mask]
+
+
+def cube_association(cube):
+    """Tabela kontyngencji is_urban_driver x is_rural_accident z (wycinka) kostki."""
+    return contingency_table(cube, weight='count')
+
+
+def cube_key_feature_tests(cube):
+    """Testy chi-kwadrat i V Craméra dla kluczowych cech z (wycinka) kostki."""
+    return key_feature_tests(cube, weight='count')
+
+
+def cube_key_feature_tables(cube):
+    """Tabele liczności kluczowych cech względem is_rural_accident z (wycinka) kostki."""
+    return key_feature_tables(cube, weight='count')
+
+
+def cube_driver_tables(cube):
+    """(liczba wierszy, Tabela 1, Tabela 2) sekcji "Analiza Wstępna Kierowców" z kostki."""
+    return (int(cube['count'].sum()), driver_origin_table(cube, weight='count'),
+            driver_stats_table(cube, weight='count'))
@@ -0,0 +1,103 @@
+# Krzywe ROC / precision-recall, kalibracja i macierz pomyłek z zapisanych wektorów predykcji (float16)
+from dataclasses import dataclass
+
+import numpy as np
+
+# Nieujemne liczby float16 mają wzorce bitowe uporządkowane tak jak wartości
+_FLOAT16_PATTERNS = 1 << 16
+
+
+@dataclass
+class ScoreSummary:
+    """Skumulowane liczności TP/FP dla każdego progu (unikalne wyniki malejąco).
+
+    Liczone raz na wektor predykcji; krzywe i macierz pomyłek dla dowolnego progu to już tylko
+    odczyt z tablic (wyszukiwanie binarne), bez ponownego przeglądania próbek.
+    """
+    thresholds: np.ndarray
+    tp: np.ndarray
+    fp: np.ndarray
+    n_pos: int
+    n_neg: int
+
+    @classmethod
+    def from_predictions(cls, labels, scores):
+        labels = np.asarray(labels).astype(bool)
+        scores = np.asarray(scores)
+        if scores.dtype == np.float16 and (scores >= 0).all():
+            # Histogram po wzorcach bitowych: O(n) zamiast sortowania
+            bits = scores.view(np.uint16)
+            total = np.bincount(bits, minlength=_FLOAT16_PATTERNS)
+            pos = np.bincount(bits[labels], minlength=_FLOAT16_PATTERNS)
+            present = np.flatnonzero(total)[::-1]
+            thresholds = present.astype(np.uint16).view(np.float16).astype(np.float64)
+            tp = np.cumsum(pos[present])
+            fp = np.cumsum(total[present]) - tp
+        else:
+            order = np.argsort(-scores, kind='stable')
+            sorted_scores, sorted_labels = scores[order], labels[order]
+            last = np.r_[np.flatnonzero(np.diff(sorted_scores)), len(sorted_scores) - 1]
+            thresholds = sorted_scores[last].astype(np.float64)
+            tp = np.cumsum(sorted_labels)[last]
+            fp = last + 1 - tp
+        return cls(thresholds=thresholds, tp=tp, fp=fp, n_pos=int(labels.sum()), n_neg=int((~labels).sum()))
+
+    def roc(self):
+        """(fpr, tpr) z punktem (0, 0) na początku."""
+        fpr = np.r_[0.0, self.fp / max(self.n_neg, 1)]
+        tpr = np.r_[0.0, self.tp / max(self.n_pos, 1)]
+        return fpr, tpr
+
+    def roc_auc(self):
+        fpr, tpr = self.roc()
+        return float(np.trapz(tpr, fpr))
+
+    def precision_recall(self):
+        """(recall, precision) dla kolejnych progów."""
+        precision = self.tp / (self.tp + self.fp)
+        recall = self.tp / max(self.n_pos, 1)
+        return recall, precision
+
+    def average_precision(self):
+        recall, precision = self.precision_recall()
+        return float(np.sum(np.diff(np.r_[0.0, recall]) * precision))
+
+    def confusion(self, threshold):
+        """Macierz pomyłek [[TN, FP], [FN, TP]] dla predykcji `score >= threshold`."""
+        # Liczba progów >= threshold (thresholds są malejące)
+        k = np.searchsorted(-self.thresholds, -threshold, side='right')
+        tp = int(self.tp[k - 1]) if k else 0
+        fp = int(self.fp[k - 1]) if k else 0
+        return np.array([[self.n_neg - fp, fp], [self.n_pos - tp, tp]])
+
+
+def threshold_metrics(confusion):
+    """Accuracy, precision, recall i F1 (klasa 1) z macierzy pomyłek."""
+    (tn, fp), (fn, tp) = confusion
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {'accuracy': (tp + tn) / confusion.sum(), 'precision': precision, 'recall': recall, 'f1': f1}
+
+
+def calibration_curve(labels, scores, n_bins=10):
+    """Średni wynik i odsetek klasy 1 w równych przedziałach wyniku (puste przedziały pominięte)."""
+    labels = np.asarray(labels, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    bins = np.minimum((scores * n_bins).astype(int), n_bins - 1)
+    counts = np.bincount(bins, minlength=n_bins)
+    mean_score = np.bincount(bins, weights=scores, minlength=n_bins)
+    fraction_pos = np.bincount(bins, weights=labels, minlength=n_bins)
+    keep = counts > 0
+    return mean_score[keep] / counts[keep], fraction_pos[keep] / counts[keep], counts[keep]
+
+
+def downsample_curve(x, y, max_points=500):
+    """Punkty krzywej rozłożone równomiernie wzdłuż jej długości (do wykresu); końce zawsze zachowane."""
+    x, y = np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64)
+    if len(x) <= max_points:
+        return x, y
+    length = np.r_[0.0, np.cumsum(np.hypot(np.diff(x), np.diff(y)))]
+    idx = np.searchsorted(length, np.linspace(0, length[-1], max_points))
+    idx = np.unique(np.r_[0, np.minimum(idx, len(x) - 1), len(x) - 1])
+    return x[idx], y[idx]
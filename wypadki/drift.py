@@ -0,0 +1,181 @@
+# Monitorowanie dryfu między latami: histogramy cech na rok (liczone raz i zapisywane), miary PSI / KS / chi2
+# porównujące rok z historią (wyłącznie z histogramów) i AUC modeli w kolejnych latach z zapisanych predykcji
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy.stats import distributions
+
+from wypadki.aggregations import chi2_test
+from wypadki.curves import ScoreSummary
+from wypadki.profiling import traced
+
+# Cechy tabeli po `prepare_dataset` (cechy modelu przed kodowaniem; speed_limit zamiast skalowanych pochodnych,
+# które są jej przekształceniem liniowym) oraz zmienna docelowa
+DRIFT_FEATURES = [
+    'is_urban_driver', 'road_type', 'light_conditions', 'junction_detail', 'junction_control',
+    'driver_distance_banding', 'weather_conditions', 'is_rush_hour', 'age_of_driver_binned', 'age_of_casualty_binned',
+    'speed_limit', 'driver_imd_decile', 'hour_of_day', 'number_of_casualties', 'skidding_and_overturning',
+    'casualty_type', 'important_driver_distance', 'age_of_driver', 'age_of_casualty', 'is_rural_accident',
+]
+
+# Cechy o uporządkowanych wartościach - tylko dla nich liczona jest statystyka KS
+ORDINAL_FEATURES = {
+    'driver_distance_banding', 'age_of_driver_binned', 'age_of_casualty_binned', 'speed_limit', 'driver_imd_decile',
+    'hour_of_day', 'number_of_casualties', 'age_of_driver', 'age_of_casualty',
+}
+
+# Cechy ciągłe zapisywane w stałych przedziałach (wartość = lewy koniec przedziału), wspólnych dla wszystkich lat
+CONTINUOUS_BINS = {
+    'age_of_driver': np.arange(0, 105, 5),
+    'age_of_casualty': np.arange(0, 105, 5),
+}
+
+HISTOGRAM_COLUMNS = ['accident_year', 'feature', 'value', 'count']
+
+# PSI: < 0,1 stabilny rozkład, 0,1-0,25 umiarkowana zmiana, > 0,25 istotny dryf; udział pustego przedziału
+# zastępowany PSI_EPSILON (logarytm z zera)
+PSI_THRESHOLDS = (0.1, 0.25)
+PSI_EPSILON = 1e-4
+
+DRIFT_COLUMNS = ['Cecha', 'PSI', 'KS D', 'KS p', 'chi2', 'chi2 p', 'Ocena']
+
+
+def _binned(feature, values):
+    edges = CONTINUOUS_BINS.get(feature)
+    if edges is None:
+        return values
+    binned = edges[np.clip(np.searchsorted(edges, values.to_numpy(dtype='float64'), side='right') - 1, 0, None)]
+    return pd.Series(binned, index=values.index).where(values.notna())
+
+
+@traced()
+def year_histograms(data, features=None):
+    """Liczności wartości cech w każdym roku (format długi `HISTOGRAM_COLUMNS`) - jedno przejście po `data`.
+
+    `data` - tabela po `prepare_dataset`; `features` domyślnie `DRIFT_FEATURES` obecne w `data`.
+    """
+    features = [col for col in (features or DRIFT_FEATURES) if col in data.columns]
+    years = data['accident_year'].to_numpy(dtype='int64')
+    parts = []
+    for feature in features:
+        counts = pd.Series(years).groupby([years, _binned(feature, data[feature]).to_numpy()]).size()
+        parts.append(pd.DataFrame({'accident_year': counts.index.get_level_values(0).astype('int64'),
+                                   'feature': feature, 'value': counts.index.get_level_values(1).astype('float64'),
+                                   'count': counts.to_numpy(dtype='int64')}))
+    if not parts:
+        return pd.DataFrame(columns=HISTOGRAM_COLUMNS)
+    return pd.concat(parts, ignore_index=True)
+
+
+def save_histograms(path, histograms):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    histograms.to_parquet(tmp_path, index=False)
+    tmp_path.replace(path)
+
+
+def cached_histograms(path, load_data):
+    """Histogramy z pliku `path`; przy pierwszym wywołaniu liczone z `load_data()` i zapisywane."""
+    path = Path(path)
+    if path.exists():
+        return pd.read_parquet(path)
+    histograms = year_histograms(load_data())
+    save_histograms(path, histograms)
+    return histograms
+
+
+def distributions_for(histograms, feature, years):
+    """Liczności wartości `feature` zsumowane po latach `years` (Series: wartość -> liczność)."""
+    part = histograms[(histograms['feature'] == feature) & histograms['accident_year'].isin(years)]
+    return part.groupby('value')['count'].sum()
+
+
+def psi(expected, actual):
+    """Population Stability Index dwóch wektorów liczności na tych samych przedziałach."""
+    expected = np.asarray(expected, dtype='float64')
+    actual = np.asarray(actual, dtype='float64')
+    p = np.maximum(expected / expected.sum(), PSI_EPSILON)
+    q = np.maximum(actual / actual.sum(), PSI_EPSILON)
+    return float(np.sum((q - p) * np.log(q / p)))
+
+
+def ks_test(expected, actual):
+    """Dwupróbkowa statystyka KS (największa różnica dystrybuant) i asymptotyczna wartość p - z liczności
+    na uporządkowanych przedziałach. Dla danych dyskretnych wartość p jest zachowawcza."""
+    expected = np.asarray(expected, dtype='float64')
+    actual = np.asarray(actual, dtype='float64')
+    n, m = expected.sum(), actual.sum()
+    d = float(np.max(np.abs(np.cumsum(expected) / n - np.cumsum(actual) / m)))
+    return d, float(distributions.kstwo.sf(d, np.round(n * m / (n + m))))
+
+
+def drift_rating(value):
+    if np.isnan(value):
+        return "Brak danych"
+    if value < PSI_THRESHOLDS[0]:
+        return "Stabilny"
+    if value < PSI_THRESHOLDS[1]:
+        return "Umiarkowana zmiana"
+    return "Istotny dryf"
+
+
+def compare_year(histograms, year, reference_years=None):
+    """Dryf każdej cechy w roku `year` względem lat `reference_years` (domyślnie wszystkie wcześniejsze).
+
+    Liczone wyłącznie z histogramów: PSI, KS (cechy z `ORDINAL_FEATURES`) i test chi-kwadrat jednorodności
+    (rok x historia). Tabela `DRIFT_COLUMNS` malejąco wg PSI; pusta, gdy brak lat odniesienia.
+    """
+    if reference_years is None:
+        reference_years = [y for y in histograms['accident_year'].unique() if y < year]
+    if not len(reference_years):
+        return pd.DataFrame(columns=DRIFT_COLUMNS)
+    rows = []
+    for feature in histograms['feature'].unique():
+        reference = distributions_for(histograms, feature, reference_years)
+        current = distributions_for(histograms, feature, [year])
+        values = reference.index.union(current.index)
+        reference = reference.reindex(values, fill_value=0).to_numpy()
+        current = current.reindex(values, fill_value=0).to_numpy()
+        if not current.sum() or not reference.sum():
+            continue
+        d, d_p = ks_test(reference, current) if feature in ORDINAL_FEATURES else (np.nan, np.nan)
+        chi2, chi2_p, _, _ = chi2_test(np.vstack([reference, current]))
+        value = psi(reference, current)
+        rows.append({'Cecha': feature, 'PSI': value, 'KS D': d, 'KS p': d_p, 'chi2': float(chi2),
+                     'chi2 p': float(chi2_p), 'Ocena': drift_rating(value)})
+    table = pd.DataFrame(rows, columns=DRIFT_COLUMNS)
+    return table.sort_values('PSI', ascending=False, ignore_index=True)
+
+
+@traced()
+def drift_matrix(histograms):
+    """PSI cech (wiersze, malejąco wg największego PSI) w każdym roku względem wszystkich wcześniejszych lat
+    (kolumny) - do mapy ciepła."""
+    years = sorted(histograms['accident_year'].unique())
+    columns = {}
+    for year in years[1:]:
+        columns[int(year)] = compare_year(histograms, year).set_index('Cecha')['PSI']
+    matrix = pd.DataFrame(columns)
+    return matrix.loc[matrix.max(axis=1).sort_values(ascending=False).index]
+
+
+def yearly_auc(predictions, years):
+    """AUC modeli w kolejnych latach z zapisanych predykcji (`registry.load_predictions` i
+    `registry.load_prediction_years`); tabela: model, zbiór, rok, liczba rekordów, odsetek wypadków
+    wiejskich, średnie przewidywane P i AUC."""
+    rows = []
+    for model, splits in predictions.items():
+        for split, (labels, scores) in splits.items():
+            split_years = years.get(model, {}).get(split)
+            if split_years is None:
+                continue
+            for year in np.unique(split_years):
+                mask = split_years == year
+                summary = ScoreSummary.from_predictions(labels[mask], scores[mask])
+                auc = summary.roc_auc() if summary.n_pos and summary.n_neg else np.nan
+                rows.append({'model': model, 'split': split, 'year': int(year), 'n': int(mask.sum()),
+                             'rural_share': float(labels[mask].mean()),
+                             'mean_proba': float(scores[mask].astype('float64').mean()), 'auc': auc})
+    return pd.DataFrame(rows, columns=['model', 'split', 'year', 'n', 'rural_share', 'mean_proba', 'auc'])
@@ -0,0 +1,149 @@
+# Wspólna ocena modelu: walidacja krzyżowa, krzywa uczenia i model końcowy bez powtarzania tych samych treningów
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.metrics import f1_score, roc_auc_score
+from sklearn.model_selection import StratifiedKFold
+
+from wypadki import profiling
+from wypadki.balancing import BALANCING_METHODS, resample, weighted_estimator
+from wypadki.modeling import fit_matrix, smote_resample
+
+LEARNING_CURVE_SIZES = np.linspace(0.1, 1.0, 10)
+
+
+def as_training_matrix(X):
+    """Jedna konwersja X do float32 (tablica NumPy albo CSR) współdzielona przez wszystkie treningi."""
+    if sparse.issparse(X):
+        return sparse.csr_matrix(X, dtype=np.float32)
+    if isinstance(X, pd.DataFrame):
+        return X.to_numpy(dtype=np.float32)
+    return np.asarray(X, dtype=np.float32)
+
+
+def learning_curve_sizes(train_sizes, n_max):
+    """Bezwzględne rozmiary zbioru treningowego (jak w sklearn.model_selection.learning_curve)."""
+    sizes = np.asarray(train_sizes)
+    if np.issubdtype(sizes.dtype, np.floating):
+        sizes = (sizes * n_max).astype(int)
+    return np.unique(np.clip(sizes, 1, n_max))
+
+
+def _fit_job(estimator, X, y, train_idx, test_idx, threads, train_score, balance, vocab):
+    start = time.perf_counter()
+    X_fit, y_fit = X[train_idx], y[train_idx]
+    if balance is not None and len(np.unique(y_fit)) > 1:
+        # Balansowanie tylko na części treningowej fałdy - fałda walidacyjna zostaje nietknięta
+        X_fit, y_fit = resample(X_fit, y_fit, balance, vocab)
+    resample_seconds = time.perf_counter() - start
+    model = weighted_estimator(estimator, balance, y_fit).set_params(n_jobs=threads)
+    with profiling.span('evaluation.fit', rows=len(y_fit), model=type(estimator).__name__):
+        model.fit(fit_matrix(model, X_fit), y_fit)
+    if len(model.classes_) < 2:
+        # Jak w learning_curve: model z jedną klasą nie daje się ocenić (wynik NaN)
+        return None, np.nan, len(y_fit), resample_seconds
+    test_proba = model.predict_proba(X[test_idx])[:, 1]
+    train_f1 = f1_score(y[train_idx], model.predict(X[train_idx])) if train_score else np.nan
+    return test_proba, train_f1, len(y_fit), resample_seconds
+
+
+@profiling.traced(rows=None)
+def evaluate_model(estimator, X, y, cv=5, train_sizes=None, n_workers=None, fit_final=True, balance=None,
+                   vocab=None):
+    """Walidacja krzyżowa (AUC), opcjonalna krzywa uczenia (F1) i model końcowy na całym X.
+
+    Wyniki są takie same jak `cross_val_score(..., cv=cv, scoring='roc_auc')`,
+    `learning_curve(..., train_sizes, cv=cv, scoring='f1')` i `estimator.fit(X, y)` z notatnika,
+    ale: podział na fałdy i konwersja X do float32 są robione raz; model fałdy z pełnym zbiorem
+    treningowym służy jednocześnie jako punkt 1.0 krzywej uczenia i źródło predykcji out-of-fold;
+    treningi działają równolegle w `n_workers` wątkach, a każdy model dostaje cpu_count // n_workers
+    wątków (bez nadsubskrypcji rdzeni).
+
+    `balance` (metoda z `BALANCING_METHODS`, wymaga `vocab`) balansuje klasy osobno w części
+    treningowej każdej fałdy i przed treningiem modelu końcowego; X powinien być wtedy zbiorem
+    przed SMOTE, a wyniki walidacji krzyżowej nie zawierają syntetycznych próbek z fałd walidacyjnych.
+    """
+    y = np.asarray(y)
+    X_shared = as_training_matrix(X)
+    folds = list(StratifiedKFold(n_splits=cv).split(np.zeros(len(y)), y))
+    n_max = len(folds[0][0])
+    sizes = learning_curve_sizes(train_sizes, n_max) if train_sizes is not None else np.array([], dtype=int)
+
+    # Zadania (fałda, liczba próbek treningowych); pełny zbiór fałdy = model walidacji krzyżowej
+    jobs = {(k, n) for k, (train_idx, _) in enumerate(folds) for n in [len(train_idx), *map(int, sizes)]}
+    cpu = os.cpu_count() or 1
+    n_workers = n_workers or min(cpu, len(jobs))
+    threads = max(1, cpu // n_workers)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(n_workers) as pool:
+        futures = {
+            (k, n): pool.submit(_fit_job, estimator, X_shared, y, folds[k][0][:n], folds[k][1], threads,
+                                n in sizes, balance, vocab)
+            # Najdłuższe treningi najpierw - lepsze wypełnienie wątków
+            for k, n in sorted(jobs, key=lambda job: -job[1])
+        }
+        results = {job: future.result() for job, future in futures.items()}
+
+    oof_proba = np.empty(len(y), dtype=np.float64)
+    cv_auc = np.empty(len(folds))
+    fold_rows = np.empty(len(folds), dtype=int)
+    for k, (train_idx, test_idx) in enumerate(folds):
+        test_proba, _, fold_rows[k], _ = results[(k, len(train_idx))]
+        oof_proba[test_idx] = test_proba
+        cv_auc[k] = roc_auc_score(y[test_idx], test_proba)
+
+    output = {'cv_auc': cv_auc, 'oof_proba': oof_proba, 'oof_auc': roc_auc_score(y, oof_proba),
+              'fold_train_rows': fold_rows, 'resample_seconds': sum(result[3] for result in results.values())}
+    if len(sizes):
+        train_scores = np.empty((len(sizes), len(folds)))
+        val_scores = np.empty((len(sizes), len(folds)))
+        for i, n in enumerate(sizes):
+            for k, (_, test_idx) in enumerate(folds):
+                test_proba, train_f1, _, _ = results[(k, int(n))]
+                train_scores[i, k] = train_f1
+                val_scores[i, k] = (f1_score(y[test_idx], (test_proba > 0.5).astype(int))
+                                    if test_proba is not None else np.nan)
+        output['learning_curve'] = {'train_sizes': sizes, 'train_scores': train_scores, 'val_scores': val_scores}
+
+    if fit_final:
+        # Model końcowy na oryginalnym X (zachowuje nazwy cech DataFrame); trenowany sam, więc dostaje
+        # cały budżet wątków puli (n_workers x threads)
+        X_fit, y_fit = resample(X, y, balance, vocab) if balance is not None else (X, y)
+        model = weighted_estimator(estimator, balance, y_fit).set_params(n_jobs=n_workers * threads)
+        with profiling.span('evaluation.fit', rows=len(y_fit), model=type(estimator).__name__):
+            output['model'] = model.fit(fit_matrix(model, X_fit), y_fit)
+    output['n_fits'] = len(jobs) + int(fit_final)
+    output['seconds'] = time.perf_counter() - start
+    return output
+
+
+def compare_balancing(estimator, X_train, y_train, X_test, y_test, vocab, methods=BALANCING_METHODS, cv=5):
+    """Porównanie balansowania: dotychczasowy SMOTE na całym zbiorze treningowym vs metody wewnątrz fałd.
+
+    `X_train`, `y_train` - zbiór treningowy przed SMOTE. Zwraca tabelę z AUC walidacji krzyżowej,
+    AUC na zbiorze testowym, średnią liczbą wierszy treningowych fałdy i czasami.
+    """
+    rows = []
+    start = time.perf_counter()
+    X_res, y_res = smote_resample(X_train, y_train, vocab.columns)
+    smote_seconds = time.perf_counter() - start
+    result = evaluate_model(estimator, X_res, y_res, cv=cv)
+    rows.append(('smote (cały zbiór, przed CV)', result, smote_seconds, time.perf_counter() - start))
+    for method in methods:
+        start = time.perf_counter()
+        result = evaluate_model(estimator, X_train, y_train, cv=cv, balance=method, vocab=vocab)
+        rows.append((f'{method} (w fałdach)', result, result['resample_seconds'], time.perf_counter() - start))
+
+    return pd.DataFrame([{
+        'Metoda': name,
+        'CV AUC': result['cv_auc'].mean(),
+        'Test AUC': roc_auc_score(y_test, result['model'].predict_proba(X_test)[:, 1]),
+        'Wiersze treningowe (fałda)': int(result['fold_train_rows'].mean()),
+        'Czas balansowania [s]': resample_seconds,
+        'Czas całkowity [s]': total_seconds,
+    } for name, result, resample_seconds, total_seconds in rows])
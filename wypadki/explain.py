@@ -0,0 +1,124 @@
+# Wyjaśnienia SHAP modelu XGBoost (natywny TreeSHAP, pred_contribs) zsumowane do cech źródłowych
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from wypadki.features import categorical_features, derived_features, numeric_features
+
+EXPLANATIONS_FILE = 'shap.parquet'
+
+
+@dataclass
+class Explanation:
+    """Wartości SHAP (log-odds) na cechę źródłową dla każdego rekordu oraz wartości tych cech.
+
+    `values` i `features` mają te same kolumny (cechy źródłowe); suma wiersza `values` + `bias`
+    to logit predykcji modelu. Cechy kategoryczne w `features` to kody kategorii STATS19.
+    """
+    values: pd.DataFrame
+    features: pd.DataFrame
+    bias: float
+    seconds: float = np.nan
+
+    def global_importance(self):
+        """Średnia |SHAP| (siła wpływu) i średnia SHAP (kierunek) na cechę, malejąco wg siły."""
+        table = pd.DataFrame({
+            'Cecha': self.values.columns,
+            'Średni |SHAP|': self.values.abs().mean().to_numpy(),
+            'Średni SHAP': self.values.mean().to_numpy(),
+        })
+        return table.sort_values('Średni |SHAP|', ascending=False, ignore_index=True)
+
+
+def source_features():
+    """Cechy źródłowe w kolejności kolumn X: liczbowe, kategoryczne (bloki one-hot), pochodne."""
+    return numeric_features + categorical_features + derived_features
+
+
+def source_index(vocab):
+    """Dla każdej kolumny `vocab.columns` - indeks cechy źródłowej w `source_features()`."""
+    index = list(range(len(numeric_features)))
+    for i, col in enumerate(categorical_features):
+        index += [len(numeric_features) + i] * (len(vocab.categories[col]) - 1)
+    offset = len(numeric_features) + len(categorical_features)
+    index += range(offset, offset + len(derived_features))
+    return np.asarray(index)
+
+
+def feature_values(X, vocab):
+    """Wartości cech źródłowych z macierzy X (kategorie dekodowane z one-hot; brak jedynki = pierwsza kategoria)."""
+    X = X.to_numpy(dtype='float64') if isinstance(X, pd.DataFrame) else X
+    X = X.toarray() if hasattr(X, 'toarray') else np.asarray(X, dtype='float64')
+    values = {col: X[:, i] for i, col in enumerate(numeric_features)}
+    offset = len(numeric_features)
+    for col in categorical_features:
+        codes = np.asarray(vocab.categories[col], dtype='float64')
+        width = len(codes) - 1
+        block = X[:, offset:offset + width]
+        values[col] = codes[np.where(block.any(axis=1), block.argmax(axis=1) + 1, 0)]
+        offset += width
+    for i, col in enumerate(derived_features):
+        values[col] = X[:, offset + i]
+    return pd.DataFrame(values, columns=source_features())
+
+
+def explain(booster, X, vocab, n_threads=None, approx=False):
+    """Wartości SHAP XGBoost (`pred_contribs=True`, wielowątkowo) zsumowane do cech źródłowych.
+
+    SHAP jest addytywny, więc wkład cechy kategorycznej to suma wkładów jej kolumn one-hot
+    (np. road_type_6, junction_control_4.0); sumowanie to jedno mnożenie przez macierz 0/1.
+    Dokładny TreeSHAP jest liczony raz na unikalny wiersz X (identyczne rekordy mają te same wartości).
+    `approx=True` - przybliżenie Saabasa (`approx_contribs`), o rzędy wielkości szybsze.
+    """
+    if isinstance(booster, xgb.XGBModel):
+        booster = booster.get_booster()
+    start = time.perf_counter()
+    booster.set_param({'nthread': n_threads or os.cpu_count() or 1})
+    data = X.to_numpy(dtype=np.float32) if isinstance(X, pd.DataFrame) else X
+    inverse = None
+    if isinstance(data, np.ndarray):
+        data, inverse = np.unique(data, axis=0, return_inverse=True)
+    contribs = booster.predict(xgb.DMatrix(data), pred_contribs=True, approx_contribs=approx,
+                               validate_features=False)
+
+    index = source_index(vocab)
+    grouping = np.zeros((len(index), len(source_features())), dtype=contribs.dtype)
+    grouping[np.arange(len(index)), index] = 1
+    values = contribs[:, :-1] @ grouping
+    if inverse is not None:
+        values = values[inverse.ravel()]
+    return Explanation(values=pd.DataFrame(values, columns=source_features()), features=feature_values(X, vocab),
+                       bias=float(contribs[0, -1]), seconds=time.perf_counter() - start)
+
+
+def save_explanation(path, explanation):
+    """Zapisuje wyjaśnienie w katalogu wersji modelu (shap.parquet: kolumny 'shap:<cecha>', 'value:<cecha>')."""
+    frame = pd.concat([explanation.values.add_prefix('shap:').astype('float32'),
+                       explanation.features.add_prefix('value:').astype('float32')], axis=1)
+    frame['bias'] = np.float32(explanation.bias)
+    frame.to_parquet(Path(path) / EXPLANATIONS_FILE, index=False)
+
+
+def load_explanation(path):
+    """Wyjaśnienie zapisane przez `save_explanation` albo None, gdy go nie ma."""
+    file = Path(path) / EXPLANATIONS_FILE
+    if not file.exists():
+        return None
+    frame = pd.read_parquet(file)
+    values = frame.filter(like='shap:').rename(columns=lambda col: col[len('shap:'):])
+    features = frame.filter(like='value:').rename(columns=lambda col: col[len('value:'):])
+    return Explanation(values=values, features=features, bias=float(frame['bias'].iloc[0]) if len(frame) else 0.0)
+
+
+def cached_explanation(path, booster, X, vocab, n_threads=None, approx=False):
+    """Wyjaśnienie z katalogu wersji modelu; liczone i zapisywane tylko przy pierwszym wywołaniu."""
+    explanation = load_explanation(path)
+    if explanation is None:
+        explanation = explain(booster, X, vocab, n_threads, approx)
+        save_explanation(path, explanation)
+    return explanation
@@ -0,0 +1,285 @@
+# Inżynieria cech i kodowanie zero-jedynkowe ze stałym słownikiem kategorii (wektorowo, NumPy)
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from wypadki.profiling import traced
+
+# Wybór cech do modelu (kolejność jak w notatniku)
+selected_features = [
+    'is_urban_driver', 'road_type', 'light_conditions', 'junction_detail', 'junction_control',
+    'driver_distance_banding', 'weather_conditions', 'is_rush_hour', 'age_of_driver_binned', 'age_of_casualty_binned',
+    'distance_speed_interaction', 'speed_limit_normalized', 'driver_imd_decile',
+    'hour_of_day', 'number_of_casualties', 'urban_driver_speed', 'skidding_and_overturning', 'casualty_type'
+]
+
+# Zmienne kodowane zero-jedynkowo (kolejność kolumn jak w pd.get_dummies z notatnika)
+categorical_features = [
+    'road_type', 'light_conditions', 'junction_detail', 'junction_control',
+    'age_of_casualty_binned', 'driver_distance_banding', 'is_rush_hour',
+    'weather_conditions', 'age_of_driver_binned', 'skidding_and_overturning', 'casualty_type'
+]
+
+numeric_features = [col for col in selected_features if col not in categorical_features]
+
+# Kategorie STATS19 po usunięciu braków (-1) i wartości nieznanych (99); pierwsza kategoria jest odrzucana (drop_first)
+DEFAULT_CATEGORIES = {
+    'road_type': (1, 2, 3, 6, 7, 9, 12),
+    'light_conditions': (1, 4, 5, 6, 7),
+    'junction_detail': (0, 1, 2, 3, 5, 6, 7, 8, 9),
+    'junction_control': (0, 1, 2, 3, 4, 9),
+    'age_of_casualty_binned': (1, 2, 3, 4, 5),
+    'driver_distance_banding': (1, 2, 3, 4, 5),
+    'is_rush_hour': (0, 1),
+    'weather_conditions': (1, 2, 3, 4, 5, 6, 7, 8, 9),
+    'age_of_driver_binned': (1, 2, 3, 4, 5),
+    'skidding_and_overturning': (0, 1, 2, 3, 4, 5, 9),
+    'casualty_type': (0, 1, 2, 3, 4, 5, 8, 9, 10, 11, 16, 17, 18, 19, 20, 21, 22, 23,
+                      90, 97, 98, 103, 104, 105, 106, 108, 109, 110, 113),
+}
+
+# Kolumny z etykietami całkowitymi w nazwach (road_type_6, is_rush_hour_1, age_of_driver_binned_2);
+# pozostałe kody po czyszczeniu są typu float (junction_control_4.0) - tak jak w oryginalnym X
+INT_LABEL_COLUMNS = ('road_type', 'is_rush_hour', 'age_of_casualty_binned', 'age_of_driver_binned')
+
+# Binowanie wieku: przedziały [-inf, 17), [17, 25), [25, 40), [40, 60), [60, inf) -> etykiety 1..5
+AGE_BIN_EDGES = np.array([17, 25, 40, 60])
+
+# Godziny szczytu: 7:00-9:00 oraz 15:00-18:00
+RUSH_HOURS = ((7, 9), (15, 18))
+
+# Cechy tworzone po kodowaniu
+derived_features = ['important_driver_distance', 'urban_driver_long_distance', 'urban_driver_no_junction_control']
+
+# Kolumny całkowite w X (pozostałe kolumny spoza numeric_features są zero-jedynkowe typu bool)
+integer_features = ['is_urban_driver', 'hour_of_day'] + derived_features
+
+
+def dummy_name(column, code):
+    label = str(int(code)) if column in INT_LABEL_COLUMNS else str(float(code))
+    return f'{column}_{label}'
+
+
+@dataclass
+class FeatureVocabulary:
+    """Stan potrzebny do odtworzenia macierzy X: słownik kategorii i parametry StandardScaler dla speed_limit."""
+    speed_limit_mean: float
+    speed_limit_scale: float
+    categories: dict = field(default_factory=lambda: dict(DEFAULT_CATEGORIES))
+
+    @classmethod
+    @traced('features.FeatureVocabulary.fit', rows=None)
+    def fit(cls, data, observed=False):
+        """Dopasowuje skalowanie `speed_limit`; `observed=True` bierze kategorie z danych (jak pd.get_dummies)."""
+        speed = data['speed_limit'].to_numpy(dtype='float64')
+        scale = speed.std()
+        categories = dict(DEFAULT_CATEGORIES)
+        if observed:
+            binned = add_base_features(data)
+            categories = {col: tuple(np.unique(binned[col].to_numpy(dtype='float64')).tolist())
+                          for col in categorical_features}
+        return cls(speed_limit_mean=float(speed.mean()), speed_limit_scale=float(scale) if scale > 0 else 1.0,
+                   categories=categories)
+
+    @property
+    def columns(self):
+        """Układ kolumn X (niezależny od liczby wierszy w partii)."""
+        dummies = [dummy_name(col, code) for col in categorical_features for code in self.categories[col][1:]]
+        return numeric_features + dummies + derived_features
+
+    def to_dict(self):
+        return {'speed_limit_mean': self.speed_limit_mean, 'speed_limit_scale': self.speed_limit_scale,
+                'categories': {col: list(codes) for col, codes in self.categories.items()}}
+
+    @classmethod
+    def from_dict(cls, state):
+        return cls(speed_limit_mean=state['speed_limit_mean'], speed_limit_scale=state['speed_limit_scale'],
+                   categories={col: tuple(codes) for col, codes in state['categories'].items()})
+
+
+def hour_from_time(time):
+    """Godzina z kolumny `time` ('HH:MM'); parsowane są tylko unikalne wartości."""
+    time = time.astype('category')
+    if len(time.cat.categories) > len(time):
+        # Mała partia z kategoriami całego zbioru (np. pojedynczy wiersz do predykcji)
+        time = time.cat.remove_unused_categories()
+    hours = time.cat.categories.str.split(':').str[0].astype('int32').to_numpy()
+    codes = time.cat.codes.to_numpy()
+    if (codes < 0).any():
+        return np.where(codes >= 0, hours[codes], np.nan)
+    return hours[codes]
+
+
+def bin_age(age):
+    """Binowanie wieku (odpowiednik pd.cut z right=False) -> kody 1..5."""
+    return (np.searchsorted(AGE_BIN_EDGES, np.asarray(age, dtype='float64'), side='right') + 1).astype('int8')
+
+
+def rush_hour(hours):
+    hours = np.asarray(hours)
+    mask = np.zeros(hours.shape, dtype=bool)
+    for start, end in RUSH_HOURS:
+        mask |= (hours >= start) & (hours <= end)
+    return mask.astype('int64')
+
+
+def add_base_features(data):
+    """Cechy niewymagające dopasowania: godzina, pochodzenie kierowcy, zmienna docelowa, biny wieku, godziny szczytu."""
+    data = data.copy()
+    data['hour_of_day'] = hour_from_time(data['time'])
+    # Kierowcy z obszarów miejskich: driver_home_area_type = 1 (miejskie), 2 i 3 łączone w 2
+    data['driver_home_area_type'] = data['driver_home_area_type'].replace({3: 2})
+    data['is_urban_driver'] = (data['driver_home_area_type'].to_numpy() == 1).astype('int64')
+    # Wypadki na terenach wiejskich: urban_or_rural_area = 2 (wiejskie); przy predykcji kolumny może nie być
+    if 'urban_or_rural_area' in data:
+        data['is_rural_accident'] = (data['urban_or_rural_area'].to_numpy() == 2).astype('int64')
+    # Wypadki śmiertelne lub poważne (accident_severity 1 lub 2) - cel modeli segmentowych (wypadki/segments.py)
+    if 'accident_severity' in data:
+        data['is_serious_accident'] = (data['accident_severity'].to_numpy(dtype='float64') <= 2).astype('int64')
+    data['age_of_casualty_binned'] = bin_age(data['age_of_casualty'])
+    data['age_of_driver_binned'] = bin_age(data['age_of_driver'])
+    data['is_rush_hour'] = rush_hour(data['hour_of_day'])
+    # Dystans > 20 km od miejsca zamieszkania (driver_distance_banding 3 lub 4)
+    banding = data['driver_distance_banding'].to_numpy(dtype='float64')
+    data['important_driver_distance'] = ((banding == 3) | (banding == 4)).astype('int64')
+    return data
+
+
+@traced()
+def add_features(data, vocab):
+    """Wszystkie cechy z komórki przygotowania danych (wymaga oczyszczonej tabeli `data`)."""
+    data = add_base_features(data)
+    speed = data['speed_limit'].to_numpy(dtype='float64')
+    data['speed_limit_normalized'] = (speed - vocab.speed_limit_mean) / vocab.speed_limit_scale
+    data['urban_driver_speed'] = data['is_urban_driver'].to_numpy() * data['speed_limit_normalized'].to_numpy()
+    data['distance_speed_interaction'] = (data['driver_distance_banding'].to_numpy(dtype='float64')
+                                          * data['urban_driver_speed'].to_numpy())
+    return data
+
+
+def category_index(values, categories):
+    """Pozycja wartości w posortowanym słowniku `categories` oraz maska wartości obecnych w słowniku."""
+    values = np.asarray(values, dtype='float64')
+    categories = np.asarray(categories, dtype='float64')
+    idx = np.minimum(np.searchsorted(categories, values), len(categories) - 1)
+    return idx, categories[idx] == values
+
+
+def one_hot(values, categories):
+    """Macierz zero-jedynkowa (n, len(categories)); wartości spoza słownika dają same zera."""
+    idx, hit = category_index(values, categories)
+    out = np.zeros((len(idx), len(categories)), dtype=bool)
+    out[np.flatnonzero(hit), idx[hit]] = True
+    return out
+
+
+@traced()
+def build_X(data, vocab):
+    """Macierz cech X o stałym układzie kolumn `vocab.columns` (także dla pojedynczego wiersza)."""
+    numeric = data[numeric_features]
+    dummy_blocks = [one_hot(data[col], vocab.categories[col])[:, 1:] for col in categorical_features]
+    dummy_names = [dummy_name(col, code) for col in categorical_features for code in vocab.categories[col][1:]]
+    dummies = pd.DataFrame(np.hstack(dummy_blocks), columns=dummy_names, index=data.index)
+    X = pd.concat([numeric, dummies], axis=1)
+
+    # Inżynieria cech po kodowaniu
+    is_urban_driver = data['is_urban_driver'].to_numpy()
+    X['important_driver_distance'] = data['important_driver_distance'].to_numpy()
+    X['urban_driver_long_distance'] = is_urban_driver * X['important_driver_distance'].to_numpy()
+    X['urban_driver_no_junction_control'] = is_urban_driver * (data['junction_control'].to_numpy(dtype='float64') == 4)
+    return X
+
+
+def build_X_array(data, vocab, dtype='float32'):
+    """Macierz X jako gęsta tablica NumPy o układzie `vocab.columns` (bez DataFrame - do szybkiej predykcji).
+
+    Wartości są takie same jak w `build_X`; float32 odpowiada precyzji, z jaką liczą drzewa XGBoost i sklearn.
+    """
+    X = np.zeros((len(data), len(vocab.columns)), dtype=dtype)
+    offset = len(numeric_features)
+    X[:, :offset] = data[numeric_features].to_numpy(dtype=dtype)
+    for col in categorical_features:
+        idx, hit = category_index(data[col], vocab.categories[col])
+        keep = hit & (idx > 0)  # drop_first
+        X[np.flatnonzero(keep), offset + idx[keep] - 1] = 1
+        offset += len(vocab.categories[col]) - 1
+
+    is_urban_driver = data['is_urban_driver'].to_numpy()
+    important_driver_distance = data['important_driver_distance'].to_numpy()
+    X[:, offset] = important_driver_distance
+    X[:, offset + 1] = is_urban_driver * important_driver_distance
+    X[:, offset + 2] = is_urban_driver * (data['junction_control'].to_numpy(dtype='float64') == 4)
+    return X
+
+
+def prepare_features(data, vocab=None):
+    """Zwraca (X, y, data z cechami, vocab); przy braku `vocab` dopasowuje go na `data`."""
+    if vocab is None:
+        vocab = FeatureVocabulary.fit(data)
+    data = add_features(data, vocab)
+    return build_X(data, vocab), data['is_rural_accident'], data, vocab
+
+
+def _explicit_block(values):
+    # CSR z zapisanymi wszystkimi elementami (również zerami), indeksy int32
+    n, k = values.shape
+    return sparse.csr_matrix((values.ravel(), np.tile(np.arange(k, dtype=np.int32), n),
+                              np.arange(0, n * k + 1, k, dtype=np.int32)), shape=(n, k))
+
+
+@traced()
+def build_X_sparse(data, vocab, dtype='float32'):
+    """Macierz X jako CSR (wartości `dtype`, indeksy int32) o układzie `vocab.columns`, bez macierzy gęstej.
+
+    Kolumny `numeric_features` są zapisane w całości (także zera), bo XGBoost traktuje brakujące
+    elementy macierzy rzadkiej jako braki danych, a zero jest tu prawdziwą wartością (np. hour_of_day = 0).
+    W kolumnach zero-jedynkowych zapisane są tylko jedynki. float32 to precyzja, z jaką liczą drzewa
+    XGBoost i sklearn, więc modele są takie same jak dla `build_X`.
+    """
+    n = len(data)
+    numeric_block = _explicit_block(data[numeric_features].to_numpy(dtype=dtype))
+
+    # Kodowanie zero-jedynkowe bez macierzy gęstej: (wiersz, kolumna) dla każdej jedynki
+    rows, cols = [], []
+    offset = 0
+    for col in categorical_features:
+        idx, hit = category_index(data[col], vocab.categories[col])
+        keep = hit & (idx > 0)  # drop_first
+        rows.append(np.flatnonzero(keep))
+        cols.append(offset + idx[keep] - 1)
+        offset += len(vocab.categories[col]) - 1
+
+    is_urban_driver = data['is_urban_driver'].to_numpy() == 1
+    important_driver_distance = data['important_driver_distance'].to_numpy() == 1
+    derived = [
+        important_driver_distance,
+        is_urban_driver & important_driver_distance,
+        is_urban_driver & (data['junction_control'].to_numpy(dtype='float64') == 4),
+    ]
+    for flag in derived:
+        rows.append(np.flatnonzero(flag))
+        cols.append(np.full(rows[-1].shape, offset))
+        offset += 1
+
+    rows, cols = np.concatenate(rows).astype(np.int32), np.concatenate(cols).astype(np.int32)
+    ones = sparse.csr_matrix((np.ones(len(rows), dtype=dtype), (rows, cols)), shape=(n, offset))
+    return _compact(sparse.hstack([numeric_block, ones], format='csr'))
+
+
+def _compact(X):
+    # sparse.hstack / indeksowanie mogą zwrócić indeksy int64 - przy macierzy < 2^31 elementów wystarczy int32
+    if X.nnz < np.iinfo(np.int32).max:
+        X.indices = X.indices.astype(np.int32, copy=False)
+        X.indptr = X.indptr.astype(np.int32, copy=False)
+    return X
+
+
+def with_explicit_numeric(X, dtype='float32'):
+    """Przywraca jawne zera w kolumnach `numeric_features` i usuwa je z pozostałych kolumn (macierz CSR)."""
+    X = sparse.csr_matrix(X)
+    k = len(numeric_features)
+    rest = X[:, k:].tocsr().astype(dtype)
+    rest.eliminate_zeros()
+    return _compact(sparse.hstack([_explicit_block(X[:, :k].toarray().astype(dtype)), rest], format='csr'))
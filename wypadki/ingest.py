@@ -0,0 +1,177 @@
+# Wczytywanie danych STATS19 z lokalnych plików CSV i kolumnowy cache (Parquet)
+import hashlib
+import json
+import shutil
+import urllib.request
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+from wypadki.profiling import traced
+
+# # Linki do plików CSV (DfT, "last-5-years")
+SOURCE_URLS = {
+    'accidents': 'https://data.dft.gov.uk/road-accidents-safety-data/dft-road-casualty-statistics-collision-last-5-years.csv',
+    'casualties': 'https://data.dft.gov.uk/road-accidents-safety-data/dft-road-casualty-statistics-casualty-last-5-years.csv',
+    'vehicles': 'https://data.dft.gov.uk/road-accidents-safety-data/dft-road-casualty-statistics-vehicle-last-5-years.csv',
+}
+
+DATA_DIR = Path('data')
+CACHE_DIR = Path('cache')
+YEARS = (2021, 2022, 2023)
+
+# Zmiana formatu cache (kolumny, typy) -> podbić wersję, aby unieważnić stare wpisy
+CACHE_VERSION = 3
+
+columns_to_check_NaN = [
+    'road_type', 'light_conditions', 'junction_detail', 'junction_control', 'driver_home_area_type', 'accident_year',
+    'age_of_casualty', 'driver_distance_banding', 'weather_conditions', 'urban_or_rural_area', 'casualty_type',
+    'speed_limit', 'driver_imd_decile', 'age_of_vehicle', 'age_of_driver', 'number_of_casualties', 'skidding_and_overturning'
+]
+
+# Kolumny wczytywane z każdej tabeli wraz z kompaktowymi typami (kody STATS19 mieszczą się w Int8/Int16,
+# typy nullable zachowują liczby całkowite po złączeniu typu left)
+SOURCE_COLUMNS = {
+    'accidents': {
+        'accident_index': 'string',
+        'accident_year': 'Int16',
+        'time': 'category',
+        'road_type': 'Int8',
+        'light_conditions': 'Int8',
+        'junction_detail': 'Int8',
+        'junction_control': 'Int8',
+        'weather_conditions': 'Int8',
+        'urban_or_rural_area': 'Int8',
+        'speed_limit': 'Int8',
+        'number_of_casualties': 'Int16',
+        # Ciężkość wypadku (1 - śmiertelny, 2 - poważny, 3 - lekki) - zmienna docelowa modeli segmentowych
+        'accident_severity': 'Int8',
+        # Położenie wypadku (WGS84) i kod ONS jednostki samorządu - dla indeksu przestrzennego (spatial.py)
+        'longitude': 'float32',
+        'latitude': 'float32',
+        'local_authority_ons_district': 'category',
+    },
+    'casualties': {
+        'accident_index': 'string',
+        'accident_year': 'Int16',
+        'age_of_casualty': 'Int16',
+        'casualty_type': 'Int16',
+    },
+    'vehicles': {
+        'accident_index': 'string',
+        'accident_year': 'Int16',
+        'driver_home_area_type': 'Int8',
+        'driver_distance_banding': 'Int8',
+        'driver_imd_decile': 'Int8',
+        'age_of_vehicle': 'Int16',
+        'age_of_driver': 'Int16',
+        'skidding_and_overturning': 'Int8',
+    },
+}
+
+# Kolejność kolumn w połączonej tabeli (accidents, casualties, vehicles)
+MERGED_COLUMNS = list(dict.fromkeys(col for cols in SOURCE_COLUMNS.values() for col in cols))
+
+
+def year_source_urls(year):
+    """Linki do plików CSV jednego roku (DfT publikuje też osobne pliki roczne)."""
+    return {name: url.replace('last-5-years', str(year)) for name, url in SOURCE_URLS.items()}
+
+
+def download_sources(data_dir=DATA_DIR, urls=SOURCE_URLS):
+    """Pobiera brakujące pliki CSV do `data_dir` (tylko raz) i zwraca ścieżki lokalne."""
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for name, url in urls.items():
+        path = data_dir / url.rsplit('/', 1)[-1]
+        if not path.exists():
+            tmp_path = path.with_suffix('.part')
+            urllib.request.urlretrieve(url, tmp_path)
+            tmp_path.replace(path)
+        paths[name] = path
+    return paths
+
+
+@traced()
+def read_source(name, path, years=YEARS):
+    """Wczytuje jedną tabelę: tylko potrzebne kolumny, kompaktowe typy, filtr lat przed złączeniem."""
+    dtypes = SOURCE_COLUMNS[name]
+    df = pd.read_csv(path, usecols=list(dtypes), dtype=dtypes)[list(dtypes)]
+    df = df[df['accident_year'].isin(years)]
+    if name != 'accidents':
+        # Rok wypadku bierzemy z tabeli accidents
+        df = df.drop(columns='accident_year')
+    return df.reset_index(drop=True)
+
+
+@traced()
+def merge_sources(accidents, casualties, vehicles):
+    """Łączy tabele po `accident_index` (jak w notatniku: left join accidents -> casualties -> vehicles)."""
+    data = accidents.merge(casualties, on='accident_index', how='left').merge(vehicles, on='accident_index', how='left')
+    data['accident_index'] = data['accident_index'].astype('category')
+    return data
+
+
+@traced()
+def clean_data(data):
+    """Zastępuje kody -1 i 99 przez NaN w `columns_to_check_NaN` i usuwa wiersze z brakami (jak w notatniku)."""
+    data = data.copy()
+    data[columns_to_check_NaN] = data[columns_to_check_NaN].astype('float64').replace([-1, 99], np.nan)
+    return data.dropna(subset=columns_to_check_NaN)
+
+
+def source_fingerprint(paths, years=YEARS):
+    """Klucz cache: nazwa, rozmiar i czas modyfikacji plików źródłowych oraz konfiguracja wczytywania."""
+    h = hashlib.sha256()
+    h.update(json.dumps({'version': CACHE_VERSION, 'years': sorted(years), 'columns': SOURCE_COLUMNS},
+                        sort_keys=True).encode())
+    for name in sorted(paths):
+        stat = Path(paths[name]).stat()
+        h.update(f'{name}:{Path(paths[name]).name}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return h.hexdigest()[:16]
+
+
+def write_cache(data, cache_path):
+    """Zapisuje tabelę jako zbiór Parquet partycjonowany po `accident_year` (zapis atomowy)."""
+    cache_path = Path(cache_path)
+    tmp_path = cache_path.with_name(cache_path.name + '.tmp')
+    if tmp_path.exists():
+        shutil.rmtree(tmp_path)
+    data.to_parquet(tmp_path, engine='pyarrow', partition_cols=['accident_year'], index=False)
+    tmp_path.replace(cache_path)
+
+
+def read_cache(cache_path, years=None):
+    """Wczytuje tabelę z cache; opcjonalnie tylko wybrane partycje lat."""
+    partitioning = ds.partitioning(pa.schema([('accident_year', pa.int16())]), flavor='hive')
+    dataset = ds.dataset(cache_path, format='parquet', partitioning=partitioning)
+    year_filter = ds.field('accident_year').isin(list(years)) if years is not None else None
+    data = dataset.to_table(filter=year_filter).to_pandas()
+    data['accident_year'] = data['accident_year'].astype('Int16')
+    # Magazyn zapisany przed dodaniem kolumny do SOURCE_COLUMNS jej nie ma (np. spatial.has_locations)
+    return data[[col for col in MERGED_COLUMNS if col in data.columns]]
+
+
+@traced()
+def load_data(data_dir=DATA_DIR, cache_dir=CACHE_DIR, years=YEARS, paths=None, refresh=False):
+    """Zwraca połączoną tabelę `data` dla lat `years`; przy pierwszym wywołaniu buduje cache Parquet."""
+    if paths is None:
+        paths = download_sources(data_dir)
+    cache_path = Path(cache_dir) / f'data_{source_fingerprint(paths, years)}'
+    if cache_path.exists() and not refresh:
+        return read_cache(cache_path)
+
+    accidents = read_source('accidents', paths['accidents'], years)
+    casualties = read_source('casualties', paths['casualties'], years)
+    vehicles = read_source('vehicles', paths['vehicles'], years)
+    data = merge_sources(accidents, casualties, vehicles)
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    if cache_path.exists():
+        shutil.rmtree(cache_path)
+    write_cache(data, cache_path)
+    return read_cache(cache_path)
@@ -0,0 +1,145 @@
+# Podział danych, balansowanie (SMOTE), trenowanie i ocena modeli XGBoost / RandomForest
+import time
+
+import numpy as np
+import pandas as pd
+from imblearn.over_sampling import SMOTE
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import classification_report, roc_auc_score
+from sklearn.model_selection import train_test_split
+from sklearn.neighbors import NearestNeighbors
+from xgboost import XGBClassifier
+
+from wypadki import profiling
+from wypadki.features import integer_features, numeric_features, with_explicit_numeric
+
+# Hiperparametry użyte w analizie
+params_xgb = {
+    'random_state': 42, 'scale_pos_weight': 1, 'max_depth': 9,
+    'n_estimators': 269, 'learning_rate': 0.06, 'reg_alpha': 0.1,
+    'reg_lambda': 1.9, 'subsample': 0.8, 'colsample_bytree': 0.6,
+}
+
+params_rf = {
+    'random_state': 42, 'n_estimators': 229, 'max_depth': 14,
+    'min_samples_split': 54, 'min_samples_leaf': 26, 'n_jobs': -1,
+    'max_features': 'sqrt', 'criterion': 'entropy', 'bootstrap': False,
+}
+
+
+@profiling.traced()
+def split_data(X, y, random_state=42):
+    """Podział 60/20/20 ze stratyfikacją (X może być DataFrame lub macierzą CSR)."""
+    # Podział na zbiór treningowy + walidacyjny (80%) i testowy (20%)
+    X_temp, X_test, y_temp, y_test = train_test_split(X, y, test_size=0.2, random_state=random_state, stratify=y)
+    # Podział X_temp na zbiór treningowy (60% z całości) i walidacyjny (20% z całości)
+    X_train, X_val, y_train, y_val = train_test_split(X_temp, y_temp, test_size=0.25, random_state=random_state,
+                                                      stratify=y_temp)
+    return X_train, X_val, X_test, y_train, y_val, y_test
+
+
+class DenseNeighbors(NearestNeighbors):
+    """NearestNeighbors liczący odległości na gęstej kopii danych.
+
+    SMOTE szuka sąsiadów tylko w klasie mniejszościowej, więc gęsta kopia jest niewielka, a wynik
+    (łącznie z kolejnością sąsiadów o równych odległościach) jest taki sam jak dla gęstego X.
+    """
+
+    def fit(self, X, y=None):
+        return super().fit(X.toarray() if sparse.issparse(X) else X)
+
+    def kneighbors(self, X=None, n_neighbors=None, return_distance=True):
+        if X is not None and sparse.issparse(X):
+            X = X.toarray()
+        return super().kneighbors(X, n_neighbors, return_distance)
+
+
+@profiling.traced()
+def smote_resample(X, y, columns, random_state=42, k_neighbors=5):
+    """Oversampling klasy mniejszościowej (SMOTE).
+
+    Dla DataFrame imblearn rzutuje nowe próbki z powrotem na typy kolumn (bool: wartość != 0,
+    int: obcięcie części ułamkowej). Dla macierzy CSR (`columns` = układ kolumn X) robimy to samo
+    ręcznie, żeby oba warianty dawały identyczny zbiór treningowy.
+    """
+    if not sparse.issparse(X):
+        return SMOTE(random_state=random_state, k_neighbors=k_neighbors).fit_resample(X, y)
+
+    smote = SMOTE(random_state=random_state, k_neighbors=DenseNeighbors(n_neighbors=k_neighbors + 1))
+    X_res, y_res = smote.fit_resample(X, y)
+
+    X_res = sparse.csr_matrix(X_res)
+    kinds = np.array(['float' if col in numeric_features else 'bool' for col in columns], dtype=object)
+    kinds[np.isin(columns, integer_features)] = 'int'
+    entry_kind = kinds[X_res.indices]
+    X_res.data[entry_kind == 'bool'] = X_res.data[entry_kind == 'bool'] != 0
+    X_res.data[entry_kind == 'int'] = np.trunc(X_res.data[entry_kind == 'int'])
+    return with_explicit_numeric(X_res), y_res
+
+
+def matrix_nbytes(X):
+    """Rozmiar macierzy cech w bajtach (DataFrame lub CSR)."""
+    if sparse.issparse(X):
+        return X.data.nbytes + X.indices.nbytes + X.indptr.nbytes
+    if isinstance(X, pd.DataFrame):
+        return int(X.memory_usage(deep=True).sum())
+    return np.asarray(X).nbytes
+
+
+def fit_matrix(model, X):
+    """Macierz dla `model.fit`: CSR dla XGBoost, gęsta kopia float32 dla RandomForest.
+
+    Drzewa sklearn na macierzy rzadkiej uczą się kilkukrotnie wolniej, a dla DataFrame sklearn i tak
+    tworzy gęstą kopię float32 - kopia z CSR ma ten sam rozmiar i istnieje tylko w czasie treningu
+    (układ kolumnowy, w którym splitter czyta kolejne wartości cechy).
+    """
+    if sparse.issparse(X) and isinstance(model, RandomForestClassifier):
+        return X.toarray(order='F')
+    return X
+
+
+def evaluate(model, X, y, threshold=0.5):
+    """AUC-ROC, raport klasyfikacji przy zadanym progu i wektor predykcji (do zapisu w rejestrze modeli)."""
+    with profiling.span('modeling.evaluate', rows=X.shape[0], model=type(model).__name__):
+        proba = model.predict_proba(X)[:, 1]
+    pred = (proba >= threshold).astype(int)
+    return {'auc': roc_auc_score(y, proba), 'report': classification_report(y, pred), 'proba': proba}
+
+
+def train_models(X, y, columns, random_state=42, years=None):
+    """Pełny przebieg z notatnika: podział, SMOTE, trening XGBoost i RandomForest, ocena na val/test.
+
+    `X` może być DataFrame (`build_X`) albo macierzą CSR float32 (`build_X_sparse`). Dla CSR zbiór treningowy
+    po SMOTE jest ok. 20% mniejszy, a szczyt pamięci etapu SMOTE o połowę niższy (benchmark, 1 mln wypadków);
+    próbki syntetyczne różnią się zaokrągleniem float32, więc modele nie są identyczne (AUC w granicach szumu).
+    `results['predictions']` ma postać oczekiwaną przez `registry.save_models(..., predictions=...)`;
+    `years` (Series z indeksem `y`, np. `data['accident_year']`) dodaje do predykcji rok każdego wiersza.
+    """
+    timings = {}
+    start = time.perf_counter()
+    X_train, X_val, X_test, y_train, y_val, y_test = split_data(X, y, random_state)
+    X_train, y_train = smote_resample(X_train, y_train, columns, random_state)
+    timings['split_smote'] = time.perf_counter() - start
+
+    models = {
+        'xgb': XGBClassifier(**params_xgb),
+        'rf': RandomForestClassifier(**params_rf),
+    }
+    results = {'models': models, 'metrics': {}, 'predictions': {}, 'timings': timings,
+               'train_nbytes': matrix_nbytes(X_train)}
+    for name, model in models.items():
+        start = time.perf_counter()
+        with profiling.span(f'modeling.fit_{name}', rows=X_train.shape[0]):
+            model.fit(fit_matrix(model, X_train), y_train)
+        timings[f'fit_{name}'] = time.perf_counter() - start
+        results['metrics'][name] = {
+            'val': evaluate(model, X_val, y_val),
+            'test': evaluate(model, X_test, y_test),
+        }
+        results['predictions'][name] = {
+            split: (y_split, results['metrics'][name][split]['proba'],
+                    None if years is None else years.loc[y_split.index].to_numpy())
+            for split, y_split in (('val', y_val), ('test', y_test))
+        }
+    return results
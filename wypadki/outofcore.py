@@ -0,0 +1,276 @@
+# Trening poza pamięcią: partie danych na dysku, XGBoost przez DataIter (external memory),
+# RandomForest składany z lasów cząstkowych trenowanych na kolejnych partiach
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from xgboost import XGBClassifier
+
+from wypadki.features import FeatureVocabulary, add_features, build_X_array, prepare_features
+from wypadki.ingest import clean_data, merge_sources, read_source
+from wypadki.modeling import params_rf, params_xgb, smote_resample, split_data
+from wypadki.registry import SCORING_COLUMNS
+from wypadki.streaming import CHUNKSIZE, stream_data
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Pełny zakres plików "last-5-years"
+HISTORY_YEARS = (2019, 2020, 2021, 2022, 2023)
+
+# Podział 60/20/20 wg skrótu accident_index (wszystkie wiersze jednego wypadku w tym samym zbiorze)
+SPLIT_FRACTIONS = {'train': 0.6, 'val': 0.2, 'test': 0.2}
+
+# Kolumny zapisywane w partiach: surowe kolumny cech + kolumna zmiennej docelowej
+BATCH_COLUMNS = SCORING_COLUMNS + ['urban_or_rural_area']
+
+
+def peak_rss_mb():
+    """Szczytowe zużycie pamięci (RSS) bieżącego procesu w MB; NaN, gdy system tego nie udostępnia."""
+    status = Path('/proc/self/status')
+    if status.exists():
+        # Linux: VmHWM dotyczy tylko bieżącego obrazu procesu (ru_maxrss obejmuje też proces rodzica sprzed exec)
+        for line in status.read_text().splitlines():
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1]) / 1024
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+
+def assign_split(accident_index, fractions=SPLIT_FRACTIONS):
+    """Zbiór ('train' / 'val' / 'test') dla każdego wiersza - deterministycznie, bez znajomości całych danych."""
+    position = pd.util.hash_array(np.asarray(accident_index, dtype=object)) % 10_000 / 10_000
+    bounds = np.cumsum(list(fractions.values()))
+    return np.asarray(list(fractions))[np.searchsorted(bounds, position, side='right')]
+
+
+@dataclass
+class BatchStore:
+    """Partie oczyszczonych danych na dysku (Parquet, jedna partia na fragment strumienia i zbiór).
+
+    Cechy są budowane przy odczycie partii (`vocab` dopasowany w tym samym przebiegu, co zapis),
+    więc w pamięci jest naraz tylko jedna partia.
+    """
+    directory: Path
+    vocab: FeatureVocabulary
+    files: dict = field(default_factory=dict)
+    file_rows: dict = field(default_factory=dict)
+    file_positives: dict = field(default_factory=dict)
+    rows: dict = field(default_factory=dict)
+    positives: dict = field(default_factory=dict)
+
+    def batches(self, split):
+        """Generator (X float32, y) kolejnych partii zbioru `split`."""
+        for path in self.files.get(split, []):
+            data = add_features(pd.read_parquet(path), self.vocab)
+            yield build_X_array(data, self.vocab), data['is_rural_accident'].to_numpy(dtype=np.float32)
+
+
+def write_batches(paths, directory, years=HISTORY_YEARS, chunksize=CHUNKSIZE):
+    """Jeden przebieg po plikach CSV (złączenie strumieniowe): partie na dysk i statystyki do `vocab`.
+
+    Skalowanie speed_limit (średnia, odchylenie) jest liczone z sum, jak StandardScaler na całych danych.
+    """
+    directory = Path(directory)
+    if directory.exists():
+        shutil.rmtree(directory)
+    directory.mkdir(parents=True)
+    files, file_rows = {split: [] for split in SPLIT_FRACTIONS}, {split: [] for split in SPLIT_FRACTIONS}
+    file_positives = {split: [] for split in SPLIT_FRACTIONS}
+    rows, positives = dict.fromkeys(SPLIT_FRACTIONS, 0), dict.fromkeys(SPLIT_FRACTIONS, 0)
+    n, speed_sum, speed_sq = 0, 0.0, 0.0
+    for k, batch in enumerate(stream_data(paths, years, chunksize)):
+        speed = batch['speed_limit'].to_numpy(dtype='float64')
+        n, speed_sum, speed_sq = n + len(speed), speed_sum + speed.sum(), speed_sq + (speed ** 2).sum()
+        splits = assign_split(batch['accident_index'])
+        for split in SPLIT_FRACTIONS:
+            part = batch.loc[splits == split, BATCH_COLUMNS]
+            if len(part):
+                path = directory / f'{split}-{k:05d}.parquet'
+                part.to_parquet(path, index=False)
+                files[split].append(path)
+                file_rows[split].append(len(part))
+                file_positives[split].append(int((part['urban_or_rural_area'] == 2).sum()))
+                rows[split] += len(part)
+                positives[split] += file_positives[split][-1]
+    mean = speed_sum / max(n, 1)
+    scale = np.sqrt(max(speed_sq / max(n, 1) - mean ** 2, 0.0))
+    vocab = FeatureVocabulary(speed_limit_mean=float(mean), speed_limit_scale=float(scale) if scale > 0 else 1.0)
+    return BatchStore(directory=directory, vocab=vocab, files=files, file_rows=file_rows,
+                      file_positives=file_positives, rows=rows, positives=positives)
+
+
+class BatchIter(xgb.DataIter):
+    """Iterator partii dla XGBoost: DMatrix buduje z nich strony na dysku (`cache_prefix`) zamiast macierzy w RAM."""
+
+    def __init__(self, store, split, cache_prefix):
+        self._store = store
+        self._split = split
+        self._batches = None
+        super().__init__(cache_prefix=cache_prefix)
+
+    def next(self, input_data):
+        if self._batches is None:
+            self._batches = self._store.batches(self._split)
+        batch = next(self._batches, None)
+        if batch is None:
+            return 0
+        X, y = batch
+        input_data(data=X, label=y)
+        return 1
+
+    def reset(self):
+        self._batches = None
+
+
+def booster_params(store, params=params_xgb, n_threads=None):
+    """`params_xgb` dla xgb.train; zamiast SMOTE (niewykonalnego na partiach) - scale_pos_weight z liczności klas."""
+    train_rows, train_pos = store.rows['train'], store.positives['train']
+    converted = {key: value for key, value in params.items() if key not in ('n_estimators', 'random_state')}
+    converted.update({
+        'objective': 'binary:logistic', 'tree_method': 'hist', 'seed': params.get('random_state', 0),
+        'scale_pos_weight': (train_rows - train_pos) / max(train_pos, 1), 'nthread': n_threads or os.cpu_count() or 1,
+    })
+    return converted, params.get('n_estimators', 100)
+
+
+def train_xgb_external(store, params=params_xgb, cache_dir=None, n_threads=None):
+    """XGBoost na zbiorze treningowym czytanym partiami (external memory); zwraca Booster."""
+    params, num_rounds = booster_params(store, params, n_threads)
+    cache_dir = Path(cache_dir or tempfile.mkdtemp(prefix='xgb-cache-'))
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    dtrain = xgb.DMatrix(BatchIter(store, 'train', str(cache_dir / 'train')))
+    booster = xgb.train(params, dtrain, num_boost_round=num_rounds)
+    del dtrain  # strony cache są zwalniane razem z DMatrix
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    return booster
+
+
+def allocate_trees(n_estimators, batch_rows):
+    """Liczba drzew na partię proporcjonalnie do liczby wierszy, w sumie dokładnie `n_estimators`
+    (metoda największych reszt; przy mniejszej liczbie drzew niż partii część partii dostaje 0)."""
+    batch_rows = np.asarray(batch_rows, dtype='float64')
+    share = n_estimators * batch_rows / batch_rows.sum()
+    trees = np.floor(share).astype(int)
+    trees[np.argsort(trees - share, kind='stable')[:n_estimators - trees.sum()]] += 1
+    return trees
+
+
+def train_rf_chunked(store, params=params_rf):
+    """RandomForest złożony z lasów cząstkowych: każda partia trenuje część drzew (proporcjonalnie do liczby wierszy).
+
+    Każde drzewo widzi więc podpróbkę danych (jedną partię); klasy są ważone (`class_weight='balanced'`)
+    zamiast SMOTE. Partie z jedną klasą są pomijane, a ich drzewa przypadają pozostałym partiom, więc las
+    ma `n_estimators` drzew. Wynik to zwykły RandomForestClassifier (predykcja = średnia ze wszystkich drzew).
+    """
+    n_estimators = params.get('n_estimators', 100)
+    batch_rows = np.asarray(store.file_rows['train'])
+    positives = np.asarray(store.file_positives['train'])
+    usable = (positives > 0) & (positives < batch_rows)
+    if not usable.any():
+        raise ValueError("Żadna partia zbioru treningowego nie zawiera obu klas - nie można wytrenować RandomForest "
+                         "na partiach (zwiększ rozmiar partii `chunksize`)")
+    trees = np.zeros(len(batch_rows), dtype=int)
+    trees[usable] = allocate_trees(n_estimators, batch_rows[usable])
+    forest, estimators = None, []
+    for k, (X, y) in enumerate(store.batches('train')):
+        if trees[k] == 0:
+            continue
+        part = RandomForestClassifier(**{**params, 'n_estimators': int(trees[k]), 'class_weight': 'balanced',
+                                         'random_state': params.get('random_state', 0) + k})
+        part.fit(X, y)
+        estimators += part.estimators_
+        forest = forest or part
+    forest.estimators_ = estimators
+    forest.n_estimators = len(estimators)
+    return forest
+
+
+def predict_batches(model, store, split='test'):
+    """(y, prawdopodobieństwo klasy 1) dla zbioru `split`, liczone partia po partii."""
+    labels, scores = [], []
+    for X, y in store.batches(split):
+        labels.append(y)
+        scores.append(model.inplace_predict(X) if isinstance(model, xgb.Booster) else model.predict_proba(X)[:, 1])
+    return np.concatenate(labels), np.concatenate(scores)
+
+
+def out_of_core_job(paths, years, model, work_dir, chunksize=CHUNKSIZE):
+    """Ścieżka poza pamięcią: strumień CSV -> partie -> trening -> AUC na zbiorze testowym (partiami)."""
+    start = time.perf_counter()
+    store = write_batches(paths, Path(work_dir) / 'batches', years, chunksize)
+    ingest_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    fitted = (train_xgb_external(store, cache_dir=Path(work_dir) / 'xgb-cache') if model == 'xgb'
+              else train_rf_chunked(store))
+    fit_seconds = time.perf_counter() - start
+    y_test, proba = predict_batches(fitted, store)
+    return _report('poza pamięcią', model, store.rows['train'], ingest_seconds, fit_seconds,
+                   roc_auc_score(y_test, proba))
+
+
+def in_memory_job(paths, years, model):
+    """Dotychczasowa ścieżka: pełne złączenie w pamięci, X, podział, SMOTE, trening."""
+    start = time.perf_counter()
+    tables = [read_source(name, paths[name], years) for name in ('accidents', 'casualties', 'vehicles')]
+    X, y, _, vocab = prepare_features(clean_data(merge_sources(*tables)))
+    X_train, _, X_test, y_train, _, y_test = split_data(X, y)
+    X_train, y_train = smote_resample(X_train, y_train, vocab.columns)
+    ingest_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    fitted = (XGBClassifier(**params_xgb) if model == 'xgb' else RandomForestClassifier(**params_rf)).fit(X_train, y_train)
+    fit_seconds = time.perf_counter() - start
+    return _report('w pamięci', model, len(y_train), ingest_seconds, fit_seconds,
+                   roc_auc_score(y_test, fitted.predict_proba(X_test)[:, 1]))
+
+
+def _report(mode, model, train_rows, ingest_seconds, fit_seconds, auc):
+    return {
+        'Tryb': mode,
+        'Model': model,
+        'Wiersze treningowe': int(train_rows),
+        'Czas wczytania [s]': ingest_seconds,
+        'Czas treningu [s]': fit_seconds,
+        'Wiersze/s (trening)': train_rows / fit_seconds if fit_seconds > 0 else np.nan,
+        'Szczytowe RSS [MB]': peak_rss_mb(),
+        'AUC (test)': auc,
+    }
+
+
+def run_isolated(fn, *args):
+    """Uruchamia zadanie w osobnym procesie (spawn), żeby szczytowe RSS dotyczyło tylko tego zadania."""
+    with ProcessPoolExecutor(1, mp_context=get_context('spawn')) as pool:
+        return pool.submit(fn, *args).result()
+
+
+def compare_training(paths, years=HISTORY_YEARS, models=('xgb', 'rf'), work_dir=None, chunksize=CHUNKSIZE,
+                     in_memory=True):
+    """Porównanie ścieżki w pamięci i poza pamięcią: czasy, przepustowość, szczytowe RSS i AUC (test).
+
+    Każde zadanie działa w osobnym procesie. `in_memory=False` pomija ścieżkę w pamięci
+    (np. gdy pełne dane się nie mieszczą). AUC nie jest wprost porównywalne: ścieżka w pamięci dzieli
+    wiersze losowo (wiersze jednego wypadku mogą trafić do treningu i testu), poza pamięcią - całe wypadki.
+    """
+    work_dir = Path(work_dir or tempfile.mkdtemp(prefix='out-of-core-'))
+    rows = []
+    for model in models:
+        if in_memory:
+            rows.append(run_isolated(in_memory_job, paths, years, model))
+        rows.append(run_isolated(out_of_core_job, paths, years, model, work_dir / model, chunksize))
+    shutil.rmtree(work_dir, ignore_errors=True)
+    return pd.DataFrame(rows)
@@ -0,0 +1,233 @@
+# Pomiary etapów potoku i sekcji aplikacji: czas, czas CPU, liczba wierszy, zmiana pamięci (RSS)
+#
+#   WYPADKI_PROFILE=1 streamlit run appAnalizaWypadki_v3.py   # panel "Diagnostyka" w pasku bocznym
+#   WYPADKI_PROFILE=1 jupyter notebook                        # potem: profiling.summary()
+#
+# Pomiary trafiają do pamięci (ostatnie MAX_RECORDS) i do pliku JSONL (PROFILE_FILE albo WYPADKI_PROFILE_FILE).
+# Wyłączone (domyślnie) kosztują jedno sprawdzenie flagi na wywołanie.
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+import pandas as pd
+
+ENV_VAR = 'WYPADKI_PROFILE'
+FILE_ENV_VAR = 'WYPADKI_PROFILE_FILE'
+PROFILE_FILE = Path('profiles') / 'spans.jsonl'
+MAX_RECORDS = 10_000
+
+_enabled = os.environ.get(ENV_VAR, '').strip().lower() not in ('', '0', 'false', 'no', 'off')
+_profile_file = Path(os.environ.get(FILE_ENV_VAR) or PROFILE_FILE)
+_records = deque(maxlen=MAX_RECORDS)
+_sequence = itertools.count()
+_lock = threading.Lock()
+_local = threading.local()
+
+try:
+    _PAGE_MB = os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+except (AttributeError, ValueError, OSError):  # Windows
+    _PAGE_MB = None
+
+
+def enabled():
+    return _enabled
+
+
+def enable(path=None):
+    """Włącza pomiary w bieżącym procesie (np. z notatnika); `path` - plik JSONL zamiast domyślnego."""
+    global _enabled, _profile_file
+    _enabled = True
+    if path is not None:
+        _profile_file = Path(path)
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def profile_file():
+    return _profile_file
+
+
+def current_rss_mb():
+    """Bieżące RSS procesu w MB (Linux: /proc/self/statm); NaN, gdy system tego nie udostępnia."""
+    if _PAGE_MB is None:
+        return float('nan')
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except OSError:
+        return float('nan')
+
+
+def _stack():
+    stack = getattr(_local, 'stack', None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+def _store(record):
+    with _lock:
+        _records.append(record)
+        try:
+            _profile_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(_profile_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        except OSError:
+            pass  # brak zapisu do pliku nie może przerwać obliczeń; pomiar zostaje w pamięci
+
+
+class Span:
+    """Pomiar jednego etapu: `with span('nazwa') as s: ...; s.rows = n`.
+
+    Etapy mogą być zagnieżdżone (pole `parent`). Czas CPU dotyczy całego procesu, więc przy treningu
+    wielowątkowym może być większy od czasu zegarowego.
+    """
+    __slots__ = ('name', 'rows', 'details', 'parent', '_start', '_cpu', '_rss')
+
+    def __init__(self, name, rows=None, **details):
+        self.name = name
+        self.rows = rows
+        self.details = details
+        self.parent = None
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1].name if stack else None
+        stack.append(self)
+        self._rss = current_rss_mb()
+        self._cpu = time.process_time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._start
+        cpu = time.process_time() - self._cpu
+        stack = _stack()
+        if self in stack:
+            stack.remove(self)
+        rows = None if self.rows is None else int(self.rows)
+        _store({
+            'seq': next(_sequence), 'name': self.name, 'parent': self.parent, 'pid': os.getpid(),
+            'start': time.time() - wall, 'wall_s': wall, 'cpu_s': cpu, 'rows': rows,
+            'rows_per_s': rows / wall if rows and wall > 0 else None,
+            'rss_delta_mb': current_rss_mb() - self._rss,
+            'error': exc_type.__name__ if exc_type else None, **self.details,
+        })
+        return False
+
+    # Dla kodu, którego nie da się objąć blokiem `with` (np. długi łańcuch if/elif w aplikacji)
+    def start(self):
+        return self.__enter__()
+
+    def stop(self):
+        self.__exit__(None, None, None)
+
+
+class _NullSpan:
+    """Pomiar wyłączony: wszystkie operacje są pustymi operacjami."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    def start(self):
+        return self
+
+    def stop(self):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name, rows=None, **details):
+    """Kontekst pomiaru etapu `name`; przy wyłączonych pomiarach - współdzielony pusty obiekt."""
+    return Span(name, rows, **details) if _enabled else _NULL_SPAN
+
+
+def result_rows(result):
+    """Liczba wierszy wyniku funkcji: DataFrame / macierz / pierwszy element krotki (np. (X, y))."""
+    if isinstance(result, (tuple, list)) and result:
+        result = result[0]
+    shape = getattr(result, 'shape', None)
+    if shape:
+        return shape[0]
+    return len(result) if isinstance(result, pd.Series) else None
+
+
+def traced(name=None, rows=result_rows):
+    """Dekorator: pomiar każdego wywołania funkcji; `rows(wynik)` - liczba przetworzonych wierszy."""
+    def decorate(fn):
+        label = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Span(label) as measured:
+                result = fn(*args, **kwargs)
+                measured.rows = rows(result) if rows else None
+            return result
+        return wrapper
+    return decorate
+
+
+def last_sequence():
+    """Numer ostatniego pomiaru (-1, gdy brak) - do wybrania pomiarów od danego momentu."""
+    with _lock:
+        return _records[-1]['seq'] if _records else -1
+
+
+def records(since=None):
+    """Pomiary z pamięci jako DataFrame (opcjonalnie tylko o numerze większym niż `since`)."""
+    with _lock:
+        items = [record for record in _records if since is None or record['seq'] > since]
+    return pd.DataFrame(items)
+
+
+def load_records(path=None):
+    """Pomiary zapisane w pliku JSONL (także z innych procesów, np. pracowników puli)."""
+    path = Path(path or _profile_file)
+    return pd.read_json(path, lines=True) if path.exists() else pd.DataFrame()
+
+
+def clear(remove_file=False):
+    with _lock:
+        _records.clear()
+        if remove_file and _profile_file.exists():
+            _profile_file.unlink()
+
+
+def summary(frame=None):
+    """Sumy na etap: liczba wywołań, czas, CPU, wiersze, przepustowość i zmiana RSS; malejąco wg czasu."""
+    frame = records() if frame is None else frame
+    if frame.empty:
+        return pd.DataFrame(columns=['Etap', 'Wywołania', 'Czas [s]', 'CPU [s]', 'Wiersze', 'Wiersze/s',
+                                     'Zmiana RSS [MB]'])
+    grouped = frame.groupby('name', sort=False).agg(
+        calls=('seq', 'size'), wall=('wall_s', 'sum'), cpu=('cpu_s', 'sum'),
+        rows=('rows', lambda values: values.sum(min_count=1)), rss=('rss_delta_mb', 'sum'))
+    table = pd.DataFrame({
+        'Etap': grouped.index,
+        'Wywołania': grouped['calls'].to_numpy(),
+        'Czas [s]': grouped['wall'].to_numpy(),
+        'CPU [s]': grouped['cpu'].to_numpy(),
+        'Wiersze': grouped['rows'].to_numpy(),
+        'Wiersze/s': (grouped['rows'] / grouped['wall']).to_numpy(),
+        'Zmiana RSS [MB]': grouped['rss'].to_numpy(),
+    })
+    return table.sort_values('Czas [s]', ascending=False, ignore_index=True)
@@ -0,0 +1,180 @@
+# Przyrostowe odświeżanie danych: nowy rok STATS19 dopisywany jako partycja, agregaty aktualizowane deltą
+#
+#   python -m wypadki.refresh --init      # jednorazowo: magazyn z obecnych lat (YEARS)
+#   python -m wypadki.refresh 2024        # dopisanie / podmiana jednego roku
+import argparse
+import hashlib
+import json
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from wypadki import cube, drift, registry
+from wypadki.aggregations import prepare_dataset
+from wypadki.ingest import (DATA_DIR, YEARS, download_sources, load_data, merge_sources, read_cache, read_source,
+                            year_source_urls)
+
+STORE_DIR = Path('store')
+MANIFEST_FILE = 'manifest.json'
+
+# Układ magazynu:
+#   data/accident_year=<rok>/part-0.parquet  - połączona tabela (jak cache z ingest.py), jedna partycja na rok
+#   cubes/<rok>.parquet                      - kostka liczności roku (delta)
+#   cube.parquet                             - kostka całości = suma kostek lat
+#   histograms/<rok>.parquet                 - histogramy cech roku (monitorowanie dryfu, wypadki/drift.py)
+#   manifest.json                            - lata, liczby wierszy, wersja magazynu (zapisywany na końcu)
+
+
+def load_manifest(store_dir=STORE_DIR):
+    """Manifest magazynu albo None, gdy magazyn nie został jeszcze zbudowany."""
+    path = Path(store_dir) / MANIFEST_FILE
+    return json.loads(path.read_text()) if path.exists() else None
+
+
+def _write_manifest(store_dir, manifest):
+    # Wersja magazynu zależy od zawartości lat - klucz cache w aplikacji
+    payload = json.dumps(manifest['years'], sort_keys=True)
+    manifest['version'] = hashlib.sha256(payload.encode()).hexdigest()[:16]
+    manifest['updated'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    tmp_path = Path(store_dir) / (MANIFEST_FILE + '.tmp')
+    tmp_path.write_text(json.dumps(manifest, indent=1))
+    tmp_path.replace(Path(store_dir) / MANIFEST_FILE)
+
+
+def _write_parquet(frame, path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    frame.to_parquet(tmp_path, engine='pyarrow', index=False)
+    tmp_path.replace(path)
+
+
+def read_store_data(store_dir=STORE_DIR, years=None):
+    """Połączona tabela z magazynu (wszystkie lata albo wybrane partycje)."""
+    return read_cache(Path(store_dir) / 'data', years)
+
+
+def read_store_cube(store_dir=STORE_DIR):
+    """Kostka liczności całego magazynu (utrzymywana deltami, bez skanowania danych)."""
+    return pd.read_parquet(Path(store_dir) / 'cube.parquet')
+
+
+def read_store_histograms(store_dir=STORE_DIR):
+    """Histogramy cech wszystkich lat magazynu; lata bez histogramów (magazyn sprzed ich dodania) są
+    uzupełniane jednorazowo z partycji roku."""
+    store_dir = Path(store_dir)
+    manifest = load_manifest(store_dir)
+    parts = []
+    for year in sorted(manifest['years'], key=int):
+        path = store_dir / 'histograms' / f'{year}.parquet'
+        if not path.exists():
+            drift.save_histograms(path, drift.year_histograms(prepare_dataset(read_store_data(store_dir, [int(year)]))))
+        parts.append(pd.read_parquet(path))
+    return pd.concat(parts, ignore_index=True)
+
+
+def write_year(store_dir, year, merged, manifest):
+    """Zapisuje (podmienia) partycję roku i aktualizuje kostkę całości o deltę: - stara kostka roku + nowa.
+
+    Praca jest proporcjonalna do rozmiaru roku; pozostałe partycje nie są czytane.
+    """
+    store_dir = Path(store_dir)
+    prepared = prepare_dataset(merged)
+    year_cube = cube.build_cube(prepared)
+    year_histograms = drift.year_histograms(prepared)
+    del prepared
+    cube_path = store_dir / 'cubes' / f'{year}.parquet'
+    total_path = store_dir / 'cube.parquet'
+
+    parts, signs = [year_cube], [1]
+    if total_path.exists():
+        parts, signs = [pd.read_parquet(total_path)] + parts, [1] + signs
+    if cube_path.exists():
+        parts, signs = parts + [pd.read_parquet(cube_path)], signs + [-1]
+    total = cube.combine_cubes(parts, signs)
+
+    partition = store_dir / 'data' / f'accident_year={year}'
+    tmp_partition = partition.with_name(partition.name + '.tmp')
+    if tmp_partition.exists():
+        shutil.rmtree(tmp_partition)
+    _write_parquet(merged.drop(columns='accident_year'), tmp_partition / 'part-0.parquet')
+    if partition.exists():
+        shutil.rmtree(partition)
+    tmp_partition.replace(partition)
+    _write_parquet(year_cube, cube_path)
+    _write_parquet(year_histograms, store_dir / 'histograms' / f'{year}.parquet')
+    _write_parquet(total, total_path)
+
+    checksum = hashlib.sha256(pd.util.hash_pandas_object(merged, index=False).to_numpy().tobytes()).hexdigest()[:16]
+    manifest['years'][str(year)] = {'rows': len(merged), 'prepared_rows': int(year_cube['count'].sum()),
+                                    'checksum': checksum}
+    return year_cube
+
+
+def init_store(data=None, store_dir=STORE_DIR, years=YEARS, **load_kwargs):
+    """Buduje magazyn z połączonej tabeli `data` (domyślnie `load_data(years=years)`), rok po roku."""
+    if data is None:
+        data = load_data(years=years, **load_kwargs)
+    store_dir = Path(store_dir)
+    if store_dir.exists():
+        shutil.rmtree(store_dir)
+    store_dir.mkdir(parents=True)
+    manifest = {'years': {}}
+    for year, part in data.groupby('accident_year', observed=True):
+        write_year(store_dir, int(year), part.reset_index(drop=True), manifest)
+    _write_manifest(store_dir, manifest)
+    return manifest
+
+
+def refresh_year(year, paths=None, store_dir=STORE_DIR, data_dir=DATA_DIR, models_dir=registry.MODELS_DIR):
+    """Dopisuje (lub podmienia) rok `year` w magazynie i oznacza modele jako nieaktualne.
+
+    `paths` - pliki CSV roku {'accidents', 'casualties', 'vehicles'}; domyślnie roczne pliki DfT
+    pobierane do `data_dir`. Zwraca podsumowanie: liczby wierszy, czas i nowa wersja magazynu.
+    """
+    start = time.perf_counter()
+    manifest = load_manifest(store_dir)
+    if manifest is None:
+        raise FileNotFoundError(f"Brak magazynu w '{store_dir}' - najpierw `python -m wypadki.refresh --init`")
+    if paths is None:
+        paths = download_sources(data_dir, year_source_urls(year))
+    tables = [read_source(name, paths[name], years=(year,)) for name in ('accidents', 'casualties', 'vehicles')]
+    merged = merge_sources(*tables)
+    replaced = str(year) in manifest['years']
+    year_cube = write_year(store_dir, year, merged, manifest)
+    _write_manifest(store_dir, manifest)
+
+    registry.mark_stale(f"{'Podmieniono' if replaced else 'Dodano'} dane za rok {year}", models_dir,
+                        year=year, store_version=manifest['version'])
+    return {'year': year, 'replaced': replaced, 'rows': len(merged), 'prepared_rows': int(year_cube['count'].sum()),
+            'version': manifest['version'], 'seconds': time.perf_counter() - start}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Przyrostowe odświeżanie danych STATS19 (jeden rok).")
+    parser.add_argument('year', type=int, nargs='?', help="rok do dopisania lub podmiany")
+    parser.add_argument('--init', action='store_true', help="zbuduj magazyn z lat YEARS (pliki 'last-5-years')")
+    parser.add_argument('--store', default=STORE_DIR, type=Path)
+    parser.add_argument('--models', default=registry.MODELS_DIR, type=Path)
+    parser.add_argument('--accidents', help="lokalny plik CSV roku (zamiast pobierania); wymaga też pozostałych")
+    parser.add_argument('--casualties')
+    parser.add_argument('--vehicles')
+    args = parser.parse_args(argv)
+
+    if args.init:
+        manifest = init_store(store_dir=args.store)
+        print(f"Magazyn zbudowany: lata {sorted(manifest['years'])}, wersja {manifest['version']}")
+    if args.year is not None:
+        paths = None
+        if args.accidents:
+            paths = {'accidents': args.accidents, 'casualties': args.casualties, 'vehicles': args.vehicles}
+        summary = refresh_year(args.year, paths, store_dir=args.store, models_dir=args.models)
+        print(f"Rok {summary['year']}: {summary['rows']:,} wierszy ({summary['prepared_rows']:,} po czyszczeniu), "
+              f"{summary['seconds']:.1f} s, wersja magazynu {summary['version']}. Modele oznaczone jako nieaktualne.")
+    if not args.init and args.year is None:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
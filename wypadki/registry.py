@@ -0,0 +1,219 @@
+# Rejestr modeli: zapis wytrenowanych modeli ze słownikiem cech i szybka predykcja wsadowa
+import functools
+import itertools
+import json
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import xgboost as xgb
+
+from wypadki.compact import load_compact
+from wypadki.features import FeatureVocabulary, add_features, build_X_array
+
+MODELS_DIR = Path('models')
+LATEST_FILE = 'LATEST'
+STALE_FILE = 'STALE'
+PREDICTIONS_FILE = 'predictions.npz'
+
+# Partie do tylu wierszy liczone modelami kompaktowymi (wypadki/compact.py), jeśli zostały wyeksportowane:
+# stały narzut sklearn / xgboost dominuje przy pojedynczych rekordach, a przy dużych partiach jest szybszy
+COMPACT_MAX_ROWS = 64
+
+# Surowe kolumny STATS19 potrzebne do wyznaczenia cech modelu (partia do predykcji)
+SCORING_COLUMNS = [
+    'time', 'road_type', 'light_conditions', 'junction_detail', 'junction_control', 'weather_conditions',
+    'speed_limit', 'number_of_casualties', 'age_of_casualty', 'casualty_type', 'driver_home_area_type',
+    'driver_distance_banding', 'driver_imd_decile', 'age_of_driver', 'skidding_and_overturning',
+]
+
+
+@dataclass
+class ModelBundle:
+    """Wczytane modele jednej wersji rejestru wraz ze słownikiem cech (kategorie + stan StandardScaler)."""
+    version: str
+    vocab: FeatureVocabulary
+    booster: xgb.Booster = None
+    rf: object = None
+    metadata: dict = field(default_factory=dict)
+    compact: dict = field(default_factory=dict)
+
+    def features(self, batch):
+        """Macierz X (float32) dla partii surowych rekordów (DataFrame, pa.Table lub pa.RecordBatch)."""
+        if isinstance(batch, (pa.Table, pa.RecordBatch)):
+            batch = batch.to_pandas()
+        missing = [col for col in SCORING_COLUMNS if col not in batch]
+        if missing:
+            raise KeyError(f"Brak kolumn w partii do predykcji: {missing}")
+        return build_X_array(add_features(batch[SCORING_COLUMNS], self.vocab), self.vocab)
+
+    def rf_proba(self, X):
+        """Wynik lasu losowego dla macierzy X; DataFrame z nazwami kolumn tylko, gdy model był z nimi trenowany."""
+        # Ścieżka rzadka (CSR) trenuje na tablicy bez nazw - DataFrame wywołałby ostrzeżenie sklearn
+        if hasattr(self.rf, 'feature_names_in_'):
+            X = pd.DataFrame(X, columns=self.vocab.columns)
+        return self.rf.predict_proba(X)[:, 1]
+
+    def predict(self, batch, model='xgb'):
+        """Prawdopodobieństwo wypadku na terenie wiejskim (is_rural_accident = 1) dla każdego rekordu."""
+        X = self.features(batch)
+        if model in self.compact and len(X) <= COMPACT_MAX_ROWS:
+            return self.compact[model].predict(X)
+        if model == 'xgb':
+            # inplace_predict: bez budowania DMatrix, bezpośrednio na tablicy NumPy
+            return self.booster.inplace_predict(X, validate_features=False)
+        if model == 'rf':
+            return self.rf_proba(X)
+        raise ValueError(f"Nieznany model: {model!r} (dostępne: 'xgb', 'rf')")
+
+
+def _reserve_version(models_dir):
+    # Nazwa wersji ze znacznika czasu; przy kilku zapisach w tej samej sekundzie dochodzi licznik (-1, -2, ...).
+    # mkdir katalogu tymczasowego rezerwuje nazwę atomowo, więc równoległe zapisy nie trafią w ten sam katalog
+    stamp = time.strftime('%Y%m%d-%H%M%S')
+    for n in itertools.count():
+        version = stamp if n == 0 else f'{stamp}-{n}'
+        if (models_dir / version).exists():
+            continue
+        tmp_path = models_dir / (version + '.tmp')
+        try:
+            tmp_path.mkdir()
+        except FileExistsError:
+            continue
+        return version, tmp_path
+
+
+def save_models(models, vocab, models_dir=MODELS_DIR, metadata=None, predictions=None):
+    """Zapisuje modele (`{'xgb': XGBClassifier, 'rf': RandomForestClassifier}`) jako nową wersję rejestru.
+
+    Katalog wersji zawiera xgb.ubj (Booster), rf.joblib, vocabulary.json i metadata.json; zapis jest
+    atomowy, a plik LATEST wskazuje najnowszą wersję. Opcjonalne `predictions`
+    (`{model: {zbiór: (y, proba)}}`) trafiają do predictions.npz (patrz `save_predictions`).
+    Zwraca ścieżkę wersji.
+    """
+    models_dir = Path(models_dir)
+    models_dir.mkdir(parents=True, exist_ok=True)
+    version, tmp_path = _reserve_version(models_dir)
+    path = models_dir / version
+
+    if 'xgb' in models:
+        # XGBClassifier albo Booster (np. z treningu poza pamięcią, wypadki/outofcore.py)
+        booster = models['xgb'] if isinstance(models['xgb'], xgb.Booster) else models['xgb'].get_booster()
+        booster.save_model(tmp_path / 'xgb.ubj')
+    if 'rf' in models:
+        joblib.dump(models['rf'], tmp_path / 'rf.joblib')
+    (tmp_path / 'vocabulary.json').write_text(json.dumps(vocab.to_dict(), indent=1))
+    meta = {'version': version, 'models': sorted(models), 'columns': vocab.columns, **(metadata or {})}
+    (tmp_path / 'metadata.json').write_text(json.dumps(meta, indent=1, ensure_ascii=False))
+    if predictions:
+        save_predictions(tmp_path, predictions)
+    tmp_path.replace(path)
+
+    latest_tmp = models_dir / (LATEST_FILE + '.tmp')
+    latest_tmp.write_text(version)
+    latest_tmp.replace(models_dir / LATEST_FILE)
+    # Nowe modele są wytrenowane na aktualnych danych
+    (models_dir / STALE_FILE).unlink(missing_ok=True)
+    return path
+
+
+def save_predictions(path, predictions):
+    """Zapisuje predykcje out-of-sample wersji: wyniki jako float16, etykiety jako uint8.
+
+    `predictions` - `{model: {zbiór: (y, proba)}}`, np. `{'xgb': {'val': (y_val, p), 'test': (y_test, p)}}`;
+    opcjonalny trzeci element krotki to rok wypadku każdego wiersza (AUC w kolejnych latach, wypadki/drift.py).
+    Klucze w pliku: '<model>/<zbiór>/scores', '<model>/<zbiór>/labels' i '<model>/<zbiór>/years' (~3-5 B na wiersz).
+    """
+    arrays = {}
+    for model, splits in predictions.items():
+        for split, entry in splits.items():
+            labels, scores = entry[:2]
+            arrays[f'{model}/{split}/scores'] = np.asarray(scores, dtype=np.float16)
+            arrays[f'{model}/{split}/labels'] = np.asarray(labels, dtype=np.uint8)
+            if len(entry) > 2 and entry[2] is not None:
+                arrays[f'{model}/{split}/years'] = np.asarray(entry[2], dtype=np.uint16)
+    np.savez_compressed(Path(path) / PREDICTIONS_FILE, **arrays)
+
+
+def load_predictions(path):
+    """Predykcje zapisane przez `save_predictions`: `{model: {zbiór: (labels, scores)}}` albo None."""
+    file = Path(path) / PREDICTIONS_FILE
+    if not file.exists():
+        return None
+    predictions = {}
+    with np.load(file) as arrays:
+        for key in arrays.files:
+            model, split, kind = key.split('/')
+            if kind == 'scores':
+                labels = arrays[f'{model}/{split}/labels']
+                predictions.setdefault(model, {})[split] = (labels, arrays[key])
+    return predictions
+
+
+def load_prediction_years(path):
+    """Lata wierszy predykcji zapisanych przez `save_predictions`: `{model: {zbiór: lata}}` albo None."""
+    file = Path(path) / PREDICTIONS_FILE
+    if not file.exists():
+        return None
+    years = {}
+    with np.load(file) as arrays:
+        for key in arrays.files:
+            model, split, kind = key.split('/')
+            if kind == 'years':
+                years.setdefault(model, {})[split] = arrays[key]
+    return years or None
+
+
+def mark_stale(reason, models_dir=MODELS_DIR, **details):
+    """Oznacza modele rejestru jako nieaktualne (plik STALE), np. po dodaniu nowego roku danych.
+
+    Kolejne powody są dopisywane; znacznik usuwa dopiero zapis nowej wersji (`save_models`).
+    """
+    models_dir = Path(models_dir)
+    models_dir.mkdir(parents=True, exist_ok=True)
+    info = stale_info(models_dir) or {'since': time.strftime('%Y-%m-%d %H:%M:%S'), 'reasons': []}
+    info['reasons'].append({'reason': reason, 'at': time.strftime('%Y-%m-%d %H:%M:%S'), **details})
+    stale_tmp = models_dir / (STALE_FILE + '.tmp')
+    stale_tmp.write_text(json.dumps(info, indent=1, ensure_ascii=False))
+    stale_tmp.replace(models_dir / STALE_FILE)
+    return info
+
+
+def stale_info(models_dir=MODELS_DIR):
+    """Zawartość znacznika STALE ({'since', 'reasons'}) albo None, gdy modele są aktualne."""
+    stale = Path(models_dir) / STALE_FILE
+    return json.loads(stale.read_text()) if stale.exists() else None
+
+
+def latest_version(models_dir=MODELS_DIR):
+    """Nazwa najnowszej wersji w rejestrze albo None, gdy nie zapisano jeszcze modeli."""
+    latest = Path(models_dir) / LATEST_FILE
+    return latest.read_text().strip() if latest.exists() else None
+
+
+@functools.lru_cache(maxsize=4)
+def load_bundle(path):
+    """Wczytuje wersję rejestru (raz na ścieżkę; kolejne wywołania zwracają te same obiekty)."""
+    path = Path(path)
+    vocab = FeatureVocabulary.from_dict(json.loads((path / 'vocabulary.json').read_text()))
+    metadata = json.loads((path / 'metadata.json').read_text())
+    booster = xgb.Booster(model_file=str(path / 'xgb.ubj')) if (path / 'xgb.ubj').exists() else None
+    rf = joblib.load(path / 'rf.joblib') if (path / 'rf.joblib').exists() else None
+    return ModelBundle(version=path.name, vocab=vocab, booster=booster, rf=rf, metadata=metadata,
+                       compact=load_compact(path))
+
+
+def load_latest(models_dir=MODELS_DIR):
+    version = latest_version(models_dir)
+    if version is None:
+        raise FileNotFoundError(f"Brak zapisanych modeli w '{models_dir}'")
+    return load_bundle(Path(models_dir) / version)
+
+
+def predict_rural_probability(batch, model='xgb', models_dir=MODELS_DIR):
+    """Prawdopodobieństwo wypadku wiejskiego dla partii rekordów, najnowszą wersją modelu z rejestru."""
+    return np.asarray(load_latest(models_dir).predict(batch, model))
@@ -0,0 +1,288 @@
+# Modele segmentowe: wiele par (segment, zmienna docelowa) trenowanych równolegle w puli procesów. Macierz cech
+# jest zapisywana raz jako plik .npy i otwierana przez procesy jako memmap (bez kopiowania przy starcie puli);
+# wynikiem jest tabela porównawcza wyświetlana w aplikacji
+#
+#   python -m wypadki.segments                                  # wszystkie wymiary, oba cele
+#   python -m wypadki.segments --dimensions casualty_group --targets is_rural_accident --jobs 4
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from xgboost import XGBClassifier
+
+from wypadki.balancing import BALANCING_METHODS, resample, weighted_estimator
+from wypadki.curves import ScoreSummary, threshold_metrics
+from wypadki.features import FeatureVocabulary, add_features, build_X_array
+from wypadki.modeling import params_xgb
+from wypadki.profiling import traced
+
+SEGMENTS_DIR = Path('segments')
+COMPARISON_FILE = 'comparison.parquet'
+RUN_FILE = 'run.json'
+
+TARGETS = {
+    'is_rural_accident': 'Wypadek na terenie wiejskim',
+    'is_serious_accident': 'Wypadek śmiertelny lub poważny',
+}
+
+# Grupy kodów casualty_type (STATS19) i pasma limitu prędkości (mph)
+CASUALTY_GROUPS = {
+    'Piesi': [0],
+    'Rowerzyści': [1],
+    'Motocykliści': [2, 3, 4, 5, 23, 97],
+    'Samochody osobowe i taksówki': [8, 9],
+    'Autobusy i minibusy': [10, 11],
+    'Pojazdy dostawcze i ciężarowe': [19, 20, 21, 98],
+}
+SPEED_BANDS = {'20-30 mph': [20, 30], '40-50 mph': [40, 50], '60-70 mph': [60, 70]}
+
+# Wymiary segmentacji: kolumna tabeli i grupy jej wartości (None - każda wartość osobno)
+DIMENSIONS = {
+    'casualty_group': ('casualty_type', CASUALTY_GROUPS),
+    'year': ('accident_year', None),
+    'speed_band': ('speed_limit', SPEED_BANDS),
+}
+DIMENSION_NAMES = {'casualty_group': 'Grupa poszkodowanych', 'year': 'Rok', 'speed_band': 'Limit prędkości'}
+POPULATION = 'Wszystkie rekordy'
+
+# Segment trenowany tylko, gdy ma co najmniej tyle rekordów i tyle rekordów każdej klasy w zbiorze testowym
+MIN_SEGMENT_ROWS = 1000
+MIN_CLASS_ROWS = 20
+
+# Stały podział rekordów na część treningową i testową, wspólny dla wszystkich segmentów: model całej
+# populacji nie widział żadnego rekordu testowego segmentu, więc można go porównać z modelem segmentu
+TEST_SIZE = 0.2
+
+COMPARISON_COLUMNS = [
+    'Cel', 'Wymiar', 'Segment', 'Rekordy', 'Odsetek klasy 1', 'AUC', 'AUC modelu ogólnego', 'Zmiana AUC',
+    'Average Precision', 'F1', 'Trening [s]', 'Status',
+]
+
+
+@dataclass(frozen=True)
+class TrainingSpec:
+    """Model dla rekordów, w których `column` ma jedną z wartości `values` (bez `column` - cała populacja)."""
+    target: str
+    segment: str = POPULATION
+    dimension: str = None
+    column: str = None
+    values: tuple = None
+
+
+def segment_specs(data, targets=None, dimensions=None):
+    """Specyfikacje: dla każdego celu model całej populacji i model każdego segmentu wymiarów `dimensions`.
+
+    `data` - tabela z cechami (kolumny celów i wymiarów); cele, których w niej nie ma (np. ciężkość wypadku
+    w danych wczytanych przed dodaniem kolumny), są pomijane.
+    """
+    targets = [target for target in (targets or TARGETS) if target in data.columns]
+    specs = []
+    for target in targets:
+        specs.append(TrainingSpec(target))
+        for dimension in dimensions or DIMENSIONS:
+            column, groups = DIMENSIONS[dimension]
+            if groups is None:
+                groups = {str(value): [value] for value in sorted(data[column].dropna().unique().astype(int))}
+            specs += [TrainingSpec(target, name, dimension, column, tuple(values)) for name, values in groups.items()]
+    return specs
+
+
+def write_shared(path, data, vocab, columns, test_size=TEST_SIZE, random_state=42, chunk_rows=200_000):
+    """Zapisuje w katalogu `path` macierz X (float32, `vocab.columns`), kolumny `columns` i maskę zbioru
+    testowego jako pliki .npy; X jest budowana partiami po `chunk_rows` wierszy wprost w pliku."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    X = np.lib.format.open_memmap(path / 'X.npy', mode='w+', dtype=np.float32, shape=(len(data), len(vocab.columns)))
+    for start in range(0, len(data), chunk_rows):
+        X[start:start + chunk_rows] = build_X_array(data.iloc[start:start + chunk_rows], vocab)
+    X.flush()
+    del X
+    for column in columns:
+        np.save(path / f'{column}.npy', data[column].to_numpy(dtype='float32'))
+    np.save(path / 'is_test.npy', np.random.default_rng(random_state).random(len(data)) < test_size)
+
+
+# Tablice procesu roboczego (memmap tylko do odczytu, otwierane raz na proces)
+_worker_arrays = None
+
+
+def _init_worker(path):
+    global _worker_arrays
+    _worker_arrays = {file.stem: np.load(file, mmap_mode='r') for file in Path(path).glob('*.npy')}
+
+
+def _release_worker():
+    # Bez otwartych memmap katalog tymczasowy można usunąć (także w Windows)
+    global _worker_arrays
+    _worker_arrays = None
+
+
+def _segment_rows(spec):
+    if spec.column is None:
+        return np.arange(len(_worker_arrays['is_test']))
+    return np.flatnonzero(np.isin(_worker_arrays[spec.column], spec.values))
+
+
+def train_spec(spec, threads=1, balance='class_weight', vocab=None, population_dir=None, random_state=42):
+    """Trenuje i ocenia model XGBoost (`params_xgb`) jednej specyfikacji na tablicach procesu roboczego.
+
+    `population_dir` - katalog z modelami całej populacji (`<cel>.ubj`), oceniany na tym samym zbiorze testowym
+    segmentu; model populacji (specyfikacja bez `column`) jest tam zapisywany. Zwraca wiersz tabeli porównawczej.
+    """
+    rows = _segment_rows(spec)
+    is_test = _worker_arrays['is_test'][rows]
+    y = _worker_arrays[spec.target][rows].astype(np.int64)
+    row = {'Cel': spec.target, 'Wymiar': DIMENSION_NAMES.get(spec.dimension, '-'), 'Segment': spec.segment, 'Rekordy': len(rows),
+           'Odsetek klasy 1': float(y.mean()) if len(y) else np.nan}
+    n_test_pos = int(y[is_test].sum())
+    if len(rows) < MIN_SEGMENT_ROWS or min(n_test_pos, int(is_test.sum()) - n_test_pos) < MIN_CLASS_ROWS:
+        return {**row, 'Status': 'za mało danych'}
+
+    start = time.perf_counter()
+    # Posortowane indeksy - odczyt wierszy memmap po kolei; kopiowany jest tylko wycinek segmentu
+    X_train, y_train = _worker_arrays['X'][rows[~is_test]], y[~is_test]
+    X_test, y_test = _worker_arrays['X'][rows[is_test]], y[is_test]
+    X_train, y_train = resample(X_train, y_train, balance, vocab, random_state)
+    model = weighted_estimator(XGBClassifier(**params_xgb), balance, y_train).set_params(n_jobs=threads)
+    model.fit(X_train, y_train)
+    proba = model.predict_proba(X_test)[:, 1]
+    seconds = time.perf_counter() - start
+
+    summary = ScoreSummary.from_predictions(y_test, proba)
+    row.update({'AUC': summary.roc_auc(), 'Average Precision': summary.average_precision(),
+                'F1': threshold_metrics(summary.confusion(0.5))['f1'], 'Trening [s]': seconds, 'Status': 'ok'})
+    if population_dir is not None:
+        file = Path(population_dir) / f'{spec.target}.ubj'
+        if spec.column is None:
+            model.get_booster().save_model(file)
+            row['AUC modelu ogólnego'] = row['AUC']
+        elif file.exists():
+            population = xgb.Booster(model_file=str(file))
+            population.set_param({'nthread': threads})
+            row['AUC modelu ogólnego'] = ScoreSummary.from_predictions(
+                y_test, population.inplace_predict(X_test, validate_features=False)).roc_auc()
+    return row
+
+
+def _run(jobs, pool=None):
+    # Zadania [(specyfikacja, liczba rekordów, argumenty)] od największego segmentu (krótszy ogon na końcu pracy puli)
+    jobs = sorted(jobs, key=lambda job: -job[1])
+    if pool is None:
+        return {spec: train_spec(spec, *args) for spec, _, args in jobs}
+    futures = {spec: pool.submit(train_spec, spec, *args) for spec, _, args in jobs}
+    return {spec: future.result() for spec, future in futures.items()}
+
+
+@traced(rows=None)
+def train_segments(data, targets=None, dimensions=None, n_jobs=None, balance='class_weight', work_dir=None,
+                   random_state=42):
+    """Trenuje modele specyfikacji `segment_specs(data, targets, dimensions)` równolegle w `n_jobs` procesach.
+
+    `data` - oczyszczona tabela (`ingest.clean_data`). X jest budowana raz i zapisywana w katalogu
+    tymczasowym (w `work_dir`), a procesy otwierają ją jako memmap. Każdy proces dostaje
+    cpu_count // n_jobs wątków XGBoost. Najpierw trenowane są modele całych populacji (po jednym na cel,
+    z odpowiednio większą liczbą wątków), potem segmenty, oceniane też modelem populacji na tych samych
+    rekordach testowych. Zwraca {'table': tabela `COMPARISON_COLUMNS`, 'run': czasy i parametry przebiegu}.
+    """
+    if balance not in BALANCING_METHODS:
+        raise ValueError(f"Nieznana metoda balansowania: {balance!r} (dostępne: {BALANCING_METHODS})")
+    start = time.perf_counter()
+    vocab = FeatureVocabulary.fit(data)
+    data = add_features(data, vocab)
+    specs = segment_specs(data, targets, dimensions)
+    if not specs:
+        raise ValueError(f"Brak kolumn celów {targets or list(TARGETS)} w danych (dane sprzed dodania accident_severity?)")
+    sizes = {spec: len(data) if spec.column is None else int(data[spec.column].isin(spec.values).sum())
+             for spec in specs}
+    columns = sorted({spec.target for spec in specs} | {spec.column for spec in specs if spec.column})
+    cpu = os.cpu_count() or 1
+    n_jobs = max(1, min(n_jobs or cpu, len(specs)))
+
+    with tempfile.TemporaryDirectory(prefix='segments-', dir=work_dir) as path:
+        write_shared(path, data, vocab, columns, random_state=random_state)
+        prepared = time.perf_counter()
+        population_dir = Path(path) / 'population'
+        population_dir.mkdir()
+        population = [spec for spec in specs if spec.column is None]
+        segments = [spec for spec in specs if spec.column is not None]
+
+        pool = ProcessPoolExecutor(n_jobs, initializer=_init_worker, initargs=(path,)) if n_jobs > 1 else None
+        if pool is None:
+            _init_worker(path)
+        try:
+            results = {}
+            for stage in (population, segments):
+                threads = max(1, cpu // max(1, min(n_jobs, len(stage))))
+                jobs = [(spec, sizes[spec], (threads, balance, vocab, population_dir, random_state)) for spec in stage]
+                results.update(_run(jobs, pool))
+        finally:
+            if pool is not None:
+                pool.shutdown()
+            _release_worker()
+
+    table = pd.DataFrame([results[spec] for spec in specs]).reindex(columns=COMPARISON_COLUMNS)
+    table['Zmiana AUC'] = table['AUC'] - table['AUC modelu ogólnego']
+    wall = time.perf_counter() - start
+    run = {'rows': len(data), 'specs': len(specs), 'n_jobs': n_jobs, 'cpu_count': cpu, 'balance': balance,
+           'prepare_seconds': prepared - start, 'wall_seconds': wall,
+           'train_seconds': float(table['Trening [s]'].sum()), 'created': time.strftime('%Y-%m-%d %H:%M:%S')}
+    return {'table': table, 'run': run}
+
+
+def save_comparison(result, directory=SEGMENTS_DIR):
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    tmp_path = directory / (COMPARISON_FILE + '.tmp')
+    result['table'].to_parquet(tmp_path, index=False)
+    tmp_path.replace(directory / COMPARISON_FILE)
+    (directory / RUN_FILE).write_text(json.dumps(result['run'], indent=1))
+
+
+def load_comparison(directory=SEGMENTS_DIR):
+    """Tabela porównawcza i parametry przebiegu zapisane przez `save_comparison` albo None, gdy ich nie ma."""
+    directory = Path(directory)
+    if not (directory / COMPARISON_FILE).exists():
+        return None
+    run = json.loads((directory / RUN_FILE).read_text()) if (directory / RUN_FILE).exists() else {}
+    return {'table': pd.read_parquet(directory / COMPARISON_FILE), 'run': run}
+
+
+def main(argv=None):
+    from wypadki.ingest import clean_data, load_data
+
+    parser = argparse.ArgumentParser(description="Równoległy trening modeli dla segmentów i zmiennych docelowych.")
+    parser.add_argument('--targets', nargs='+', choices=list(TARGETS), default=list(TARGETS))
+    parser.add_argument('--dimensions', nargs='*', choices=list(DIMENSIONS), default=list(DIMENSIONS))
+    parser.add_argument('--jobs', type=int, help="liczba procesów (domyślnie liczba rdzeni)")
+    parser.add_argument('--balance', choices=BALANCING_METHODS, default='class_weight')
+    parser.add_argument('--store', action='store_true', help="dane z magazynu store/ zamiast plików CSV")
+    parser.add_argument('--output', type=Path, default=SEGMENTS_DIR)
+    args = parser.parse_args(argv)
+
+    if args.store:
+        from wypadki import refresh
+
+        data = clean_data(refresh.read_store_data())
+    else:
+        data = clean_data(load_data())
+    result = train_segments(data, args.targets, args.dimensions, n_jobs=args.jobs, balance=args.balance)
+    save_comparison(result, args.output)
+    run = result['run']
+    with pd.option_context('display.width', 200, 'display.max_rows', 200, 'display.float_format', '{:.4f}'.format):
+        print(result['table'].to_string(index=False))
+    print(f"Modele: {run['specs']}, czas {run['wall_seconds']:.1f} s (procesy: {run['n_jobs']}, suma czasów treningu "
+          f"{run['train_seconds']:.1f} s); zapisano {args.output / COMPARISON_FILE}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
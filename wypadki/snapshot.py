@@ -0,0 +1,331 @@
+# Snapshot wyników dla aplikacji: jeden wersjonowany plik z tabelami, krzywymi i metrykami wszystkich sekcji
+# (zamiast wartości wpisanych w kod aplikacji). Nagłówek JSON z indeksem tabel, a każda tabela to osobny blok
+# Arrow IPC - aplikacja mapuje plik w pamięci i deserializuje tylko tabele wyświetlanej sekcji
+#
+#   python -m wypadki.snapshot                                  # lata YEARS z plików CSV, najnowsza wersja modeli
+#   python -m wypadki.snapshot --years 2022 2023 --store --description "Magazyn, lata 2022-2023"
+#   python -m wypadki.snapshot --list
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from wypadki.profiling import traced
+
+SNAPSHOT_DIR = Path('snapshots')
+SNAPSHOT_SUFFIX = '.snapshot'
+
+# Układ pliku: MAGIC, długość nagłówka (uint64 little-endian), nagłówek JSON, bloki tabel wyrównane do ALIGNMENT.
+# FORMAT_VERSION rośnie przy zmianie układu pliku lub nazw / kolumn tabel czytanych przez aplikację
+MAGIC = b'WYPSNAP\x00'
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+_PREFIX = len(MAGIC) + 8
+
+# Punkty krzywej ROC zapisywane na model (krzywa z pełnych predykcji próbkowana `downsample_curve`)
+ROC_POINTS = 500
+TOP_FEATURES = 12
+
+
+def _padded(size):
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Wartość typu {type(value).__name__} nie jest zapisywalna w nagłówku snapshotu")
+
+
+def _ipc_bytes(frame):
+    # Indeks inny niż domyślny (np. pochodzenie kierowcy w tabeli kontyngencji) zapisywany jako kolumna
+    table = pa.Table.from_pandas(frame, preserve_index=not isinstance(frame.index, pd.RangeIndex))
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def snapshot_name(years):
+    """Domyślna nazwa snapshotu: zakres lat ('2021-2023') albo lista lat niekolejnych ('2019_2021')."""
+    years = sorted(int(year) for year in years)
+    if not years:
+        return 'bez-lat'
+    if years == list(range(years[0], years[-1] + 1)):
+        return str(years[0]) if len(years) == 1 else f'{years[0]}-{years[-1]}'
+    return '_'.join(map(str, years))
+
+
+def write_snapshot(path, tables, values=None, description='', years=None):
+    """Zapisuje snapshot: `tables` - `{nazwa: DataFrame}`, `values` - słownik zapisywalny jako JSON.
+
+    Zapis atomowy (plik tymczasowy + zamiana), więc działająca aplikacja nie odczyta pliku w połowie zapisu.
+    Zwraca ścieżkę pliku.
+    """
+    path = Path(path)
+    blobs = {name: _ipc_bytes(frame) for name, frame in tables.items()}
+    entries, offset = {}, 0
+    for name, blob in blobs.items():
+        entries[name] = {'offset': offset, 'length': blob.size}
+        offset += _padded(blob.size)
+    header = {
+        'format': FORMAT_VERSION, 'name': path.name.removesuffix(SNAPSHOT_SUFFIX), 'description': description,
+        'created': time.strftime('%Y-%m-%d %H:%M:%S'), 'years': sorted(int(year) for year in years or []),
+        'values': values or {}, 'tables': entries,
+    }
+    encoded = json.dumps(header, ensure_ascii=False, default=_json_default).encode()
+    data_start = _padded(_PREFIX + len(encoded))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(encoded).to_bytes(8, 'little'))
+        f.write(encoded)
+        f.write(b'\x00' * (data_start - _PREFIX - len(encoded)))
+        for blob in blobs.values():
+            f.write(blob)
+            f.write(b'\x00' * (_padded(blob.size) - blob.size))
+    tmp_path.replace(path)
+    return path
+
+
+def _parse_header(prefix, path):
+    if prefix[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"'{path}' nie jest plikiem snapshotu")
+    return int.from_bytes(prefix[len(MAGIC):_PREFIX], 'little')
+
+
+def read_header(path):
+    """Nagłówek snapshotu (nazwa, opis, data utworzenia, lata, wartości, indeks tabel) bez czytania tabel."""
+    with open(path, 'rb') as f:
+        length = _parse_header(f.read(_PREFIX), path)
+        header = json.loads(f.read(length))
+    if header['format'] > FORMAT_VERSION:
+        raise ValueError(f"Snapshot '{path}' ma format {header['format']}, obsługiwany najwyżej {FORMAT_VERSION}")
+    return header
+
+
+def list_snapshots(directory=SNAPSHOT_DIR):
+    """Snapshoty w katalogu jako lista (ścieżka, nagłówek), od najnowszego; pliki nieczytelne są pomijane."""
+    found = []
+    for path in Path(directory).glob(f'*{SNAPSHOT_SUFFIX}'):
+        try:
+            found.append((path, read_header(path)))
+        except (OSError, ValueError, KeyError):
+            continue
+    return sorted(found, key=lambda item: (item[1]['created'], item[0].name), reverse=True)
+
+
+class Snapshot:
+    """Snapshot otwarty przez mapowanie pliku w pamięci.
+
+    Przy otwarciu czytany jest tylko nagłówek; tabela jest deserializowana z bloku Arrow IPC przy pierwszym
+    odczycie `table(nazwa)` (bez kopiowania bloku z pliku) i zapamiętywana.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._source = pa.memory_map(str(self.path))
+        self._buffer = self._source.read_buffer()
+        length = _parse_header(self._buffer.slice(0, _PREFIX).to_pybytes(), self.path)
+        self.header = json.loads(self._buffer.slice(_PREFIX, length).to_pybytes())
+        if self.header['format'] > FORMAT_VERSION:
+            raise ValueError(f"Snapshot '{self.path}' ma format {self.header['format']}, "
+                             f"obsługiwany najwyżej {FORMAT_VERSION}")
+        self._data_start = _padded(_PREFIX + length)
+        self._tables = {}
+
+    @property
+    def name(self):
+        return self.header['name']
+
+    @property
+    def years(self):
+        return self.header['years']
+
+    def __contains__(self, name):
+        return name in self.header['tables']
+
+    def value(self, name, default=None):
+        return self.header['values'].get(name, default)
+
+    def table(self, name):
+        """Tabela `name` jako DataFrame (kopia - wywołujący może ją modyfikować); KeyError, gdy jej nie zapisano."""
+        if name not in self._tables:
+            entry = self.header['tables'][name]
+            block = self._buffer.slice(self._data_start + entry['offset'], entry['length'])
+            self._tables[name] = pa.ipc.open_file(block).read_all().to_pandas()
+        return self._tables[name].copy()
+
+    def close(self):
+        self._tables.clear()
+        self._buffer = None
+        self._source.close()
+
+
+def data_results(data, alpha=0.05):
+    """Tabele i wartości sekcji opisowych z `data` po `prepare_dataset`: kierowcy, test chi-kwadrat, kluczowe cechy."""
+    from wypadki import aggregations
+
+    contingency = aggregations.contingency_table(data)
+    association = aggregations.association_test(contingency, alpha)
+    tables = {
+        'driver_origin': aggregations.driver_origin_table(data),
+        'driver_stats': aggregations.driver_stats_table(data),
+        'association_contingency': contingency,
+        'association_location_stats': association['location_stats'],
+        'key_feature_tests': aggregations.key_feature_tests(data),
+    }
+    if association['expected'] is not None:
+        tables['association_expected'] = association['expected']
+    values = {
+        'total_accidents': len(data),
+        'association': {key: association[key]
+                        for key in ('chi2', 'p_value', 'dof', 'phi', 'strength', 'conclusion', 'alpha')},
+    }
+    return tables, values
+
+
+def feature_importance(booster, columns, top=TOP_FEATURES):
+    """Ważność cech boostera XGBoost (gain, normalizacja do sumy 1 jak `feature_importances_`), `top` największych."""
+    scores = booster.get_score(importance_type='gain')
+    if booster.feature_names is None:
+        scores = {columns[int(key[1:])]: score for key, score in scores.items()}
+    importance = pd.Series(scores, dtype='float64')
+    importance = (importance / importance.sum()).sort_values(ascending=False).head(top)
+    return pd.DataFrame({'Cecha': importance.index, 'Ważność': importance.to_numpy()})
+
+
+def model_results(path, years=None, threshold=0.5):
+    """Raporty klasyfikacji, AUC, krzywe ROC (zbiór testowy) i ważność cech wersji modeli `path` z rejestru.
+
+    Metryki są liczone z predykcji zapisanych przez `registry.save_predictions`; przy podanych `years`
+    i zapisanych latach wierszy tylko z wierszy tych lat (snapshot dla wybranego zakresu lat).
+    """
+    from sklearn.metrics import classification_report
+
+    from wypadki import registry
+    from wypadki.curves import ScoreSummary, downsample_curve
+    from wypadki.modeling import params_rf, params_xgb
+
+    path = Path(path)
+    predictions = registry.load_predictions(path) or {}
+    prediction_years = registry.load_prediction_years(path) if years is not None else None
+    metrics, roc = [], []
+    for model, splits in predictions.items():
+        for split, (labels, scores) in splits.items():
+            if prediction_years and split in prediction_years.get(model, {}):
+                mask = np.isin(prediction_years[model][split], list(years))
+                labels, scores = labels[mask], scores[mask]
+            if not len(labels):
+                continue
+            summary = ScoreSummary.from_predictions(labels, scores)
+            report = classification_report(labels.astype(int), (scores >= threshold).astype(int), zero_division=0)
+            metrics.append({'model': model, 'split': split, 'auc': summary.roc_auc(), 'rows': len(labels),
+                            'report': report})
+            if split == 'test':
+                fpr, tpr = downsample_curve(*summary.roc(), max_points=ROC_POINTS)
+                roc.append(pd.DataFrame({'model': model, 'fpr': fpr, 'tpr': tpr}))
+
+    tables = {}
+    if metrics:
+        tables['model_metrics'] = pd.DataFrame(metrics)
+    if roc:
+        tables['roc'] = pd.concat(roc, ignore_index=True)
+    bundle = registry.load_bundle(path)
+    if bundle.booster is not None:
+        tables['feature_importance'] = feature_importance(bundle.booster, bundle.vocab.columns)
+    # Rozmiary zbiorów: walidacyjny i testowy z predykcji, treningowy (po SMOTE) z metadanych wersji
+    split_rows = {row['split']: row['rows'] for row in metrics if row['model'] == metrics[0]['model']} if metrics else {}
+    if 'train_rows' in bundle.metadata:
+        split_rows['train'] = int(bundle.metadata['train_rows'])
+    values = {
+        'models_version': path.name, 'threshold': threshold, 'roc_illustrative': False,
+        'years_filtered': bool(prediction_years), 'params': {'xgb': params_xgb, 'rf': params_rf},
+        'split_rows': split_rows,
+    }
+    return tables, values
+
+
+def learning_curve_table(learning_curve):
+    """Średnie F1 z fałd dla krzywej uczenia z `evaluation.evaluate_model(..., train_sizes=...)`."""
+    return pd.DataFrame({
+        'train_size': np.asarray(learning_curve['train_sizes'], dtype='int64'),
+        'f1_train': np.nanmean(learning_curve['train_scores'], axis=1),
+        'f1_val': np.nanmean(learning_curve['val_scores'], axis=1),
+    })
+
+
+@traced()
+def build_snapshot(data, model_path=None, learning_curve=None, name=None, description='', directory=SNAPSHOT_DIR):
+    """Liczy wszystkie wyniki prezentowane w aplikacji i zapisuje je jako snapshot `<directory>/<name>.snapshot`.
+
+    `data` - tabela po `prepare_dataset` (albo `prepare_features`) z latami, które ma opisywać snapshot;
+    `model_path` - wersja modeli z rejestru (metryki, ROC, ważność cech, hiperparametry);
+    `learning_curve` - wynik `evaluate_model(...)['learning_curve']` (krzywa uczenia wymaga treningów,
+    więc zapisuje ją notatnik). Nazwa domyślnie z zakresu lat. Zwraca ścieżkę pliku.
+    """
+    years = sorted(int(year) for year in pd.unique(data['accident_year']))
+    tables, values = data_results(data)
+    if model_path is not None:
+        model_tables, model_values = model_results(model_path, years)
+        tables.update(model_tables)
+        values.update(model_values)
+    if learning_curve is not None:
+        tables['learning_curve'] = learning_curve_table(learning_curve)
+    path = Path(directory) / f'{name or snapshot_name(years)}{SNAPSHOT_SUFFIX}'
+    return write_snapshot(path, tables, values, description, years)
+
+
+def main(argv=None):
+    from wypadki import aggregations, registry
+    from wypadki.ingest import YEARS, load_data
+
+    parser = argparse.ArgumentParser(description="Snapshot wyników prezentowanych w aplikacji.")
+    parser.add_argument('--years', type=int, nargs='+', default=list(YEARS))
+    parser.add_argument('--store', action='store_true', help="dane z magazynu store/ zamiast plików CSV")
+    parser.add_argument('--models', type=Path, default=registry.MODELS_DIR)
+    parser.add_argument('--version', help="wersja rejestru (domyślnie najnowsza)")
+    parser.add_argument('--no-models', action='store_true', help="tylko wyniki z danych, bez metryk modeli")
+    parser.add_argument('--name', help="nazwa pliku (domyślnie zakres lat)")
+    parser.add_argument('--description', default='')
+    parser.add_argument('--output', type=Path, default=SNAPSHOT_DIR)
+    parser.add_argument('--list', action='store_true', help="wypisuje zapisane snapshoty i kończy")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for path, header in list_snapshots(args.output):
+            print(f"{path.name}: {header['created']}, lata {header['years']}, tabele {len(header['tables'])}"
+                  f"{' - ' + header['description'] if header['description'] else ''}")
+        return 0
+
+    if args.store:
+        from wypadki import refresh
+
+        data = refresh.read_store_data(years=args.years)
+    else:
+        data = load_data(years=tuple(args.years))
+    data = aggregations.prepare_dataset(data)
+    model_path = None
+    if not args.no_models:
+        version = args.version or registry.latest_version(args.models)
+        if version is None:
+            print(f"Brak zapisanych modeli w '{args.models}' - snapshot bez metryk modeli")
+        else:
+            model_path = args.models / version
+    path = build_snapshot(data, model_path, name=args.name, description=args.description, directory=args.output)
+    header = read_header(path)
+    print(f"Zapisano {path} ({path.stat().st_size / 1024:.1f} KB): {', '.join(header['tables'])}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# Indeks przestrzenny wypadków: siatka komórek na kilku poziomach i jednostki samorządu, z liczbą rekordów,
+# wypadków wiejskich i sumą przewidywanego prawdopodobieństwa - mapa w aplikacji rysowana z agregatów
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Komórka bazowa: BASE_STEP stopni szerokości x BASE_STEP * LON_FACTOR stopni długości geograficznej;
+# na szerokości Wielkiej Brytanii (50-58°N) to w przybliżeniu kwadrat o boku ok. 1,1 km
+BASE_STEP = 0.01
+LON_FACTOR = 1.6
+
+# Poziomy siatki jako krotności komórki bazowej - komórki grubsze są sumą komórek drobniejszych
+GRID_LEVELS = {'1 km': 1, '5 km': 5, '25 km': 25}
+
+# Wymiary, po których można filtrować mapę bez ponownego przeglądania danych
+SPATIAL_DIMENSIONS = ['accident_year', 'is_urban_driver']
+
+DISTRICT_COLUMN = 'local_authority_ons_district'
+LOCATION_COLUMNS = ['latitude', 'longitude', DISTRICT_COLUMN]
+
+# Sumy w każdej komórce; średnie (odsetek wiejskich, przewidywane P, środek ciężkości) liczone po filtrowaniu
+SUM_COLUMNS = ['count', 'rural', 'proba_sum', 'lat_sum', 'lon_sum']
+
+CELLS_FILE = 'cells.parquet'
+DISTRICTS_FILE = 'districts.parquet'
+
+
+def base_cells(latitude, longitude):
+    """Indeksy (wiersz, kolumna) komórki bazowej dla współrzędnych w stopniach (WGS84)."""
+    row = np.floor(np.asarray(latitude, dtype='float64') / BASE_STEP).astype('int32')
+    col = np.floor(np.asarray(longitude, dtype='float64') / (BASE_STEP * LON_FACTOR)).astype('int32')
+    return row, col
+
+
+def predicted_probability(bundle, data, model='xgb', chunk_rows=200_000):
+    """Przewidywane P(wypadek wiejski) dla każdego rekordu `data`, partiami (ograniczona pamięć macierzy X)."""
+    parts = [bundle.predict(data.iloc[start:start + chunk_rows], model) for start in range(0, len(data), chunk_rows)]
+    return np.concatenate(parts) if parts else np.empty(0, dtype='float32')
+
+
+def _records(data, proba):
+    located = data['latitude'].notna().to_numpy() & data['longitude'].notna().to_numpy()
+    frame = pd.DataFrame({col: data[col].to_numpy(dtype='int16') for col in SPATIAL_DIMENSIONS})
+    frame['rural'] = data['is_rural_accident'].to_numpy(dtype='int64')
+    frame['proba_sum'] = np.nan if proba is None else np.asarray(proba, dtype='float64')
+    frame['lat_sum'] = data['latitude'].to_numpy(dtype='float64')
+    frame['lon_sum'] = data['longitude'].to_numpy(dtype='float64')
+    return frame, located
+
+
+def _aggregate(frame, keys):
+    # Suma pozostałych kolumn i liczba rekordów w każdej grupie (proba_sum pusta, gdy brak predykcji)
+    grouped = frame.groupby(keys, sort=False, observed=True)
+    table = grouped.sum(min_count=1)
+    table.insert(0, 'count', grouped.size())
+    return table.reset_index()
+
+
+def build_spatial_index(data, proba=None):
+    """Agregaty przestrzenne rekordów `data` (po `prepare_dataset`), liczone raz.
+
+    `proba` - przewidywane prawdopodobieństwo dla każdego wiersza `data` (np. `predicted_probability`);
+    bez niego kolumna `proba_sum` jest pusta. Zwraca {'cells': ..., 'districts': ...}: komórki wszystkich
+    poziomów `GRID_LEVELS` (kolumny level, row, col) i jednostki samorządu, w podziale na `SPATIAL_DIMENSIONS`.
+    Rekordy bez współrzędnych są pomijane w komórkach, ale liczone w jednostkach samorządu.
+    """
+    frame, located = _records(data, proba)
+    district = frame.drop(columns=['lat_sum', 'lon_sum'])
+    district[DISTRICT_COLUMN] = data[DISTRICT_COLUMN].astype('string').fillna('').to_numpy()
+    districts = _aggregate(district, [DISTRICT_COLUMN] + SPATIAL_DIMENSIONS)
+
+    frame = frame[located]
+    row, col = base_cells(frame['lat_sum'], frame['lon_sum'])
+    frame = frame.assign(row=row, col=col)
+    base = _aggregate(frame, ['row', 'col'] + SPATIAL_DIMENSIONS)
+    levels = []
+    for level, factor in GRID_LEVELS.items():
+        # Komórka grubsza = dzielenie całkowite indeksów komórki bazowej (dokładne zagnieżdżenie poziomów)
+        coarse = base.assign(row=base['row'] // factor, col=base['col'] // factor)
+        table = coarse.groupby(['row', 'col'] + SPATIAL_DIMENSIONS, sort=False)[SUM_COLUMNS].sum(min_count=1)
+        levels.append(table.reset_index().assign(level=level))
+    cells = pd.concat(levels, ignore_index=True)
+    cells['count'] = cells['count'].astype('int64')
+    cells['rural'] = cells['rural'].astype('int64')
+    return {'cells': cells[['level', 'row', 'col'] + SPATIAL_DIMENSIONS + SUM_COLUMNS], 'districts': districts}
+
+
+def _filter(table, years=None, urban_driver=None):
+    mask = np.ones(len(table), dtype=bool)
+    if years:
+        mask &= table['accident_year'].isin(years).to_numpy()
+    if urban_driver is not None:
+        mask &= (table['is_urban_driver'] == int(urban_driver)).to_numpy()
+    return table[mask]
+
+
+def _rates(table):
+    table['rural_share'] = table['rural'] / table['count']
+    table['mean_proba'] = table['proba_sum'] / table['count']
+    return table.drop(columns=['proba_sum'])
+
+
+def hotspot_cells(cells, level, years=None, urban_driver=None, min_count=1):
+    """Komórki poziomu `level` po filtrach: liczba rekordów, wypadków wiejskich, odsetek wiejskich,
+    średnie przewidywane P i środek ciężkości wypadków (latitude / longitude) - punkty do mapy.
+
+    `urban_driver` - True / False (kierowcy miejscy / niemiejscy) albo None (wszyscy).
+    """
+    part = _filter(cells[cells['level'] == level], years, urban_driver)
+    table = part.groupby(['row', 'col'], sort=False)[SUM_COLUMNS].sum(min_count=1).reset_index()
+    table = table[table['count'] >= min_count]
+    table['latitude'] = table['lat_sum'] / table['count']
+    table['longitude'] = table['lon_sum'] / table['count']
+    table = _rates(table.drop(columns=['lat_sum', 'lon_sum']))
+    return table.sort_values('count', ascending=False, ignore_index=True)
+
+
+def district_table(districts, years=None, urban_driver=None):
+    """Jednostki samorządu po filtrach, malejąco wg liczby rekordów."""
+    part = _filter(districts, years, urban_driver)
+    table = part.groupby(DISTRICT_COLUMN, sort=False)[['count', 'rural', 'proba_sum']].sum(min_count=1).reset_index()
+    return _rates(table).sort_values('count', ascending=False, ignore_index=True)
+
+
+def save_spatial_index(path, index):
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    tmp_path.mkdir(parents=True, exist_ok=True)
+    index['cells'].to_parquet(tmp_path / CELLS_FILE, index=False)
+    index['districts'].to_parquet(tmp_path / DISTRICTS_FILE, index=False)
+    tmp_path.replace(path)
+
+
+def load_spatial_index(path):
+    """Indeks zapisany przez `save_spatial_index` albo None, gdy go nie ma."""
+    path = Path(path)
+    if not (path / CELLS_FILE).exists():
+        return None
+    return {'cells': pd.read_parquet(path / CELLS_FILE), 'districts': pd.read_parquet(path / DISTRICTS_FILE)}
+
+
+def has_locations(data):
+    """Czy tabela ma kolumny położenia (dane wczytane przed ich dodaniem do SOURCE_COLUMNS ich nie mają)."""
+    return all(col in data.columns for col in LOCATION_COLUMNS)
+
+
+def cached_spatial_index(path, load_data, bundle=None):
+    """Indeks z katalogu `path`; przy pierwszym wywołaniu budowany z `load_data()` (i predykcji `bundle`).
+
+    None, gdy dane nie mają kolumn położenia (`has_locations`).
+    """
+    index = load_spatial_index(path)
+    if index is None:
+        data = load_data()
+        if not has_locations(data):
+            return None
+        proba = predicted_probability(bundle, data) if bundle is not None else None
+        index = build_spatial_index(data, proba)
+        save_spatial_index(path, index)
+    return index
@@ -0,0 +1,114 @@
+# Strumieniowe złączenie tabel STATS19 po `accident_index` (fragmentami, bez pełnego złączenia w pamięci)
+import numpy as np
+import pandas as pd
+
+from wypadki.ingest import SOURCE_COLUMNS, YEARS, clean_data
+from wypadki.profiling import traced
+
+CHUNKSIZE = 200_000
+
+
+def read_chunks(name, path, chunksize=CHUNKSIZE):
+    """Generator fragmentów jednej tabeli (tylko potrzebne kolumny, kompaktowe typy)."""
+    dtypes = SOURCE_COLUMNS[name]
+    with pd.read_csv(path, usecols=list(dtypes), dtype=dtypes, chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield chunk[list(dtypes)]
+
+
+def _check_sorted(keys, last_key, name):
+    # Złączenie strumieniowe wymaga plików posortowanych rosnąco po accident_index
+    if len(keys) == 0:
+        return last_key
+    if (last_key is not None and keys[0] < last_key) or np.any(keys[1:] < keys[:-1]):
+        raise ValueError(f"Plik '{name}' nie jest posortowany według accident_index")
+    return keys[-1]
+
+
+class KeyedStream:
+    """Bufor fragmentów tabeli posortowanej po `accident_index`, wydawany do zadanego klucza włącznie."""
+
+    def __init__(self, name, chunks):
+        self.name = name
+        self._chunks = chunks
+        self._buffer = []
+        self._last_key = None
+        self._exhausted = False
+
+    def _pull(self):
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self._exhausted = True
+            return
+        keys = chunk['accident_index'].to_numpy(dtype=object)
+        self._last_key = _check_sorted(keys, self._last_key, self.name)
+        self._buffer.append(chunk)
+
+    def take_until(self, key):
+        """Zwraca wszystkie wiersze z `accident_index <= key` i usuwa je z bufora."""
+        while not self._exhausted and (self._last_key is None or self._last_key <= key):
+            self._pull()
+        if not self._buffer:
+            return None
+        buffered = pd.concat(self._buffer, ignore_index=True) if len(self._buffer) > 1 else self._buffer[0]
+        keys = buffered['accident_index'].to_numpy(dtype=object)
+        split = np.searchsorted(keys, key, side='right')
+        rest = buffered.iloc[split:]
+        self._buffer = [rest] if len(rest) else []
+        return buffered.iloc[:split]
+
+
+def _empty_frame(name):
+    return pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in SOURCE_COLUMNS[name].items()})
+
+
+def _join(accidents, casualties_part, vehicles_part):
+    # Fragment accidents z pasującymi wierszami casualties i vehicles, po czyszczeniu
+    batch = accidents
+    for name, part in (('casualties', casualties_part), ('vehicles', vehicles_part)):
+        if part is None:
+            part = _empty_frame(name)
+        batch = batch.merge(part.drop(columns='accident_year'), on='accident_index', how='left')
+    return clean_data(batch)
+
+
+def stream_data(paths, years=YEARS, chunksize=CHUNKSIZE):
+    """Generator oczyszczonych fragmentów tabeli `data`.
+
+    Pliki muszą być posortowane po `accident_index`. Każdy fragment tabeli accidents jest łączony
+    z odpowiadającymi mu wierszami casualties i vehicles, filtrowany po latach, czyszczony
+    (-1/99 -> NaN) i pozbawiany braków, więc pamięć zależy od `chunksize`, a nie od liczby wierszy.
+    """
+    casualties = KeyedStream('casualties', read_chunks('casualties', paths['casualties'], chunksize))
+    vehicles = KeyedStream('vehicles', read_chunks('vehicles', paths['vehicles'], chunksize))
+
+    last_key = None
+    for accidents in read_chunks('accidents', paths['accidents'], chunksize):
+        keys = accidents['accident_index'].to_numpy(dtype=object)
+        last_key = _check_sorted(keys, last_key, 'accidents')
+        if last_key is None:
+            continue
+        casualties_part = casualties.take_until(last_key)
+        vehicles_part = vehicles.take_until(last_key)
+
+        accidents = accidents[accidents['accident_year'].isin(years)]
+        if accidents.empty:
+            continue
+        batch = _join(accidents, casualties_part, vehicles_part)
+        if len(batch):
+            yield batch.reset_index(drop=True)
+
+
+@traced()
+def read_streaming(paths, years=YEARS, chunksize=CHUNKSIZE):
+    """Składa oczyszczone fragmenty w jedną tabelę (odpowiednik `data` po czyszczeniu w notatniku).
+
+    Gdy po filtrze lat i czyszczeniu nie zostaje żaden wiersz, zwraca pustą tabelę z tymi samymi kolumnami.
+    """
+    batches = list(stream_data(paths, years, chunksize))
+    data = (pd.concat(batches, ignore_index=True) if batches
+            else _join(_empty_frame('accidents'), None, None).reset_index(drop=True))
+    # Fragmenty mają różne zbiory kategorii, więc concat zwraca object - przywracamy typ `category`
+    for col in ('accident_index', 'time', 'local_authority_ons_district'):
+        data[col] = data[col].astype('category')
+    return data
@@ -0,0 +1,154 @@
+# Syntetyczne pliki CSV w układzie STATS19 (do benchmarków i testów bez plików DfT)
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from wypadki.ingest import SOURCE_COLUMNS
+
+# Rozkłady kodów {kod: prawdopodobieństwo}, w przybliżeniu jak w STATS19 2019-2023; -1 i 99 to braki danych
+# usuwane przez clean_data (udział braków zbliżony do rzeczywistego)
+CODE_DISTRIBUTIONS = {
+    'road_type': {1: 0.06, 2: 0.02, 3: 0.15, 6: 0.72, 7: 0.02, 9: 0.02, 12: 0.005, -1: 0.005},
+    'light_conditions': {1: 0.71, 4: 0.2, 5: 0.01, 6: 0.06, 7: 0.015, -1: 0.005},
+    'junction_detail': {0: 0.41, 1: 0.02, 2: 0.02, 3: 0.3, 5: 0.03, 6: 0.05, 7: 0.02, 8: 0.04, 9: 0.09,
+                        99: 0.015, -1: 0.005},
+    'junction_control': {1: 0.01, 2: 0.1, 3: 0.02, 4: 0.46, 9: 0.01, -1: 0.4},
+    'weather_conditions': {1: 0.79, 2: 0.11, 3: 0.005, 4: 0.01, 5: 0.01, 6: 0.002, 7: 0.005, 8: 0.02, 9: 0.038},
+    'urban_or_rural_area': {1: 0.65, 2: 0.345, 3: 0.003, -1: 0.002},
+    'number_of_casualties': {1: 0.78, 2: 0.14, 3: 0.05, 4: 0.02, 5: 0.01},
+    'casualty_type': {0: 0.16, 1: 0.1, 2: 0.01, 3: 0.02, 4: 0.01, 5: 0.06, 8: 0.01, 9: 0.56, 10: 0.005, 11: 0.015,
+                      19: 0.02, 20: 0.005, 21: 0.005, 90: 0.005, 98: 0.005},
+    'driver_home_area_type': {1: 0.63, 2: 0.08, 3: 0.1, -1: 0.19},
+    'driver_distance_banding': {1: 0.43, 2: 0.18, 3: 0.11, 4: 0.07, 5: 0.03, -1: 0.18},
+    'driver_imd_decile': {**{decile: 0.08 for decile in range(1, 11)}, -1: 0.2},
+    'skidding_and_overturning': {0: 0.86, 1: 0.04, 2: 0.01, 3: 0.004, 4: 0.002, 5: 0.004, 9: 0.05, -1: 0.03},
+}
+
+# Limit prędkości zależny od obszaru wypadku (miejski / wiejski) - zmienna docelowa ma związek z cechami
+SPEED_BY_AREA = {
+    1: {20: 0.2, 30: 0.7, 40: 0.06, 50: 0.01, 60: 0.02, 70: 0.01},
+    2: {20: 0.01, 30: 0.2, 40: 0.12, 50: 0.07, 60: 0.5, 70: 0.1},
+}
+
+# Udział wypadków śmiertelnych i poważnych: bazowy, dodatek dla terenu wiejskiego i na każde mph powyżej 30;
+# wśród nich udział śmiertelnych
+SEVERITY = {'serious': 0.16, 'rural': 0.07, 'per_mph': 0.002, 'fatal_share': 0.08}
+
+# Średnia liczba wierszy casualties i vehicles na wypadek
+CASUALTIES_PER_ACCIDENT = 1.3
+VEHICLES_PER_ACCIDENT = 1.8
+
+SYNTHETIC_YEARS = (2019, 2020, 2021, 2022, 2023)
+
+# Geografia: miasta w obrębie Wielkiej Brytanii; wypadki miejskie blisko centrum miasta, wiejskie rozproszone
+# wokół niego (odchylenie w stopniach), każde miasto to osobna jednostka samorządu (kod w formacie ONS)
+N_TOWNS = 150
+UK_BOUNDS = {'latitude': (50.3, 57.5), 'longitude': (-4.8, 1.4)}
+SPREAD = {1: 0.03, 2: 0.25}
+MISSING_LOCATION = 0.001
+
+
+def draw(rng, distribution, n):
+    """`n` kodów z rozkładu {kod: prawdopodobieństwo} (prawdopodobieństwa normalizowane)."""
+    codes = np.fromiter(distribution, dtype='int64')
+    p = np.fromiter(distribution.values(), dtype='float64')
+    return codes[rng.choice(len(codes), size=n, p=p / p.sum())]
+
+
+def _ages(rng, n):
+    ages = np.clip(rng.normal(40, 18, n).round(), 0, 100).astype('int64')
+    ages[rng.random(n) < 0.05] = -1
+    return ages
+
+
+def towns(seed=0):
+    """Środki miast (szerokość, długość) i kody jednostek samorządu; stałe dla danego ziarna."""
+    rng = np.random.default_rng(seed)
+    latitude = rng.uniform(*UK_BOUNDS['latitude'], N_TOWNS)
+    longitude = rng.uniform(*UK_BOUNDS['longitude'], N_TOWNS)
+    districts = np.array([f'E{6000001 + i:08d}' for i in range(N_TOWNS)])
+    return latitude, longitude, districts
+
+
+def _locations(rng, area, town_map):
+    latitude, longitude, districts = town_map
+    town = rng.integers(0, len(districts), len(area))
+    spread = np.where(area == 2, SPREAD[2], SPREAD[1])
+    lat = latitude[town] + rng.normal(0, 1, len(area)) * spread
+    lon = longitude[town] + rng.normal(0, 1, len(area)) * spread * 1.6
+    missing = rng.random(len(area)) < MISSING_LOCATION
+    lat[missing], lon[missing] = np.nan, np.nan
+    return lon.round(6), lat.round(6), districts[town]
+
+
+def generate_chunk(rng, year, first, n, town_map=None):
+    """Wypadki `first .. first + n - 1` roku `year` z powiązanymi wierszami casualties i vehicles."""
+    town_map = towns() if town_map is None else town_map
+    index = pd.Series(np.arange(first, first + n)).astype(str).str.zfill(9).radd(str(year)).to_numpy()
+    area = draw(rng, CODE_DISTRIBUTIONS['urban_or_rural_area'], n)
+    speed = np.where(area == 2, draw(rng, SPEED_BY_AREA[2], n), draw(rng, SPEED_BY_AREA[1], n))
+    speed[rng.random(n) < 0.002] = -1
+    minutes = rng.integers(0, 24 * 60, n)
+    longitude, latitude, district = _locations(rng, area, town_map)
+    accidents = pd.DataFrame({
+        'accident_index': index,
+        'accident_year': year,
+        'time': pd.Series(minutes // 60).astype(str).str.zfill(2) + ':' + pd.Series(minutes % 60).astype(str).str.zfill(2),
+        'urban_or_rural_area': area,
+        'speed_limit': speed,
+        'longitude': longitude,
+        'latitude': latitude,
+        'local_authority_ons_district': district,
+    })
+    for col in ('road_type', 'light_conditions', 'junction_detail', 'junction_control', 'weather_conditions',
+                'number_of_casualties'):
+        accidents[col] = draw(rng, CODE_DISTRIBUTIONS[col], n)
+    # Wypadki śmiertelne i poważne częstsze na terenach wiejskich i przy wyższym limicie prędkości
+    serious = SEVERITY['serious'] + SEVERITY['rural'] * (area == 2) + SEVERITY['per_mph'] * np.clip(speed - 30, 0, None)
+    u = rng.random(n)
+    accidents['accident_severity'] = np.where(u < serious * SEVERITY['fatal_share'], 1, np.where(u < serious, 2, 3))
+
+    n_cas = rng.poisson(CASUALTIES_PER_ACCIDENT - 1, n) + 1
+    rows = np.repeat(np.arange(n), n_cas)
+    casualties = pd.DataFrame({'accident_index': index[rows], 'accident_year': year,
+                               'age_of_casualty': _ages(rng, len(rows)),
+                               'casualty_type': draw(rng, CODE_DISTRIBUTIONS['casualty_type'], len(rows))})
+
+    n_veh = rng.poisson(VEHICLES_PER_ACCIDENT - 1, n) + 1
+    rows = np.repeat(np.arange(n), n_veh)
+    home = draw(rng, CODE_DISTRIBUTIONS['driver_home_area_type'], len(rows))
+    # Kierowcy spoza miast częściej w wypadkach wiejskich
+    rural = area[rows] == 2
+    home[rural & (rng.random(len(rows)) < 0.25)] = 3
+    vehicles = pd.DataFrame({'accident_index': index[rows], 'accident_year': year,
+                             'driver_home_area_type': home,
+                             'age_of_vehicle': np.where(rng.random(len(rows)) < 0.25, -1, rng.integers(0, 25, len(rows))),
+                             'age_of_driver': _ages(rng, len(rows))})
+    for col in ('driver_distance_banding', 'driver_imd_decile', 'skidding_and_overturning'):
+        vehicles[col] = draw(rng, CODE_DISTRIBUTIONS[col], len(rows))
+    return {'accidents': accidents, 'casualties': casualties, 'vehicles': vehicles}
+
+
+def write_synthetic(directory, n_accidents, years=SYNTHETIC_YEARS, seed=0, chunk_rows=1_000_000):
+    """Zapisuje accidents.csv, casualties.csv i vehicles.csv z `n_accidents` wypadkami (10 tys. - 10 mln).
+
+    Kolumny jak w `SOURCE_COLUMNS`, pliki posortowane po accident_index (wymaganie `streaming.stream_data`).
+    Generowanie i zapis fragmentami po `chunk_rows` wypadków, więc pamięć nie rośnie z rozmiarem.
+    Zwraca ścieżki w formacie `paths` dla `load_data` / `read_source`.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = {name: directory / f'{name}.csv' for name in SOURCE_COLUMNS}
+    per_year = rng.multinomial(n_accidents, np.full(len(years), 1 / len(years)))
+    town_map = towns(seed)
+    header = True
+    for year, count in zip(years, per_year):
+        for first in range(0, count, chunk_rows):
+            tables = generate_chunk(rng, year, first, min(chunk_rows, count - first), town_map)
+            for name, table in tables.items():
+                table[list(SOURCE_COLUMNS[name])].to_csv(paths[name], mode='w' if header else 'a', header=header,
+                                                         index=False)
+            header = False
+    return paths
@@ -0,0 +1,210 @@
+# Strojenie hiperparametrów: successive halving na zbiorze walidacyjnym, pula procesów, wznawianie z pliku
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from scipy.stats import randint, uniform
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.metrics import roc_auc_score
+from sklearn.model_selection import ParameterSampler
+from xgboost import XGBClassifier
+
+from wypadki.modeling import params_rf, params_xgb
+
+# Przestrzenie przeszukiwania (n_estimators jest zasobem successive halving, więc go tu nie ma)
+XGB_SPACE = {
+    'max_depth': randint(3, 12),
+    'learning_rate': uniform(0.02, 0.18),
+    'subsample': uniform(0.6, 0.4),
+    'colsample_bytree': uniform(0.4, 0.6),
+    'min_child_weight': randint(1, 10),
+    'reg_alpha': uniform(0.0, 1.0),
+    'reg_lambda': uniform(0.5, 2.5),
+}
+
+RF_SPACE = {
+    'max_depth': randint(6, 24),
+    'min_samples_split': randint(2, 100),
+    'min_samples_leaf': randint(1, 50),
+    'max_features': ['sqrt', 'log2'],
+    'criterion': ['gini', 'entropy'],
+    'bootstrap': [True, False],
+}
+
+SPACES = {'xgb': XGB_SPACE, 'rf': RF_SPACE}
+
+# Zasób (liczba drzew): pierwszy szczebel i górny limit
+RESOURCES = {'xgb': (30, 810), 'rf': (10, 270)}
+
+# Parametry stałe (nieprzeszukiwane)
+FIXED_PARAMS = {
+    'xgb': {'random_state': 42, 'eval_metric': 'auc'},
+    'rf': {'random_state': 42},
+}
+
+# Dane treningowe i walidacyjne procesu roboczego (ustawiane raz na proces)
+_worker_data = None
+
+
+def _init_worker(data):
+    global _worker_data
+    _worker_data = data
+
+
+def baseline_params(model):
+    """Obecne hiperparametry z `params_xgb` / `params_rf` w układzie przestrzeni przeszukiwania."""
+    params = params_xgb if model == 'xgb' else params_rf
+    return {key: params[key] for key in SPACES[model] if key in params}
+
+
+def _to_builtin(params):
+    return {key: value.item() if isinstance(value, np.generic) else value for key, value in params.items()}
+
+
+def data_fingerprint(*arrays):
+    """Odcisk danych (kształty i skrót zawartości) - checkpoint z innych danych nie jest wznawiany."""
+    digest = hashlib.sha1()
+    for array in arrays:
+        digest.update(repr(array.shape).encode())
+        if sparse.issparse(array):
+            array = array.tocsr()
+            parts = [array.data, array.indices, array.indptr]
+        elif isinstance(array, (pd.DataFrame, pd.Series)):
+            if isinstance(array, pd.DataFrame):
+                digest.update(json.dumps([str(column) for column in array.columns]).encode())
+            parts = [pd.util.hash_pandas_object(array, index=False).to_numpy()]
+        else:
+            parts = [np.asarray(array)]
+        for part in parts:
+            digest.update(np.ascontiguousarray(part).data)
+    return digest.hexdigest()[:12]
+
+
+def trial_key(model, params, budget, early_stopping_rounds, data):
+    """Identyfikator próby (model, parametry, budżet, early stopping, odcisk danych) - klucz w pliku checkpointu."""
+    payload = json.dumps({'model': model, 'params': params, 'budget': budget,
+                          'early_stopping_rounds': early_stopping_rounds, 'data': data}, sort_keys=True)
+    return hashlib.sha1(payload.encode()).hexdigest()[:12]
+
+
+def run_trial(model, params, budget, threads=1, early_stopping_rounds=20):
+    """Trenuje jedną konfigurację z `budget` drzewami i zwraca AUC na zbiorze walidacyjnym."""
+    X_train, y_train, X_val, y_val = _worker_data
+    start = time.perf_counter()
+    if model == 'xgb':
+        clf = XGBClassifier(**FIXED_PARAMS['xgb'], **params, n_estimators=budget, n_jobs=threads,
+                            early_stopping_rounds=early_stopping_rounds)
+        clf.fit(X_train, y_train, eval_set=[(X_val, y_val)], verbose=False)
+        best_iteration = int(clf.best_iteration)
+        auc = float(clf.best_score)
+    else:
+        clf = RandomForestClassifier(**FIXED_PARAMS['rf'], **params, n_estimators=budget, n_jobs=threads)
+        clf.fit(X_train, y_train)
+        best_iteration = budget - 1
+        auc = float(roc_auc_score(y_val, clf.predict_proba(X_val)[:, 1]))
+    return {'auc': auc, 'best_iteration': best_iteration, 'seconds': time.perf_counter() - start}
+
+
+def load_checkpoint(path):
+    """Zakończone próby zapisane w pliku JSONL: {klucz: rekord}."""
+    done = {}
+    if path is not None and Path(path).exists():
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    done[record['key']] = record
+    return done
+
+
+def _append_checkpoint(path, record):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record) + '\n')
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def successive_halving(X_train, y_train, X_val, y_val, model='xgb', n_candidates=27, eta=3, min_resource=None,
+                       max_resource=None, checkpoint=None, n_jobs=None, threads_per_trial=1, random_state=42,
+                       early_stopping_rounds=20, include_baseline=True, X_test=None, y_test=None):
+    """Successive halving konfiguracji XGBoost lub RandomForest (zasób: liczba drzew).
+
+    Na każdym szczeblu wszystkie pozostałe konfiguracje są trenowane równolegle (`n_jobs` procesów,
+    `threads_per_trial` wątków na próbę), oceniane AUC na zbiorze walidacyjnym, a do kolejnego
+    szczebla z `eta`-krotnie większym budżetem przechodzi najlepsza 1/`eta`. XGBoost dodatkowo
+    zatrzymuje trening po `early_stopping_rounds` rundach bez poprawy AUC. Zakończone próby są
+    dopisywane do pliku `checkpoint` (JSONL); ponowne uruchomienie z tym samym plikiem pomija je
+    (klucz próby obejmuje też `early_stopping_rounds` i odcisk danych treningowych i walidacyjnych).
+
+    Zwraca {'trials': DataFrame prób, 'best_params', 'best_auc', 'test_auc'}; `best_params` zawiera
+    n_estimators (dla XGBoost: liczbę drzew z najlepszej iteracji). `best_auc` jest zawyżone: zbiór
+    walidacyjny wybrał zwycięzcę, a w XGBoost także liczbę drzew (early stopping). Nieobciążoną ocenę
+    daje `test_auc` - AUC zwycięzcy wytrenowanego z `best_params` na zbiorze treningowym, policzone na
+    (`X_test`, `y_test`), których przeszukiwanie nie widziało (None, gdy ich nie podano).
+    """
+    min_resource, max_resource = (min_resource or RESOURCES[model][0], max_resource or RESOURCES[model][1])
+    candidates = [_to_builtin(p) for p in ParameterSampler(SPACES[model], n_candidates, random_state=random_state)]
+    if include_baseline:
+        candidates = [baseline_params(model)] + candidates[:-1]
+
+    done = load_checkpoint(checkpoint)
+    if checkpoint is not None:
+        Path(checkpoint).parent.mkdir(parents=True, exist_ok=True)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    data = (X_train, y_train, X_val, y_val)
+    fingerprint = data_fingerprint(*data)
+    pool = ProcessPoolExecutor(n_jobs, initializer=_init_worker, initargs=(data,)) if n_jobs > 1 else None
+    if pool is None:
+        _init_worker(data)
+
+    records = []
+    alive = list(range(len(candidates)))
+    rung = 0
+    try:
+        while alive:
+            budget = min(max_resource, int(min_resource * eta ** rung))
+            jobs = {}
+            for idx in alive:
+                key = trial_key(model, candidates[idx], budget, early_stopping_rounds, fingerprint)
+                if key in done:
+                    # Ten sam budżet mógł być w poprzednim przebiegu innym szczeblem (inne min_resource)
+                    records.append({**done[key], 'candidate': idx, 'rung': rung, 'resumed': True})
+                    continue
+                args = (model, candidates[idx], budget, threads_per_trial, early_stopping_rounds)
+                jobs[idx] = (key, pool.submit(run_trial, *args) if pool else run_trial(*args))
+            for idx, (key, job) in jobs.items():
+                result = job.result() if pool else job
+                record = {'key': key, 'model': model, 'candidate': idx, 'rung': rung, 'budget': budget,
+                          'params': candidates[idx], **result}
+                if checkpoint is not None:
+                    _append_checkpoint(checkpoint, record)
+                records.append({**record, 'resumed': False})
+
+            if len(alive) == 1 or budget >= max_resource:
+                break
+            rung_scores = {r['candidate']: r['auc'] for r in records if r['rung'] == rung}
+            n_keep = max(1, math.floor(len(alive) / eta))
+            alive = sorted(alive, key=lambda idx: (-rung_scores[idx], idx))[:n_keep]
+            rung += 1
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    trials = pd.DataFrame(records)
+    last = trials[trials['rung'] == trials['rung'].max()].sort_values(['auc', 'candidate'], ascending=[False, True])
+    best = last.iloc[0]
+    best_params = {**FIXED_PARAMS[model], **best['params'], 'n_estimators': int(best['best_iteration']) + 1}
+    best_params.pop('eval_metric', None)
+    test_auc = None
+    if X_test is not None:
+        clf = (XGBClassifier if model == 'xgb' else RandomForestClassifier)(**best_params, n_jobs=n_jobs)
+        clf.fit(X_train, y_train)
+        test_auc = float(roc_auc_score(y_test, clf.predict_proba(X_test)[:, 1]))
+    return {'trials': trials, 'best_params': best_params, 'best_auc': float(best['auc']), 'test_auc': test_auc}